@@ -0,0 +1,86 @@
+# coding: utf-8
+# Anytime CP-SAT solves.
+#
+# AnytimeCallback is a CP-SAT solution callback that writes every improving
+# incumbent as soon as it is found: the solution files (atomically, through
+# solutionWriter) with its objective, the current bound and gap, and one row of an
+# objective-versus-time trace (CSV: timestamp, seconds, objective, bound),
+# rewritten atomically after each incumbent. The objective is the model
+# objective, written through objectiveText as the final write in
+# simpleTimetable.run does, so the trace, the incumbent files and the final
+# file agree. With stall set, a watchdog thread
+# stops the search once no improvement has arrived for stall seconds (counted
+# from the start before the first incumbent). pywraplp gives no solution
+# callbacks, so the mode needs the CP-SAT backend.
+from ortools.sat.python import cp_model
+from solutionWriter import writeSolution, atomicOpen, objectiveText
+from bounds import mipGap
+from datetime import datetime
+import cpsatModel
+import threading
+import time
+
+
+class AnytimeCallback(cp_model.CpSolverSolutionCallback):
+
+    def __init__(self, model, fileName, solverAttributes, outputFormats=('xml',), traceFile=None, stall=None,
+                 onIncumbent=None, verbose=True):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.model = model
+        self.fileName = fileName
+        self.solverAttributes = solverAttributes
+        self.outputFormats = outputFormats
+        self.traceFile = traceFile
+        self.stall = stall
+        self.onIncumbent = onIncumbent
+        self.verbose = verbose
+        self.best = None
+        self.trace = []
+        self.stalled = False
+        self.lastImprovement = time.monotonic()
+        self.done = threading.Event()
+        self.watchdog = None
+
+    def on_solution_callback(self):
+        objective = self.ObjectiveValue()
+        if self.onIncumbent and self.onIncumbent(objective, self.WallTime(), self.BestObjectiveBound()):
+            self.StopSearch()
+        if self.best is not None and objective >= self.best:
+            return
+        self.best = objective
+        self.lastImprovement = time.monotonic()
+        bound = self.BestObjectiveBound()
+        seconds = self.WallTime()
+        games = cpsatModel.scheduleArray(self.model, self.Response())
+        writeSolution(games, self.fileName, objectiveText(objective), seconds, self.solverAttributes, self.outputFormats,
+                      int(bound), 'FEASIBLE', mipGap(objective, bound))
+        self.trace.append((datetime.now().isoformat(timespec='milliseconds'), seconds, objective, bound))
+        if self.traceFile:
+            self.writeTrace()
+        if self.verbose:
+            print("incumbent objective = ",objective," bound = ",bound," time = ",round(seconds,3))
+
+    def writeTrace(self):
+        with atomicOpen(self.traceFile) as f:
+            f.write('timestamp,seconds,objective,bound\n')
+            f.writelines('{0},{1:.3f},{2:g},{3:g}\n'.format(*row) for row in self.trace)
+
+    def start(self):
+        # Starts the stall watchdog; call before Solve, and stop() after it.
+        self.lastImprovement = time.monotonic()
+        if self.stall:
+            self.watchdog = threading.Thread(target=self.watch, daemon=True)
+            self.watchdog.start()
+
+    def watch(self):
+        while not self.done.wait(0.1):
+            if time.monotonic() - self.lastImprovement > self.stall:
+                self.stalled = True
+                print("no improvement for ",self.stall," s, stopping the search")
+                self.StopSearch()
+                return
+
+    def stop(self):
+        self.done.set()
+        if self.watchdog:
+            self.watchdog.join()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Solve many instances concurrently and collect one results table.
+#
+# Every instance runs simpleTimetable.run in its own process of a pool sized
+# to the machine (cores // threads per instance). Each run has its own time
+# and thread budget, taken from --time-limit/--threads or from a JSON file
+# mapping instance file names to {"timeLimit": ..., "threads": ...}. The
+# solver output of a run goes to <instance>.log; status, objective, bound,
+# model size and timings go to a CSV or JSON table.
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import simpleTimetable
+import contextlib
+import argparse
+import glob
+import json
+import csv
+import os
+import sys
+import time
+
+COLUMNS = ('instance', 'backend', 'solver', 'threads', 'timeLimit', 'status', 'objective', 'solverObjective',
+           'bound', 'gap', 'variables', 'rows', 'buildTime', 'solveTime', 'totalTime', 'error')
+
+
+def runInstance(fileName, options, timeLimit, threads):
+    argv = [fileName] + list(options)
+    if timeLimit:
+        argv += ['--time-limit', str(timeLimit)]
+    if threads:
+        argv += ['--threads', str(threads)]
+    begin = time.perf_counter()
+    with open(fileName[:-4]+'.log', 'w') as log, contextlib.redirect_stdout(log):
+        try:
+            code, result = simpleTimetable.run(argv)
+        except (Exception, SystemExit) as error:
+            result = {'instance': fileName, 'status': 'ERROR', 'error': repr(error)}
+    result = result or {'instance': fileName}
+    result.setdefault('totalTime', time.perf_counter() - begin)
+    return result
+
+
+def expandInstances(patterns):
+    fileNames = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        for fileName in matches or [pattern]:
+            if fileName.endswith('_solution.xml') or fileName in fileNames:
+                continue
+            fileNames.append(fileName)
+    return fileNames
+
+
+def writeResults(results, fileName):
+    if fileName.endswith('.json'):
+        with open(fileName, 'w') as f:
+            json.dump(results, f, indent=2)
+        return
+    with open(fileName, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+
+def printResults(results):
+    print("{0:<24}{1:>12}{2:>10}{3:>12}{4:>10}{5:>10}".format('instance','status','objective','bound','rows','seconds'))
+    for result in results:
+        bound = result.get('bound')
+        print("{0:<24}{1:>12}{2:>10}{3:>12}{4:>10}{5:>10.1f}".format(
+            os.path.basename(result['instance']), result.get('status', ''), str(result.get('objective', '')),
+            '' if bound is None else round(bound, 2), str(result.get('rows', '')), result.get('totalTime', 0.0)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve ITC2021 instances in parallel and tabulate the results.',
+                                     epilog='Options after -- are passed to simpleTimetable.py for every instance.')
+    parser.add_argument('instances', nargs='+', help='instance files or glob patterns')
+    parser.add_argument('--time-limit', type=float, default=None, help='default time limit per instance in seconds')
+    parser.add_argument('--threads', type=int, default=1, help='default threads per instance (default: 1)')
+    parser.add_argument('--budgets', default=None,
+                        help='JSON file mapping instance file names to {"timeLimit": ..., "threads": ...}')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='concurrent instances (default: cores // threads)')
+    parser.add_argument('--output', default='results.csv', help='results table, .csv or .json (default: results.csv)')
+    argv = sys.argv[1:] if argv is None else argv
+    options = []
+    if '--' in argv:
+        options = argv[argv.index('--')+1:]
+        argv = argv[:argv.index('--')]
+    args = parser.parse_args(argv)
+
+    budgets = {}
+    if args.budgets:
+        with open(args.budgets) as f:
+            budgets = json.load(f)
+    fileNames = expandInstances(args.instances)
+    jobs = args.jobs or max(1, (os.cpu_count() or 1)//max(1, args.threads))
+    print("instances = ",len(fileNames)," jobs = ",jobs)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {}
+        for fileName in fileNames:
+            budget = budgets.get(os.path.basename(fileName), budgets.get(fileName, {}))
+            futures[pool.submit(runInstance, fileName, options, budget.get('timeLimit', args.time_limit),
+                                budget.get('threads', args.threads))] = fileName
+        for future in as_completed(futures):
+            result = future.result()
+            print("done ",futures[future]," status = ",result.get('status'))
+            results.append(result)
+    results.sort(key=lambda result: fileNames.index(result['instance']))
+    writeResults(results, args.output)
+    printResults(results)
+    return int(any(result.get('status') not in ('OPTIMAL', 'FEASIBLE') for result in results))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
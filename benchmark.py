@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Reproducible benchmark of model build, solve and extraction.
+#
+# Every (instance, case) pair runs in a fresh process, so the peak RSS reported
+# by getrusage belongs to that run alone. A run records the build time and the
+# columns/rows added by every constraint family, the total model size, solve
+# time and status, time to the first incumbent, the final objective and bound,
+# extraction time and peak RSS. Results are written as JSON; --save-baseline
+# keeps them as a baseline and --check compares a run against one, failing on
+# any change in model size and on a different optimum. Timings depend on the
+# host, so build times are only checked when --tolerance is given. With --bulk every mip case is also built by
+# bulkModel.py after the run; its build time is reported next to the loop
+# build and the two models must be identical.
+from concurrent.futures import ProcessPoolExecutor
+from instance import loadInstance
+from model import buildModel, penaltyValues, scheduledGames
+from bulkModel import buildBulkModel, sameModel
+from instrumentation import Instrumentation
+from solverSettings import SolverSettings, solveMip, mipStatusName, FIRST_SOLUTION_PARAMETER
+import cpsatModel
+import generator
+import contextlib
+import ortools
+import platform
+import argparse
+import resource
+import glob
+import json
+import io
+import os
+import sys
+import time
+
+# name: (backend, formulation, SE1 encoding)
+CASES = {
+    'mip-full': ('mip', 'full', 'pairs'),
+    'mip-compact': ('mip', 'compact', 'pairs'),
+    'mip-window': ('mip', 'compact', 'window'),
+    'cpsat': ('cpsat', 'compact', 'window'),
+}
+DEFAULT_CASES = ('mip-full', 'mip-compact', 'cpsat')
+
+
+class FirstSolution(cpsatModel.cp_model.CpSolverSolutionCallback):
+    def __init__(self):
+        cpsatModel.cp_model.CpSolverSolutionCallback.__init__(self)
+        self.begin = time.perf_counter()
+        self.seconds = None
+
+    def on_solution_callback(self):
+        if self.seconds is None:
+            self.seconds = time.perf_counter() - self.begin
+
+
+def peakRss():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def familyRecords(phases):
+    return dict((name, {'seconds': record['seconds'], 'variables': record['variables'], 'rows': record['rows'],
+                        'memory': record['memory']}) for name, record in phases.steps().items())
+
+
+def runMip(instance, formulation, se1, settings, result, bulk=False):
+    begin = time.perf_counter()
+    phases = Instrumentation()
+    model = buildModel(instance, formulation, se1, settings.solver, phases)
+    result['buildTime'] = time.perf_counter() - begin
+    result['families'] = familyRecords(phases)
+    result['variables'], result['rows'] = model.size()
+    begin = time.perf_counter()
+    status, ignored = solveMip(model.solver, settings)
+    result.update(solveTime=time.perf_counter() - begin, status=mipStatusName(status))
+    if status in (model.solver.OPTIMAL, model.solver.FEASIBLE):
+        begin = time.perf_counter()
+        games = scheduledGames(model)
+        objective = sum(penaltyValues(model).values())
+        result.update(extractTime=time.perf_counter() - begin, objective=objective,
+                      bound=model.solver.Objective().BestBound())
+    result['peakRss'] = peakRss()
+    if bulk:
+        begin = time.perf_counter()
+        phases = Instrumentation()
+        bulkBuilt = buildBulkModel(instance, formulation, se1, settings.solver, phases)
+        result.update(bulkBuildTime=time.perf_counter() - begin, bulkFamilies=familyRecords(phases),
+                      bulkIdentical=sameModel(model, bulkBuilt))
+        del bulkBuilt
+    if settings.solver not in FIRST_SOLUTION_PARAMETER:
+        return
+    # pywraplp has no incumbent callback: solve again until the first solution
+    model = buildModel(instance, formulation, se1, settings.solver)
+    begin = time.perf_counter()
+    status, ignored = solveMip(model.solver, settings._replace(firstSolution=True))
+    if status in (model.solver.OPTIMAL, model.solver.FEASIBLE):
+        result['firstIncumbent'] = time.perf_counter() - begin
+
+
+def runCpSat(instance, settings, result):
+    begin = time.perf_counter()
+    phases = Instrumentation()
+    model = cpsatModel.buildCpModel(instance, phases)
+    result['buildTime'] = time.perf_counter() - begin
+    result['families'] = familyRecords(phases)
+    result['variables'], result['rows'] = model.size()
+    callback = FirstSolution()
+    begin = time.perf_counter()
+    status = cpsatModel.solveCpModel(model, settings, callback)
+    result.update(solveTime=time.perf_counter() - begin, status=model.solver.StatusName(status),
+                  firstIncumbent=callback.seconds)
+    if status in (cpsatModel.cp_model.OPTIMAL, cpsatModel.cp_model.FEASIBLE):
+        begin = time.perf_counter()
+        games = cpsatModel.scheduledGames(model)
+        objective = sum(cpsatModel.penaltyValues(model).values())
+        result.update(extractTime=time.perf_counter() - begin, objective=objective,
+                      bound=model.solver.BestObjectiveBound())
+    result['peakRss'] = peakRss()
+
+
+def runCase(fileName, case, settings, bulk=False):
+    backend, formulation, se1 = CASES[case]
+    result = {'instance': fileName.replace('\\', '/').split('/')[-1], 'case': case, 'solver': settings.solver,
+              'status': None, 'objective': None, 'bound': None, 'firstIncumbent': None, 'extractTime': None,
+              'families': {}}
+    begin = time.perf_counter()
+    instance = loadInstance(fileName)
+    result['parseTime'] = time.perf_counter() - begin
+    # the model modules print their debug output while extracting
+    with contextlib.redirect_stdout(io.StringIO()):
+        if backend == 'cpsat':
+            result['solver'] = 'cpsat'
+            runCpSat(instance, settings, result)
+        else:
+            runMip(instance, formulation, se1, settings, result, bulk)
+    return result
+
+
+def environment():
+    return {'python': platform.python_version(), 'ortools': ortools.__version__, 'platform': platform.platform(),
+            'machine': platform.machine()}
+
+
+def compare(results, baseline, tolerance=None, slack=0.05):
+    # Returns one message per regression against the baseline runs. Build
+    # times are compared only with a tolerance.
+    timed = tolerance is not None
+    reference = dict(((run['instance'], run['case']), run) for run in baseline['runs'])
+    problems = []
+    for run in results['runs']:
+        key = (run['instance'], run['case'])
+        if key not in reference:
+            continue
+        base = reference[key]
+        name = '{0} {1}'.format(*key)
+        for field in ('variables', 'rows'):
+            if run[field] != base[field]:
+                problems.append('{0}: {1} {2} -> {3}'.format(name, field, base[field], run[field]))
+        for family in sorted(set(run['families']) | set(base['families'])):
+            now = run['families'].get(family, {})
+            before = base['families'].get(family, {})
+            for field in ('variables', 'rows'):
+                if now.get(field) != before.get(field):
+                    problems.append('{0}: {1} {2} {3} -> {4}'.format(name, family, field, before.get(field), now.get(field)))
+            if timed and family in run['families'] and family in before:
+                if now['seconds'] > before['seconds']*(1 + tolerance) + slack:
+                    problems.append('{0}: {1} build {2:.3f}s -> {3:.3f}s'.format(name, family, before['seconds'], now['seconds']))
+        if timed and run['buildTime'] > base['buildTime']*(1 + tolerance) + slack:
+            problems.append('{0}: build {1:.3f}s -> {2:.3f}s'.format(name, base['buildTime'], run['buildTime']))
+        if run.get('bulkIdentical') is False:
+            problems.append('{0}: the bulk build differs from the loop build'.format(name))
+        if run['status'] == base['status'] == 'OPTIMAL' and run['objective'] != base['objective']:
+            problems.append('{0}: optimum {1} -> {2}'.format(name, base['objective'], run['objective']))
+    return problems
+
+
+def printResults(runs):
+    bulk = any('bulkBuildTime' in run for run in runs)
+    print("{0:<24}{1:<13}{2:>9}{3:>9}{4:>8}{5:>8}{6:>12}{7:>10}{8:>9}{9:>9}".format(
+        'instance','case','variables','rows','build','solve','status','objective','first','rss MB')
+          + ("{0:>8}{1:>10}".format('bulk','identical') if bulk else ''))
+    for run in runs:
+        first = run.get('firstIncumbent')
+        line = "{0:<24}{1:<13}{2:>9}{3:>9}{4:>8.3f}{5:>8.2f}{6:>12}{7:>10}{8:>9}{9:>9.1f}".format(
+            run['instance'], run['case'], run['variables'], run['rows'], run['buildTime'], run['solveTime'],
+            str(run['status']), str(run['objective']), '' if first is None else round(first, 2), run['peakRss']/1024.0)
+        if 'bulkBuildTime' in run:
+            line += "{0:>8.3f}{1:>10}".format(run['bulkBuildTime'], str(run['bulkIdentical']))
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark model build, solve and extraction on ITC2021 instances.')
+    parser.add_argument('instances', nargs='*', default=['ITC2021_Test*.xml'],
+                        help='instance files or glob patterns (default: ITC2021_Test*.xml)')
+    parser.add_argument('--generate', nargs='+', type=int, default=[], metavar='TEAMS',
+                        help='also run generated instances (planted, phased) with these team counts')
+    parser.add_argument('--generated-dir', default='generated',
+                        help='directory for the generated instances (default: generated)')
+    parser.add_argument('--seed', type=int, default=0, help='generator seed (default: 0)')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(DEFAULT_CASES),
+                        help='model variants to run (default: {0})'.format(' '.join(DEFAULT_CASES)))
+    parser.add_argument('--bulk', action='store_true',
+                        help='also build every mip case with bulkModel.py and report both build times')
+    parser.add_argument('--solver', default='CBC', help='MIP engine for the mip cases (default: CBC)')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='solve limit per run in seconds (default: 60)')
+    parser.add_argument('--threads', type=int, default=1, help='solver threads per run (default: 1)')
+    parser.add_argument('--output', default='benchmark.json', help='results file (default: benchmark.json)')
+    parser.add_argument('--save-baseline', default=None, metavar='FILE', help='also write the results to FILE as a baseline')
+    parser.add_argument('--check', default=None, metavar='FILE', help='compare against the baseline in FILE, exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=None,
+                        help='with --check, also fail on build times above the baseline by more than this relative '
+                             'increase plus --slack, e.g. 0.5 (default: build times are not checked)')
+    parser.add_argument('--slack', type=float, default=0.05,
+                        help='allowed absolute build time increase in seconds with --tolerance (default: 0.05)')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    fileNames = []
+    for pattern in args.instances:
+        for fileName in sorted(glob.glob(pattern)) or [pattern]:
+            if not fileName.endswith('_solution.xml') and fileName not in fileNames:
+                fileNames.append(fileName)
+    if args.generate:
+        os.makedirs(args.generated_dir, exist_ok=True)
+    for numTeams in args.generate:
+        fileName = os.path.join(args.generated_dir, 'Generated_{0}_{1}.xml'.format(numTeams, args.seed))
+        generator.generateFile(fileName, numTeams, seed=args.seed, planted=True)
+        fileNames.append(fileName)
+    settings = SolverSettings(solver=args.solver.upper(), threads=args.threads, timeLimit=args.time_limit)
+    results = {'environment': environment(), 'timeLimit': args.time_limit, 'threads': args.threads, 'runs': []}
+    # one process per run, so peak RSS is not carried over from earlier runs
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+        for fileName in fileNames:
+            for case in args.cases:
+                run = pool.submit(runCase, fileName, case, settings, args.bulk).result()
+                print("done ",run['instance']," ",case," status = ",run['status']," build = ",round(run['buildTime'],3),
+                      " solve = ",round(run['solveTime'],2),
+                      "" if 'bulkBuildTime' not in run else " bulk build = {0:.3f}".format(run['bulkBuildTime']))
+                results['runs'].append(run)
+    printResults(results['runs'])
+    for fileName in (args.output, args.save_baseline):
+        if fileName:
+            with open(fileName, 'w') as f:
+                json.dump(results, f, indent=2)
+    if args.check:
+        with open(args.check) as f:
+            problems = compare(results, json.load(f), args.tolerance, args.slack)
+        for problem in problems:
+            print("regression: ",problem)
+        return int(bool(problems))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
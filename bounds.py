@@ -0,0 +1,57 @@
+# coding: utf-8
+# Standalone lower bounds.
+#
+#   lp   - the LP relaxation of the MIP model, every integer column relaxed to
+#          continuous;
+#   hard - the model of a relaxed instance that keeps every HARD constraint but
+#          the SOFT constraints of the cheapest families only (CA1, CA2, GA1
+#          and BR1 by default). Dropping a soft constraint only drops
+#          non-negative penalty terms, so the best bound of this model, proved
+#          optimal or not, bounds the full model from below.
+# Both bound the objective of the model (solver objective), not the ITC2021
+# score.
+from model import buildModel
+from solverSettings import solveMip, mipStatusName
+import cpsatModel
+
+RELAXATIONS = ('lp', 'hard')
+CHEAP_FAMILIES = ('CA1', 'CA2', 'GA1', 'BR1')
+
+
+def relaxedInstance(instance, families=CHEAP_FAMILIES):
+    constraints = dict((family, [record for record in records if record.type == 'HARD' or family in families])
+                       for family, records in instance.constraints.items())
+    return instance._replace(constraints=constraints)
+
+
+def mipGap(objective, bound):
+    # |objective - bound| / max(1, |objective|), as CP-SAT measures it
+    if objective is None or bound is None:
+        return None
+    return abs(objective - bound)/max(1.0, abs(objective))
+
+
+def lpBound(instance, formulation, se1, settings, build=buildModel):
+    # Returns the status name, the bound (None without one) and the model size;
+    # build is buildModel or bulkModel.buildBulkModel.
+    model = build(instance, formulation, se1, settings.solver)
+    for var in model.solver.variables():
+        var.SetInteger(False)
+    status, ignored = solveMip(model.solver, settings)
+    bound = model.solver.Objective().Value() if status == model.solver.OPTIMAL else None
+    return mipStatusName(status), bound, model.size()
+
+
+def relaxationBound(instance, backend, formulation, se1, settings, families=CHEAP_FAMILIES, build=buildModel):
+    # As lpBound, for the hard relaxation solved by the MIP engine or CP-SAT.
+    relaxed = relaxedInstance(instance, families)
+    if backend == 'cpsat':
+        model = cpsatModel.buildCpModel(relaxed)
+        status = cpsatModel.solveCpModel(model, settings)
+        found = status in (cpsatModel.cp_model.OPTIMAL, cpsatModel.cp_model.FEASIBLE)
+        bound = model.solver.BestObjectiveBound() if found or status == cpsatModel.cp_model.UNKNOWN else None
+        return model.solver.StatusName(status), bound, model.size()
+    model = build(relaxed, formulation, se1, settings.solver)
+    status, ignored = solveMip(model.solver, settings)
+    bound = model.solver.Objective().BestBound() if status in (model.solver.OPTIMAL, model.solver.FEASIBLE) else None
+    return mipStatusName(status), bound, model.size()
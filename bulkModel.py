@@ -0,0 +1,652 @@
+# coding: utf-8
+# Bulk construction of the MIP model of model.py.
+#
+# model.py adds every row through solver.Add(solver.Sum([...])) inside nested
+# loops. Here each build step produces whole blocks of columns and rows as
+# NumPy index arrays: a column is an integer index, an expression array holds
+# the column indices and coefficients of its terms in its last axis, and one
+# call adds a block of rows in the order the loops of model.py would. The
+# blocks are merged into a sparse matrix (duplicate terms summed, zero terms
+# dropped, as pywraplp does), written to an MPModelProto and loaded into the
+# solver at once. The model is identical to the one of buildModel - same
+# columns, rows, bounds and objective in the same order (sameModel checks
+# that) - and exposes the same X/H/home/.../D_* mappings, so solving,
+# extraction, hints, presolve fixes and fix-and-relax work unchanged.
+# Variables are anonymous; lazy rows, the decomposition and sessions keep
+# using model.py.
+from model import (TimetableModel, FORMULATIONS, SE1_ENCODINGS, variableArray, compactExpressions, teamPairs,
+                   slotPairs, modes)
+from ortools.linear_solver import linear_solver_pb2
+import numpy as np
+
+INFINITY = float('inf')
+
+
+class LinearArray(object):
+    # Array of linear expressions: cell [...] is
+    # sum(coefs[..., k]*column cols[..., k]) + const[...]; column -1 is no term.
+    # Indexing and sums act on the cell axes, never on the term axis.
+
+    def __init__(self, cols, coefs=1.0, const=0.0):
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.coefs = np.broadcast_to(np.asarray(coefs, dtype=np.float64), self.cols.shape)
+        self.const = np.broadcast_to(np.asarray(const, dtype=np.float64), self.cols.shape[:-1])
+
+    @property
+    def shape(self):
+        return self.const.shape
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        return LinearArray(self.cols[key + (slice(None),)], self.coefs[key + (slice(None),)], self.const[key])
+
+    def __add__(self, other):
+        if not isinstance(other, LinearArray):
+            other = constant(other)
+        shape = np.broadcast_shapes(self.shape, other.shape)
+        return LinearArray(np.concatenate([widen(self.cols, shape), widen(other.cols, shape)], -1),
+                           np.concatenate([widen(self.coefs, shape), widen(other.coefs, shape)], -1),
+                           self.const + other.const)
+
+    __radd__ = __add__
+
+    def __neg__(self):
+        return LinearArray(self.cols, -self.coefs, -self.const)
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rsub__(self, other):
+        return -self + other
+
+    def __mul__(self, factor):
+        return LinearArray(self.cols, self.coefs*factor, self.const*factor)
+
+    __rmul__ = __mul__
+
+    def sum(self, axis):
+        # moves the summed cell axes into the term axis
+        axes = [a % len(self.shape) for a in np.atleast_1d(axis)]
+        keep = [a for a in range(len(self.shape)) if a not in axes]
+        order = keep + axes + [len(self.shape)]
+        width = int(np.prod([self.shape[a] for a in axes]))*self.cols.shape[-1]
+        shape = tuple(self.shape[a] for a in keep) + (width,)
+        return LinearArray(self.cols.transpose(order).reshape(shape), self.coefs.transpose(order).reshape(shape),
+                           self.const.sum(axis=tuple(axes)))
+
+    def transpose(self, *axes):
+        return LinearArray(self.cols.transpose(axes + (len(axes),)), self.coefs.transpose(axes + (len(axes),)),
+                           self.const.transpose(axes))
+
+    def masked(self, mask):
+        # the expression where mask holds, zero elsewhere
+        mask = np.asarray(mask)
+        return LinearArray(np.where(mask[...,None], self.cols, -1), self.coefs, np.where(mask, self.const, 0.0))
+
+
+def terms(index):
+    # one term per cell of a column index array (-1 cells are zero)
+    return LinearArray(np.asarray(index)[...,None])
+
+
+def constant(value):
+    value = np.asarray(value, dtype=np.float64)
+    return LinearArray(np.full(value.shape + (0,), -1), 0.0, value)
+
+
+def widen(array, shape):
+    return np.broadcast_to(array, shape + array.shape[-1:])
+
+
+def padded(array, width, value):
+    if array.shape[-1] == width:
+        return array
+    pad = np.full(array.shape[:-1] + (width - array.shape[-1],), value, dtype=array.dtype)
+    return np.concatenate([array, pad], -1)
+
+
+def concatenate(arrays, axis):
+    width = max(array.cols.shape[-1] for array in arrays)
+    return LinearArray(np.concatenate([padded(array.cols, width, -1) for array in arrays], axis),
+                       np.concatenate([padded(np.array(array.coefs), width, 0.0) for array in arrays], axis),
+                       np.concatenate([array.const for array in arrays], axis))
+
+
+# rows as (expression, lower, upper), the form pywraplp gives a >= b etc.
+
+def eq(a, b):
+    return a - b, 0.0, 0.0
+
+
+def le(a, b):
+    return a - b, -INFINITY, 0.0
+
+
+def ge(a, b):
+    return a - b, 0.0, INFINITY
+
+
+class MatrixBuilder(object):
+    # Columns, objective and rows of a MIP model, kept as NumPy blocks until
+    # they are loaded into a solver.
+
+    def __init__(self):
+        self.columns = []
+        self.objective = []
+        self.rows = []
+        self.numColumns = 0
+        self.numRows = 0
+
+    def size(self):
+        return self.numColumns, self.numRows
+
+    def addColumns(self, shape, lb, ub, integer, mask=None):
+        # Index array of new columns in C order over shape; -1 outside mask.
+        index = np.full(shape, -1, dtype=np.int64)
+        mask = np.ones(shape, dtype=bool) if mask is None else np.broadcast_to(mask, shape)
+        count = int(mask.sum())
+        index[mask] = np.arange(self.numColumns, self.numColumns + count)
+        self.columns.append((count, lb, ub, integer))
+        self.numColumns += count
+        return index
+
+    def setObjective(self, index, coefficient):
+        index = np.asarray(index).ravel()
+        self.objective.append((index[index >= 0], coefficient))
+
+    def addRows(self, rows, mask=None):
+        # rows: [(expression array, lower, upper)]. The rows are added in C
+        # order over the cells, and in list order within a cell; mask (cells
+        # or cells x rows) leaves rows out.
+        shape = np.broadcast_shapes(*[expression.shape for expression, lower, upper in rows])
+        width = max(expression.cols.shape[-1] for expression, lower, upper in rows)
+        axis = len(shape)
+        cols = np.stack([padded(widen(expression.cols, shape), width, -1) for expression, lower, upper in rows], axis)
+        coefs = np.stack([padded(np.array(widen(expression.coefs, shape)), width, 0.0)
+                          for expression, lower, upper in rows], axis)
+        const = np.stack([np.broadcast_to(expression.const, shape) for expression, lower, upper in rows], axis)
+        lower = np.stack([np.broadcast_to(lower, shape) for expression, lower, upper in rows], axis) - const
+        upper = np.stack([np.broadcast_to(upper, shape) for expression, lower, upper in rows], axis) - const
+        if mask is None:
+            count = int(np.prod(shape))*len(rows)
+            cols, coefs = cols.reshape(count, width), coefs.reshape(count, width)
+            lower, upper = lower.ravel(), upper.ravel()
+        else:
+            mask = np.broadcast_to(np.asarray(mask).reshape(np.shape(mask) + (1,)*(axis + 1 - np.ndim(mask))),
+                                   shape + (len(rows),))
+            cols, coefs, lower, upper = cols[mask], coefs[mask], lower[mask], upper[mask]
+        self.rows.append((cols, coefs, lower, upper))
+        self.numRows += len(lower)
+
+    def modelProto(self):
+        proto = linear_solver_pb2.MPModelProto()
+        objective = np.zeros(self.numColumns)
+        for index, coefficient in self.objective:
+            objective[index] = coefficient
+        lower = np.concatenate([np.full(count, lb, dtype=np.float64) for count, lb, ub, integer in self.columns])
+        upper = np.concatenate([np.full(count, ub, dtype=np.float64) for count, lb, ub, integer in self.columns])
+        integer = np.concatenate([np.full(count, integer, dtype=bool) for count, lb, ub, integer in self.columns])
+        add = proto.variable.add
+        for lb, ub, isInteger, coefficient in zip(lower.tolist(), upper.tolist(), integer.tolist(), objective.tolist()):
+            add(lower_bound=lb, upper_bound=ub, is_integer=isInteger, objective_coefficient=coefficient)
+        add = proto.constraint.add
+        for cols, coefs, lower, upper in self.rows:
+            offsets, cols, coefs = sparseRows(cols, coefs)
+            offsets, cols, coefs = offsets.tolist(), cols.tolist(), coefs.tolist()
+            for r, (lb, ub) in enumerate(zip(lower.tolist(), upper.tolist())):
+                start, end = offsets[r], offsets[r+1]
+                add(lower_bound=lb, upper_bound=ub, var_index=cols[start:end], coefficient=coefs[start:end])
+        return proto
+
+
+def sparseRows(cols, coefs):
+    # CSR form of a padded row block: row offsets, column indices sorted
+    # within each row, and coefficients, with duplicates summed and zeros
+    # dropped.
+    numRows = cols.shape[0]
+    rowIds = np.repeat(np.arange(numRows), cols.shape[1])
+    cols, coefs = cols.ravel(), coefs.ravel()
+    keep = cols >= 0
+    rowIds, cols, coefs = rowIds[keep], cols[keep], coefs[keep]
+    order = np.lexsort((cols, rowIds))
+    rowIds, cols, coefs = rowIds[order], cols[order], coefs[order]
+    if len(cols):
+        first = np.ones(len(cols), dtype=bool)
+        first[1:] = (rowIds[1:] != rowIds[:-1]) | (cols[1:] != cols[:-1])
+        starts = np.flatnonzero(first)
+        rowIds, cols, coefs = rowIds[starts], cols[starts], np.add.reduceat(coefs, starts)
+        nonzero = coefs != 0
+        rowIds, cols, coefs = rowIds[nonzero], cols[nonzero], coefs[nonzero]
+    offsets = np.zeros(numRows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rowIds, minlength=numRows), out=offsets[1:])
+    return offsets, cols, coefs
+
+
+def bulkSteps(formulation, se1):
+    # The build steps of model.buildSteps, with the same names.
+    if formulation == 'compact':
+        steps = [('core', bulkCompactCore)]
+    else:
+        steps = [('core', bulkCore), ('homeAway', bulkHomeAway)]
+    if se1 != 'window':
+        steps.append(('pairSlots', bulkPairSlots))
+    return steps + [('CA1', bulkCA1), ('CA2', bulkCA2), ('CA3', bulkCA3), ('CA4', bulkCA4), ('GA1', bulkGA1),
+                    ('BR1', bulkBR1), ('BR2', bulkBR2), ('SE1', bulkSE1Window if se1 == 'window' else bulkSE1),
+                    ('FA2', bulkFA2)]
+
+
+def buildBulkModel(instance, formulation='full', se1='pairs', solverName='CBC', phases=None, names=False):
+    # Same arguments and model as model.buildModel; phases records every
+    # build step plus the load into the solver. Names are not supported.
+    if formulation not in FORMULATIONS:
+        raise ValueError('unknown formulation ' + formulation)
+    if se1 not in SE1_ENCODINGS:
+        raise ValueError('unknown SE1 encoding ' + se1)
+    if names:
+        raise ValueError('the bulk build makes anonymous variables only')
+    model = TimetableModel(instance, formulation, se1, solverName)
+    builder = model.builder = MatrixBuilder()
+    for name,step in bulkSteps(formulation, se1):
+        if phases is None:
+            step(model, builder)
+            continue
+        with phases.phase(name, builder.size):
+            step(model, builder)
+    if phases is None:
+        loadModel(model, builder)
+    else:
+        with phases.phase('load'):
+            loadModel(model, builder)
+    model.objective.SetMinimization()
+    return model
+
+
+def loadModel(model, builder):
+    # Loads the blocks into the solver and replaces every index array and
+    # index mapping of the model by its variables.
+    error = model.solver.LoadModelFromProto(builder.modelProto())
+    if error:
+        raise ValueError('the bulk model does not load: ' + error)
+    model.objective = model.solver.Objective()
+    del model.builder, model.exprs
+    variables = np.empty(model.solver.NumVariables(), dtype=object)
+    variables[:] = model.solver.variables()
+
+    def lookup(index):
+        table = variableArray(*index.shape)
+        table[index >= 0] = variables[index[index >= 0]]
+        return table
+
+    for name, value in list(vars(model).items()):
+        if isinstance(value, np.ndarray):
+            setattr(model, name, lookup(value))
+        elif isinstance(value, dict):
+            setattr(model, name, dict((key, variables[column]) for key, column in value.items()))
+    if model.formulation == 'compact':
+        compactExpressions(model)
+
+
+def keyed(keys, index):
+    # {key: column} for parallel sequences of keys and columns
+    return dict(zip(keys, np.asarray(index).ravel().tolist()))
+
+
+def bulkCore(model, builder):
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    halfSlot = model.halfSlot
+    offDiagonal = ~np.eye(numTeams, dtype=bool)
+    model.X = builder.addColumns((numTeams,numTeams,numSlots), 0, 1, True)
+    model.H = builder.addColumns((numTeams,numTeams,numSlots,2), 0, 1, True)
+    X = terms(model.X)
+    H = terms(model.H)
+    model.exprs = {'X': X, 'H': H}
+
+    # # **phase**
+    if (model.boolPhase):
+        builder.addRows([eq(X[:,:,:halfSlot].sum(2), 1), eq(X[:,:,halfSlot:].sum(2), 1)], offDiagonal)
+
+    # ### A Team can not play with itself
+    teams = np.arange(numTeams)
+    builder.addRows([eq(X[teams,teams].transpose(1,0), 0)])
+
+    # ### per slot: numTeams matches, every team hosts one and visits one
+    perSlot = concatenate([X.sum((0,1))[:,None], X.sum(1).transpose(1,0), X.sum(0).transpose(1,0)], 1)
+    builder.addRows([eq(perSlot, np.concatenate([[numTeams], np.ones(2*numTeams)]))])
+
+    # ## Symmetry in $X_{ijs}$
+    builder.addRows([eq(X, X.transpose(1,0,2))])
+
+    # ## Home/away variables H_{ijsh}
+    Ht = H.transpose(1,0,2,3)
+    builder.addRows([eq(X, H[:,:,:,0] + H[:,:,:,1]), eq(H[:,:,:,0], Ht[:,:,:,1]), eq(H[:,:,:,1], Ht[:,:,:,0])])
+
+    # ## Home-Away constraint
+    away = H[:,:,:,1].sum(2)
+    homes = H[:,:,:,0].sum(2)
+    builder.addRows([eq(away, homes), eq(away, 1), eq(homes, 1)],
+                    np.stack([np.ones((numTeams,numTeams), dtype=bool), offDiagonal, offDiagonal], -1))
+
+
+def bulkHomeAway(model, builder):
+    numSlots = model.numSlots
+    H = model.exprs['H']
+    columns = builder.addColumns((model.numTeams,numSlots,4), 0, 1, True)
+    model.home, model.breakHome, model.away, model.breakAway = [columns[:,:,k] for k in range(4)]
+    home, breakHome, away, breakAway = [terms(columns[:,:,k]) for k in range(4)]
+    model.exprs.update(home=home, breakHome=breakHome, breakAway=breakAway)
+
+    builder.addRows([ge(home[:,:,None], H[:,:,:,0].transpose(0,2,1)), ge(away[:,:,None], H[:,:,:,1].transpose(0,2,1))])
+    builder.addRows([le(home, H[:,:,:,0].sum(1)), le(away, H[:,:,:,1].sum(1))])
+    h, hPrev, a, aPrev = home[:,1:], home[:,:-1], away[:,1:], away[:,:-1]
+    bh, ba = breakHome[:,1:], breakAway[:,1:]
+    builder.addRows([le(bh, h), le(bh, hPrev), ge(bh, h + hPrev - 1), le(ba, a), le(ba, aPrev), ge(ba, a + aPrev - 1)])
+
+
+def bulkCompactCore(model, builder):
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    halfSlot = model.halfSlot
+    model.pairWeight = 2
+    offDiagonal = ~np.eye(numTeams, dtype=bool)
+    laterSlots = np.arange(numSlots) >= 1
+    model.x = x = builder.addColumns((numTeams,numTeams,numSlots), 0, 1, True, offDiagonal[:,:,None])
+    model.breakHome = builder.addColumns((numTeams,numSlots), 0, 1, True, laterSlots[None,:])
+    X = terms(x) + terms(x.transpose(1,0,2))
+    H = terms(np.stack([x, x.transpose(1,0,2)], -1))
+    home = terms(x).sum(1)
+    breakHome = terms(model.breakHome)
+    previous = np.maximum(np.arange(numSlots) - 1, 0)
+    breakAway = (breakHome + 1 - home - home[:,previous]).masked(laterSlots[None,:])
+    model.exprs = {'X': X, 'H': H, 'home': home, 'breakHome': breakHome, 'breakAway': breakAway}
+
+    builder.addRows([eq(X.sum(1).transpose(1,0), 1)])
+    builder.addRows([eq(terms(x).sum(2), 1)], offDiagonal)
+    if (model.boolPhase):
+        builder.addRows([eq(X[:,:,:halfSlot].sum(2), 1)], np.triu(offDiagonal))
+    h, hPrev, bh = home[:,1:], home[:,:-1], breakHome[:,1:]
+    builder.addRows([le(bh, h), le(bh, hPrev), ge(bh, h + hPrev - 1)])
+
+
+def pairMask(model):
+    mask = np.zeros((model.numTeams,model.numTeams), dtype=bool)
+    mask[tuple(np.array(teamPairs(model)).T)] = True
+    return mask
+
+
+def slotMask(model):
+    mask = np.zeros((model.numSlots,model.numSlots), dtype=bool)
+    mask[tuple(np.array(slotPairs(model)).T)] = True
+    return mask
+
+
+def bulkPairSlots(model, builder):
+    if not model.instance.constraints['SE1'] and model.formulation == 'compact':
+        return
+    X = model.exprs['X']
+    mask = pairMask(model)[:,:,None,None] & slotMask(model)[None,None]
+    model.y = builder.addColumns(mask.shape, 0, 1, True, mask)
+    y = terms(model.y)
+    model.exprs['y'] = y
+    X1, X2 = X[:,:,:,None], X[:,:,None,:]
+    builder.addRows([le(y, X1), le(y, X2), ge(y, X1 + X2 - 1)], mask)
+
+
+def countSoft(builder, D, S, min_, max_, penalty, hard):
+    # D >= min - S and D >= S - max, then D == 0 (HARD) or D in the objective
+    rows = [ge(D, min_ - S), ge(D, S - max_)]
+    if hard:
+        rows.append(eq(D, 0))
+    builder.addRows(rows)
+    if not hard:
+        builder.setObjective(D.cols, penalty)
+
+
+# ## CA1
+
+def bulkCA1(model, builder):
+    H = model.exprs['H']
+    D_CA1 = model.D_CA1 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA1']):
+        teams = np.asarray(constraintsSet.teams, dtype=np.int64)
+        mod = 0 if constraintsSet.mode == 'H' else 1
+        D = builder.addColumns((len(teams),), 0, INFINITY, False)
+        D_CA1.update(keyed([(i,t) for t in teams.tolist()], D))
+        S = H[np.ix_(teams, np.arange(model.numTeams), np.asarray(constraintsSet.slots, dtype=np.int64), [mod])].sum((1,2,3))
+        if constraintsSet.type == "HARD":
+            builder.addRows([ge(S, constraintsSet.min), le(S, constraintsSet.max)])
+        else:
+            D = terms(D)
+            builder.addRows([ge(D, constraintsSet.min - S), ge(D, S - constraintsSet.max)])
+            builder.setObjective(D.cols, constraintsSet.penalty)
+
+
+# ## CA2
+
+def bulkCA2(model, builder):
+    H = model.exprs['H']
+    D_CA2 = model.D_CA2 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA2']):
+        teams = np.asarray(constraintsSet.teams1, dtype=np.int64)
+        D = builder.addColumns((len(teams),), 0, INFINITY, False)
+        D_CA2.update(keyed([(i,t) for t in teams.tolist()], D))
+        S = H[np.ix_(teams, np.asarray(constraintsSet.teams2, dtype=np.int64),
+                     np.asarray(constraintsSet.slots, dtype=np.int64), modes(constraintsSet.mode1))].sum((1,2,3))
+        countSoft(builder, terms(D), S, constraintsSet.min, constraintsSet.max, constraintsSet.penalty,
+                  constraintsSet.type == "HARD")
+
+
+# ## CA3
+
+def bulkCA3(model, builder):
+    H = model.exprs['H']
+    D_CA3 = model.D_CA3 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA3']):
+        intp = constraintsSet.intp
+        teams = np.asarray(constraintsSet.teams1, dtype=np.int64)
+        starts = np.arange(model.numSlots - intp + 1)
+        D = builder.addColumns((len(starts),len(teams)), 0, INFINITY, False)
+        D_CA3.update(keyed([(i,l,t) for l in starts.tolist() for t in teams.tolist()], D))
+        window = starts[:,None] + np.arange(intp)
+        mod = np.asarray(modes(constraintsSet.mode1))
+        teams2 = np.asarray(constraintsSet.teams2, dtype=np.int64)
+        S = H[teams[None,:,None,None,None], teams2[None,None,:,None,None], window[:,None,None,:,None],
+              mod[None,None,None,None,:]].sum((2,3,4))
+        if constraintsSet.type == "HARD":
+            builder.addRows([ge(S, constraintsSet.min), le(S, constraintsSet.max)])
+        else:
+            D = terms(D)
+            builder.addRows([ge(D, constraintsSet.min - S), ge(D, S - constraintsSet.max)])
+            builder.setObjective(D.cols, constraintsSet.penalty)
+
+
+# ## CA4
+
+def bulkCA4(model, builder):
+    H = model.exprs['H']
+    D_CA4 = model.D_CA4 = {}
+    for l,constraintsSet in enumerate(model.instance.constraints['CA4']):
+        D = builder.addColumns((), 0, INFINITY, False)
+        D_CA4[l] = int(D)
+        max_ = constraintsSet.max
+        min_ = constraintsSet.min
+        S = H[np.ix_(np.asarray(constraintsSet.teams1, dtype=np.int64), np.asarray(constraintsSet.teams2, dtype=np.int64),
+                     np.asarray(constraintsSet.slots, dtype=np.int64), modes(constraintsSet.mode1))]
+        if constraintsSet.type == "HARD":
+            if constraintsSet.mode2 == "GLOBAL":
+                # model.py sums solution values here, which are zero before
+                # the solve: two rows without terms
+                empty = constant(0.0)
+                builder.addRows([ge(empty, min_), le(empty, max_)])
+            else:
+                S = S.sum((0,1,3))
+                builder.addRows([ge(S, min_), le(S, max_)])
+        else:
+            D = terms(D)
+            S = S.sum((0,1,2,3)) if constraintsSet.mode2 == "GLOBAL" else S.sum((0,1,3))
+            builder.addRows([ge(D, min_ - S), ge(D, S - max_)])
+            builder.setObjective(D.cols, constraintsSet.penalty)
+
+
+# ## GA1
+
+def bulkGA1(model, builder):
+    H = model.exprs['H']
+    D_GA1 = model.D_GA1 = {}
+    for i,constraint_set in enumerate(model.instance.constraints['GA1']):
+        D = builder.addColumns((), 0, INFINITY, False)
+        D_GA1[i] = int(D)
+        homes = np.asarray(constraint_set.homes, dtype=np.int64)
+        aways = np.asarray(constraint_set.aways, dtype=np.int64)
+        slots_ = np.asarray(constraint_set.slots, dtype=np.int64)
+        S = H[homes[:,None], aways[:,None], slots_[None,:], 0].sum((0,1))
+        countSoft(builder, terms(D), S, constraint_set.min, constraint_set.max, constraint_set.penalty,
+                  constraint_set.type == "HARD")
+
+
+# ## BR1
+
+def bulkBR1(model, builder):
+    breakHome = model.exprs['breakHome']
+    breakAway = model.exprs['breakAway']
+    D_BR1 = model.D_BR1 = {}
+    for i,BR1_constraint in enumerate(model.instance.constraints['BR1']):
+        D = builder.addColumns((), 0, INFINITY, False)
+        D_BR1[i] = int(D)
+        D = terms(D)
+        # model.py sets the penalty of HARD elements too
+        builder.setObjective(D.cols, BR1_constraint.penalty)
+        team = BR1_constraint.teams[0]
+        slots_ = np.asarray(BR1_constraint.slots, dtype=np.int64)
+        if BR1_constraint.mode2 == 'HA':
+            breaks = (breakHome[team,slots_] + breakAway[team,slots_]).sum(0)
+        elif BR1_constraint.mode2 == 'H':
+            breaks = breakHome[team,slots_].sum(0)
+        else:
+            breaks = breakAway[team,slots_].sum(0)
+        rows = [ge(D, breaks - BR1_constraint.intp)]
+        if BR1_constraint.mode1 != "LEQ":
+            rows.append(ge(D, BR1_constraint.intp - breaks))
+        if BR1_constraint.type == "HARD":
+            rows.append(eq(D, 0))
+        builder.addRows(rows)
+
+
+# ## BR2
+
+def bulkBR2(model, builder):
+    breaks = (model.exprs['breakHome'] + model.exprs['breakAway']).sum((0,1))
+    D_BR2 = model.D_BR2 = {}
+    for i,BR2_constraint in enumerate(model.instance.constraints['BR2']):
+        D = builder.addColumns((), 0, INFINITY, False)
+        D_BR2[i] = int(D)
+        D = terms(D)
+        rows = [le(breaks, D + BR2_constraint.intp)]
+        if BR2_constraint.type == "HARD":
+            rows.append(eq(D, 0))
+        builder.addRows(rows)
+        if BR2_constraint.type != "HARD":
+            builder.setObjective(D.cols, BR2_constraint.penalty)
+
+
+# ## SE1
+
+def bulkSE1(model, builder):
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    constraints = model.instance.constraints['SE1']
+    D_SE1 = model.D_SE1 = {}
+    model.prod_SE1 = np.full((len(constraints),numTeams,numTeams,numSlots,numSlots), -1, dtype=np.int64)
+    slotList = slotPairs(model)
+    slotFirst, slotSecond = np.array(slotList, dtype=np.int64).reshape(-1, 2).T
+    teamPairMask, slotPairMask = pairMask(model), slotMask(model)
+    for l,SE1_constraint in enumerate(constraints):
+        k_min_se1 = SE1_constraint.min
+        members = np.zeros(numTeams, dtype=bool)
+        members[list(SE1_constraint.teams)] = True
+        pairs = (teamPairMask & np.outer(members, members))[:,:,None,None] & slotPairMask[None,None]
+        # D_SE1 of a slot pair, then its row, as model.py interleaves them
+        D = builder.addColumns((len(slotList),), 0, k_min_se1, False)
+        D_SE1.update(keyed([(l,s1,s2) for s1,s2 in slotList], D))
+        builder.addRows([ge(terms(D), k_min_se1 - slotSecond + slotFirst)])
+
+        Dtable = np.full((numSlots,numSlots), -1, dtype=np.int64)
+        Dtable[slotFirst, slotSecond] = D
+        prod = model.prod_SE1[l] = builder.addColumns(pairs.shape, 0, k_min_se1, False, pairs)
+        prod, D, y = terms(prod), terms(Dtable)[None,None], model.exprs['y']
+        rows = [le(prod, y*k_min_se1), le(prod, D), ge(prod, D - (1 - y)*k_min_se1)]
+        if SE1_constraint.type == "HARD":
+            rows.append(eq(prod, 0))
+        builder.addRows(rows, pairs)
+        if SE1_constraint.type != "HARD":
+            builder.setObjective(prod.cols, SE1_constraint.penalty*model.pairWeight)
+
+
+def bulkSE1Window(model, builder):
+    # See model.addSE1Window.
+    numSlots = model.numSlots
+    X = model.exprs['X']
+    v_SE1 = model.v_SE1 = {}
+    for l,SE1_constraint in enumerate(model.instance.constraints['SE1']):
+        k_min_se1 = SE1_constraint.min
+        hard = SE1_constraint.type == "HARD"
+        teams_ = sorted(SE1_constraint.teams)
+        pairs = [(i,j) for a,i in enumerate(teams_) for j in teams_[a+1:]]
+        windows = np.array([w for w in ([k_min_se1-1] if hard else range(1,k_min_se1)) if w >= 1], dtype=np.int64)
+        if not pairs or not len(windows):
+            continue
+        v = builder.addColumns((len(pairs),len(windows)), 0, 0 if hard else 1, False)
+        v_SE1.update(keyed([(l,i,j,w) for i,j in pairs for w in windows.tolist()], v))
+        first, second = np.array(pairs, dtype=np.int64).T
+        starts = np.arange(numSlots-1)
+        # window slots s+1..s+w of each (w, s), padded to the widest window
+        later = starts[None,:,None] + 1 + np.arange(windows.max())[None,None,:]
+        inWindow = (later <= starts[None,:,None] + windows[:,None,None]) & (later < numSlots)
+        pair = (first[:,None,None,None], second[:,None,None,None])
+        meetings = X[pair + (np.minimum(later, numSlots-1)[None],)].masked(inWindow[None]).sum(3)
+        builder.addRows([ge(terms(v)[:,:,None], X[pair[0][...,0], pair[1][...,0], starts[None,None,:]] + meetings - 1)])
+        if not hard:
+            builder.setObjective(v, SE1_constraint.penalty*2)
+
+
+# # FA2
+
+def bulkFA2(model, builder):
+    home = model.exprs['home']
+    D_FA2 = model.D_FA2 = {}
+    diff_FA2 = model.diff_FA2 = {}
+    for l,FA2_constraint in enumerate(model.instance.constraints['FA2']):
+        intp = FA2_constraint.intp
+        hard = FA2_constraint.type == "HARD"
+        teams = np.asarray(FA2_constraint.teams, dtype=np.int64)
+        pairs = np.ones((len(teams),len(teams)), dtype=bool)
+        if model.formulation == 'compact':
+            pairs = teams[:,None] < teams[None,:]
+        keys = [(i,j) for i in teams.tolist() for j in teams.tolist()]
+        for slot_FA2 in FA2_constraint.slots:
+            # D_FA2 then diff_FA2 per team pair
+            columns = builder.addColumns((len(teams),len(teams),2), 0, INFINITY, False, pairs[:,:,None])
+            D_FA2.update(keyed([(slot_FA2,i,j) for (i,j),kept in zip(keys, pairs.ravel()) if kept],
+                               columns[:,:,0][pairs]))
+            diff_FA2.update(keyed([(slot_FA2,i,j) for (i,j),kept in zip(keys, pairs.ravel()) if kept],
+                                  columns[:,:,1][pairs]))
+            homes = home[teams,:slot_FA2+1].sum(1)
+            home_i, home_j = homes[:,None], homes[None,:]
+            D, diff = terms(columns[:,:,0]), terms(columns[:,:,1])
+            rows = [ge(diff, home_i - home_j), ge(diff, home_j - home_i), ge(D, diff - intp)]
+            if hard:
+                rows.append(eq(D, 0))
+            builder.addRows(rows, pairs)
+            if not hard:
+                builder.setObjective(columns[:,:,0][pairs], FA2_constraint.penalty*model.pairWeight)
+
+
+def exportedModel(model):
+    proto = linear_solver_pb2.MPModelProto()
+    model.solver.ExportModelToProto(proto)
+    return proto
+
+
+def sameModel(first, second):
+    # True if two built models have the same columns, rows and objective.
+    return exportedModel(first) == exportedModel(second)
@@ -0,0 +1,338 @@
+# coding: utf-8
+# CP-SAT model of the ITC2021 double round robin.
+#
+# Same objective as the MIP in model.py, built on booleans: x[i,j,s] is true
+# when team i hosts team j in slot s, home[i,s] is the sum of x over opponents
+# and breaks are tied to home with AddBoolAnd/AddImplication instead of the
+# linearised breakHome/breakAway rows. SE1 uses the window encoding. Every
+# deviation term is an integer variable weighted by its penalty.
+from ortools.sat.python import cp_model
+from collections import defaultdict
+from solverSettings import SolverSettings, applyCpSettings
+import numpy as np
+import os
+
+
+class CpTimetableModel(object):
+
+    def __init__(self, instance):
+        self.instance = instance
+        self.numTeams = instance.numTeams
+        self.numSlots = instance.numSlots
+        self.halfSlot = instance.halfSlot
+        self.boolPhase = instance.boolPhase
+        self.model = cp_model.CpModel()
+        # family -> [(penalty, deviation variable)]
+        self.terms = defaultdict(list)
+        self.solver = None
+        self.homeGames = None
+        self.homeIndices = None
+
+    def size(self):
+        proto = self.model.Proto()
+        return len(proto.variables), len(proto.constraints)
+
+
+class IncumbentCallback(cp_model.CpSolverSolutionCallback):
+    # Calls function(objective, seconds, bound) for every solution CP-SAT
+    # finds; a true return value stops the search.
+
+    def __init__(self, function):
+        cp_model.CpSolverSolutionCallback.__init__(self)
+        self.function = function
+
+    def on_solution_callback(self):
+        if self.function(self.ObjectiveValue(), self.WallTime(), self.BestObjectiveBound()):
+            self.StopSearch()
+
+
+def buildCpModel(instance, phases=None):
+    # phases as in model.buildModel
+    model = CpTimetableModel(instance)
+    steps = [('core', addCore), ('breaks', addBreaks), ('CA1', addCA1), ('CA2', addCA2), ('CA3', addCA3),
+             ('CA4', addCA4), ('GA1', addGA1), ('BR1', addBR1), ('BR2', addBR2), ('SE1', addSE1), ('FA2', addFA2)]
+    for name,step in steps:
+        if phases is None:
+            step(model)
+            continue
+        with phases.phase(name, model.size):
+            step(model)
+    model.model.Minimize(sum(penalty*var for family in model.terms for penalty,var in model.terms[family]))
+    return model
+
+
+def solveCpModel(model, settings=SolverSettings(), callback=None):
+    # Without an explicit thread count CP-SAT searches on every core.
+    solver = model.solver = cp_model.CpSolver()
+    applyCpSettings(solver, settings, os.cpu_count() or 1)
+    return solver.Solve(model.model, callback)
+
+
+def deviation(model, family, expr, count, min_, max_, penalty, type_, lower=True):
+    # HARD: min <= expr <= max. SOFT: D >= min - expr, D >= expr - max, penalty*D.
+    m = model.model
+    if type_ == "HARD":
+        if lower:
+            m.Add(expr >= min_)
+        m.Add(expr <= max_)
+        return None
+    D = m.NewIntVar(0, max(count, min_, 0), '')
+    if lower:
+        m.Add(D >= min_ - expr)
+    m.Add(D >= expr - max_)
+    model.terms[family].append((penalty, D))
+    return D
+
+
+def H(model, i, j, s, h):
+    # Same meaning as H[i,j,s,h] in the MIP: h = 0 i hosts j, h = 1 j hosts i.
+    if i == j:
+        return 0
+    return model.x[i,j,s] if h == 0 else model.x[j,i,s]
+
+
+def modes(mode):
+    if mode == 'H':
+        return [0]
+    elif mode == 'A':
+        return [1]
+    return [0,1]
+
+
+def addCore(model):
+    m = model.model
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    x = model.x = {}
+    home = model.home = {}
+    for i in range(numTeams):
+        for j in range(numTeams):
+            if i != j:
+                for s in range(numSlots):
+                    x[i,j,s] = m.NewBoolVar('x[{0}][{1}][{2}]'.format(s,j,i))
+
+    # ### Every team plays exactly one game in every slot
+    for s in range(numSlots):
+        for i in range(numTeams):
+            m.AddExactlyOne([x[i,j,s] for j in range(numTeams) if j != i] + [x[j,i,s] for j in range(numTeams) if j != i])
+
+    # ### Every team hosts every other team exactly once
+    for i in range(numTeams):
+        for j in range(numTeams):
+            if i != j:
+                m.AddExactlyOne([x[i,j,s] for s in range(numSlots)])
+
+    # ### In phased mode every pair meets once in the first half
+    if (model.boolPhase):
+        for i in range(numTeams):
+            for j in range(i+1,numTeams):
+                m.AddExactlyOne([x[i,j,s] for s in range(model.halfSlot)] + [x[j,i,s] for s in range(model.halfSlot)])
+
+    for i in range(numTeams):
+        for s in range(numSlots):
+            home[i,s] = m.NewBoolVar('home[{0}][{1}]'.format(s,i))
+            m.Add(home[i,s] == sum(x[i,j,s] for j in range(numTeams) if j != i))
+
+
+def addBreaks(model):
+    m = model.model
+    home = model.home
+    breakHome = model.breakHome = {}
+    breakAway = model.breakAway = {}
+    for i in range(model.numTeams):
+        breakHome[i,0] = breakAway[i,0] = 0
+        for s in range(1,model.numSlots):
+            bh = breakHome[i,s] = m.NewBoolVar('breakHome[{0}][{1}]'.format(s,i))
+            ba = breakAway[i,s] = m.NewBoolVar('breakAway[{0}][{1}]'.format(s,i))
+            m.AddBoolAnd([home[i,s], home[i,s-1]]).OnlyEnforceIf(bh)
+            m.AddImplication(home[i,s-1], bh).OnlyEnforceIf(home[i,s])
+            m.AddBoolAnd([home[i,s].Not(), home[i,s-1].Not()]).OnlyEnforceIf(ba)
+            m.AddImplication(home[i,s-1].Not(), ba).OnlyEnforceIf(home[i,s].Not())
+
+
+# ## CA1
+
+def addCA1(model):
+    for constraintsSet in model.instance.constraints['CA1']:
+        for t in constraintsSet.teams:
+            if constraintsSet.mode == 'H':
+                games = sum(model.home[t,s] for s in constraintsSet.slots)
+            else:
+                games = sum(1 - model.home[t,s] for s in constraintsSet.slots)
+            deviation(model, 'CA1', games, len(constraintsSet.slots), constraintsSet.min, constraintsSet.max,
+                      constraintsSet.penalty, constraintsSet.type)
+
+
+# ## CA2
+
+def addCA2(model):
+    for constraintsSet in model.instance.constraints['CA2']:
+        mod = modes(constraintsSet.mode1)
+        for t in constraintsSet.teams1:
+            games = sum(H(model,t,j,s,h) for j in constraintsSet.teams2 for s in constraintsSet.slots for h in mod)
+            deviation(model, 'CA2', games, len(constraintsSet.slots), constraintsSet.min, constraintsSet.max,
+                      constraintsSet.penalty, constraintsSet.type)
+
+
+# ## CA3
+
+def addCA3(model):
+    for constraintsSet in model.instance.constraints['CA3']:
+        mod = modes(constraintsSet.mode1)
+        intp = constraintsSet.intp
+        for l in range(model.numSlots - intp + 1):
+            for t in constraintsSet.teams1:
+                games = sum(H(model,t,j,s,h) for j in constraintsSet.teams2 for s in range(l,l+intp) for h in mod)
+                deviation(model, 'CA3', games, intp, constraintsSet.min, constraintsSet.max,
+                          constraintsSet.penalty, constraintsSet.type)
+
+
+# ## CA4
+
+def addCA4(model):
+    m = model.model
+    for constraintsSet in model.instance.constraints['CA4']:
+        mod = modes(constraintsSet.mode1)
+        teams1 = constraintsSet.teams1
+        teams2 = constraintsSet.teams2
+        count = len(teams1)*len(teams2)
+        if constraintsSet.mode2 == "GLOBAL":
+            games = sum(H(model,i,j,s,h) for i in teams1 for j in teams2 for s in constraintsSet.slots for h in mod)
+            deviation(model, 'CA4', games, count*len(constraintsSet.slots), constraintsSet.min, constraintsSet.max,
+                      constraintsSet.penalty, constraintsSet.type)
+        elif constraintsSet.type == "HARD":
+            for s in constraintsSet.slots:
+                games = sum(H(model,i,j,s,h) for i in teams1 for j in teams2 for h in mod)
+                m.Add(games >= constraintsSet.min)
+                m.Add(games <= constraintsSet.max)
+        else:
+            # One deviation bounds the worst slot, as in the MIP.
+            D = m.NewIntVar(0, max(count, constraintsSet.min), '')
+            for s in constraintsSet.slots:
+                games = sum(H(model,i,j,s,h) for i in teams1 for j in teams2 for h in mod)
+                m.Add(D >= constraintsSet.min - games)
+                m.Add(D >= games - constraintsSet.max)
+            model.terms['CA4'].append((constraintsSet.penalty, D))
+
+
+# ## GA1
+
+def addGA1(model):
+    for constraint_set in model.instance.constraints['GA1']:
+        games = sum(model.x[h,a,s] for h,a in zip(constraint_set.homes,constraint_set.aways) for s in constraint_set.slots)
+        deviation(model, 'GA1', games, len(constraint_set.homes)*len(constraint_set.slots), constraint_set.min,
+                  constraint_set.max, constraint_set.penalty, constraint_set.type)
+
+
+# ## BR1
+
+def addBR1(model):
+    for BR1_constraint in model.instance.constraints['BR1']:
+        t = BR1_constraint.teams[0]
+        slots_ = BR1_constraint.slots
+        if BR1_constraint.mode2 == 'HA':
+            breaks = sum(model.breakHome[t,s] + model.breakAway[t,s] for s in slots_)
+        elif BR1_constraint.mode2 == 'H':
+            breaks = sum(model.breakHome[t,s] for s in slots_)
+        else:
+            breaks = sum(model.breakAway[t,s] for s in slots_)
+        deviation(model, 'BR1', breaks, len(slots_), BR1_constraint.intp, BR1_constraint.intp,
+                  BR1_constraint.penalty, BR1_constraint.type, lower=BR1_constraint.mode1 != "LEQ")
+
+
+# ## BR2
+
+def addBR2(model):
+    breaks = sum(model.breakHome[t,s] + model.breakAway[t,s] for t in range(model.numTeams) for s in range(1,model.numSlots))
+    for BR2_constraint in model.instance.constraints['BR2']:
+        deviation(model, 'BR2', breaks, model.numTeams*model.numSlots, 0, BR2_constraint.intp,
+                  BR2_constraint.penalty, BR2_constraint.type, lower=False)
+
+
+# ## SE1
+# v[l,i,j,w] is true when pair (i,j) meets twice within w slots; see addSE1Window in model.py.
+
+def addSE1(model):
+    m = model.model
+    numSlots = model.numSlots
+    x = model.x
+    v_SE1 = model.v_SE1 = {}
+    for l,SE1_constraint in enumerate(model.instance.constraints['SE1']):
+        k_min_se1 = SE1_constraint.min
+        hard = SE1_constraint.type == "HARD"
+        teams_ = sorted(SE1_constraint.teams)
+        windows = [k_min_se1-1] if hard else range(1,k_min_se1)
+        for a,i in enumerate(teams_):
+            for j in teams_[a+1:]:
+                meet = [x[i,j,s] + x[j,i,s] for s in range(numSlots)]
+                for w in windows:
+                    if w < 1:
+                        continue
+                    v = v_SE1[l,i,j,w] = m.NewBoolVar('v_SE1[{0}][{1}][{2}][{3}]'.format(w,j,i,l))
+                    for s in range(numSlots-1):
+                        m.Add(v >= meet[s] + sum(meet[s+1:s+w+1]) - 1)
+                    if hard:
+                        m.Add(v == 0)
+                    else:
+                        model.terms['SE1'].append((SE1_constraint.penalty*2, v))
+
+
+# # FA2
+
+def addFA2(model):
+    m = model.model
+    home = model.home
+    for FA2_constraint in model.instance.constraints['FA2']:
+        teams_ = sorted(FA2_constraint.teams)
+        intp = FA2_constraint.intp
+        for slot in FA2_constraint.slots:
+            for a,i in enumerate(teams_):
+                for j in teams_[a+1:]:
+                    home_i = sum(home[i,s] for s in range(slot+1))
+                    home_j = sum(home[j,s] for s in range(slot+1))
+                    if FA2_constraint.type == "HARD":
+                        m.Add(home_i - home_j <= intp)
+                        m.Add(home_j - home_i <= intp)
+                        continue
+                    D = m.NewIntVar(0, slot+1, '')
+                    m.Add(D >= home_i - home_j - intp)
+                    m.Add(D >= home_j - home_i - intp)
+                    model.terms['FA2'].append((FA2_constraint.penalty*2, D))
+
+
+def scheduleArray(model, response=None):
+    # (slot, home, away) rows of the solved schedule, or of the solution in
+    # response (a solution callback's Response()); the x indices are gathered
+    # once per model and the values read from the response in bulk.
+    if model.homeIndices is None:
+        s, i, j = np.indices((model.numSlots, model.numTeams, model.numTeams)).reshape(3, -1)
+        model.homeGames = np.stack([s, i, j], axis=1)[i != j].astype(np.int32)
+        x = model.x
+        model.homeIndices = np.array([x[i,j,s].Index() for s,i,j in model.homeGames.tolist()], dtype=np.int64)
+    if response is None:
+        response = model.solver.ResponseProto()
+    values = np.asarray(response.solution, dtype=np.int64)
+    return model.homeGames[values[model.homeIndices] > 0]
+
+
+def scheduledGames(model):
+    return [tuple(game) for game in scheduleArray(model).tolist()]
+
+
+def penaltyValues(model):
+    # Objective split per constraint family; SE1 is reported the same way as
+    # penaltyValues in model.py, (1 + shortfall)*penalty per pair.
+    solver = model.solver
+    objectiveVal = defaultdict(int)
+    for family in ('CA1','CA2','CA3','CA4','GA1','BR1','BR2','FA2'):
+        objectiveVal[family] = sum(penalty*solver.Value(var) for penalty,var in model.terms[family])
+    objectiveVal['SE1'] = 0
+    for l,SE1_constraint in enumerate(model.instance.constraints['SE1']):
+        shortfall = defaultdict(int)
+        for (l_,i,j,w),v in model.v_SE1.items():
+            if l_ == l:
+                shortfall[i,j] += solver.Value(v)
+        for value in shortfall.values():
+            if value > 0:
+                objectiveVal['SE1'] += (1+value)*SE1_constraint.penalty
+    return objectiveVal
@@ -0,0 +1,140 @@
+# coding: utf-8
+# Two-phase decomposition: home/away patterns first, then opponents.
+#
+# Phase one optimises the home/away pattern families (CA1, BR1, BR2, FA2) on
+# the compact core of model.py, which keeps the pattern set realisable: the
+# pairwise pattern conditions (half the teams at home per slot, a slot with i
+# home and j away for every ordered pair) are not sufficient on phased
+# instances. The HARD rows of CA2-CA4, GA1 and SE1 are kept as well, with the
+# soft deviations of those families left out of the objective, because their
+# home/away parts otherwise made every proposed pattern set infeasible on
+# Test1/Test3/Test4. Phase two is the compact model with x fixed to zero
+# wherever the pattern rules the game out, so it only chooses opponents and
+# scores CA2-CA4, GA1 and SE1; it is hinted with the phase one schedule. If
+# phase two finds no schedule within its limits the pattern set is cut off with
+# a no-good row and phase one is solved again. When no pattern set succeeds the
+# last phase one schedule, which meets every hard row, is returned.
+#
+# Phase one is therefore not a small pattern model: it carries every x of the
+# compact core. Home/break variables with pairwise pattern cuts alone proposed
+# pattern sets that phase two could not complete, and the loop back then spent
+# the whole run on no-goods. With the larger model phase two seldom fails, so
+# the no-good loop mostly matters when phase two runs out of time. One time
+# limit covers the whole run: phase one gets half of the time left and phase
+# two the rest. The result is reported as FEASIBLE, never OPTIMAL, because
+# phase two only optimises over one pattern set.
+from model import TimetableModel, buildModel, entries, addCompactCore, addCA1, addCA2, addCA3, addCA4, addGA1, addBR1, addBR2, addSE1Window, addFA2
+from solverSettings import solveMip
+import time
+
+# share of the time left that a phase one solve gets
+PHASE_ONE_SHARE = 0.5
+# limit of the solve that reads back the phase one schedule, with every x fixed
+FIXED_SCHEDULE_TIME = 1.0
+
+
+def buildPatternModel(instance, solverName='CBC'):
+    model = TimetableModel(instance, 'compact', None, solverName)
+    addCompactCore(model)
+    addCA1(model)
+    addBR1(model)
+    addBR2(model)
+    addFA2(model)
+    addCA2(model)
+    addCA3(model)
+    addCA4(model)
+    addGA1(model)
+    addSE1Window(model)
+    for deviations in (model.D_CA2, model.D_CA3, model.D_CA4, model.D_GA1, model.v_SE1):
+        for var in deviations.values():
+            model.objective.SetCoefficient(var, 0)
+    model.objective.SetMinimization()
+    return model
+
+
+def patternValues(model):
+    return {(i,s): int(round(expr.solution_value())) for (i,s),expr in entries(model.home)}
+
+
+def fixPattern(model, pattern):
+    # x[i,j,s] can only be 1 when i is at home and j away in s
+    for (i,j,s),var in entries(model.x):
+        var.SetBounds(0, pattern[i,s]*(1-pattern[j,s]))
+
+
+def scheduleValues(model):
+    return {key: int(round(var.solution_value())) for key,var in entries(model.x)}
+
+
+def fixSchedule(model, schedule):
+    for key,var in entries(model.x):
+        var.SetBounds(schedule[key], schedule[key])
+
+
+def addNoGood(model, pattern):
+    solver = model.solver
+    solver.Add(solver.Sum([1 - model.home[key] if value else model.home[key] for key,value in pattern.items()]) >= 1)
+
+
+def shareSettings(settings, begin, share):
+    # settings limited to share of the time left; None once the limit is spent
+    if not settings.timeLimit:
+        return settings
+    remaining = settings.timeLimit - (time.perf_counter() - begin)
+    if remaining <= 0:
+        return None
+    return settings._replace(timeLimit=remaining*share)
+
+
+def solveDecomposed(instance, se1, settings, maxPatterns=10):
+    # Returns the phase two model (compact formulation), its status, the
+    # ignored settings and [(phase one seconds, phase two seconds)] per pattern.
+    # An OPTIMAL phase two is reported as FEASIBLE.
+    begin = time.perf_counter()
+    patternModel = buildPatternModel(instance, settings.solver)
+    model = buildModel(instance, 'compact', se1, settings.solver)
+    print("phase 1 variables = ",patternModel.size()[0]," rows = ",patternModel.size()[1],
+          " phase 2 variables = ",model.size()[0]," rows = ",model.size()[1],
+          " build = ",round(time.perf_counter() - begin,3))
+    timings = []
+    status, ignored = None, []
+    schedule = None
+    solved = False
+    runBegin = time.perf_counter()
+    for attempt in range(maxPatterns):
+        phaseSettings = shareSettings(settings, runBegin, PHASE_ONE_SHARE)
+        if phaseSettings is None:
+            print("pattern ",attempt," time limit reached")
+            break
+        begin = time.perf_counter()
+        status, ignored = solveMip(patternModel.solver, phaseSettings)
+        phaseOne = time.perf_counter() - begin
+        if status not in (patternModel.solver.OPTIMAL, patternModel.solver.FEASIBLE):
+            print("pattern ",attempt," phase 1 status = ",status," time = ",round(phaseOne,3))
+            timings.append((phaseOne, 0.0))
+            break
+        pattern = patternValues(patternModel)
+        schedule = scheduleValues(patternModel)
+        fixPattern(model, pattern)
+        model.solver.SetHint([model.x[key] for key in schedule], [schedule[key] for key in schedule])
+        phaseSettings = shareSettings(settings, runBegin, 1.0) or settings._replace(timeLimit=FIXED_SCHEDULE_TIME)
+        begin = time.perf_counter()
+        status, ignored = solveMip(model.solver, phaseSettings)
+        phaseTwo = time.perf_counter() - begin
+        timings.append((phaseOne, phaseTwo))
+        print("pattern ",attempt," phase 1 objective = ",patternModel.objective.Value()," time = ",round(phaseOne,3),
+              " phase 2 status = ",status," time = ",round(phaseTwo,3))
+        solved = status in (model.solver.OPTIMAL, model.solver.FEASIBLE)
+        if solved:
+            break
+        addNoGood(patternModel, pattern)
+    if not solved and schedule:
+        print("no pattern set solved in phase 2, keeping the last phase 1 schedule")
+        fixSchedule(model, schedule)
+        status, ignored = solveMip(model.solver, shareSettings(settings, runBegin, 1.0)
+                                   or settings._replace(timeLimit=FIXED_SCHEDULE_TIME))
+    print("phase 1 total = ",round(sum(t[0] for t in timings),3)," phase 2 total = ",round(sum(t[1] for t in timings),3),
+          " patterns = ",len(timings))
+    if status == model.solver.OPTIMAL:
+        status = model.solver.FEASIBLE
+    return model, status, ignored, timings
@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Vectorized ITC2021 evaluator.
+#
+# A schedule is an (n x n x s) 0/1 array G with G[i,j,s] = 1 when team i hosts
+# team j in slot s; a batch is a (b x n x n x s) array. Every constraint type is
+# evaluated for the whole batch with array operations, following the deviation
+# rules of the ITC2021 organisation document (OrganizationITC2021_V4.pdf):
+# soft deviations times penalty give the objective, hard ones the infeasibility.
+from typing import NamedTuple
+import xml.etree.ElementTree as ElementTree
+import numpy as np
+import argparse
+import sys
+
+FAMILIES = ('CA1', 'CA2', 'CA3', 'CA4', 'GA1', 'BR1', 'BR2', 'FA2', 'SE1')
+MODES = {'H': 0, 'A': 1, 'HA': 2}
+
+
+class Score(NamedTuple):
+    objective: np.ndarray        # (b,) weighted soft deviations
+    infeasibility: np.ndarray    # (b,) weighted hard deviations plus structure errors
+    structure: np.ndarray        # (b,) violated double round robin rules
+    penalties: dict              # family -> (b,) weighted soft deviations
+    violations: dict             # family -> (b,) weighted hard deviations
+    deviations: dict             # family -> (b, constraints) unweighted deviations
+
+
+def homeArray(games, numTeams, numSlots):
+    G = np.zeros((numTeams, numTeams, numSlots), dtype=np.int8)
+    for s,i,j in games:
+        G[i,j,s] = 1
+    return G
+
+
+def loadSolution(fileName, numTeams, numSlots):
+    games = []
+    for event, elem in ElementTree.iterparse(fileName, events=('end',)):
+        if elem.tag == 'ScheduledMatch':
+            games.append((int(elem.get('slot')), int(elem.get('home')), int(elem.get('away'))))
+            elem.clear()
+    return homeArray(games, numTeams, numSlots)
+
+
+def teamMask(teams, numTeams):
+    mask = np.zeros(numTeams, dtype=np.float32)
+    mask[list(teams)] = 1
+    return mask
+
+
+def slotMask(slots, numSlots):
+    mask = np.zeros(numSlots, dtype=np.float32)
+    mask[list(slots)] = 1
+    return mask
+
+
+def outside(count, min_, max_):
+    return np.maximum(count - max_, 0) + np.maximum(min_ - count, 0)
+
+
+class Evaluator(object):
+    # Constraint data is turned into index and mask arrays once per instance;
+    # evaluate() then only runs array operations over the batch.
+
+    def __init__(self, instance):
+        self.instance = instance
+        n = self.numTeams = instance.numTeams
+        S = self.numSlots = instance.numSlots
+        self.halfSlot = instance.halfSlot
+        self.boolPhase = instance.boolPhase
+        constraints = instance.constraints
+        self.families = {}
+
+        def common(records, rows):
+            penalty = np.array([records[r].penalty for r in rows], dtype=np.int64)
+            hard = np.array([records[r].type == 'HARD' for r in rows], dtype=bool)
+            return {'penalty': penalty, 'hard': hard, 'owner': np.array(rows, dtype=np.int64)}
+
+        # One row per (constraint, team) for the per-team families.
+        records = constraints['CA1']
+        rows = [(r,t) for r,c in enumerate(records) for t in c.teams]
+        if rows:
+            self.families['CA1'] = dict(common(records, [r for r,t in rows]),
+                team=np.array([t for r,t in rows]), mode=np.array([MODES[records[r].mode] for r,t in rows]),
+                slots=np.array([slotMask(records[r].slots, S) for r,t in rows]),
+                min=np.array([records[r].min for r,t in rows]), max=np.array([records[r].max for r,t in rows]))
+
+        for family in ('CA2', 'CA3'):
+            records = constraints[family]
+            rows = [(r,t) for r,c in enumerate(records) for t in c.teams1]
+            if rows:
+                data = dict(common(records, [r for r,t in rows]),
+                    team=np.array([t for r,t in rows]), mode=np.array([MODES[records[r].mode1] for r,t in rows]),
+                    teams2=np.array([teamMask(records[r].teams2, n) for r,t in rows]),
+                    min=np.array([records[r].min for r,t in rows]), max=np.array([records[r].max for r,t in rows]))
+                if family == 'CA2':
+                    data['slots'] = np.array([slotMask(records[r].slots, S) for r,t in rows])
+                else:
+                    # windows[c,l,s] = 1 if slot s lies in the window of intp slots starting at l
+                    windows = np.zeros((len(rows), S, S), dtype=np.float32)
+                    for c,(r,t) in enumerate(rows):
+                        intp = records[r].intp
+                        for l in range(S - intp + 1):
+                            windows[c, l, l:l+intp] = 1
+                    data['windows'] = windows
+                    data['valid'] = windows.any(-1)
+                self.families[family] = data
+
+        records = constraints['CA4']
+        if records:
+            self.families['CA4'] = dict(common(records, range(len(records))),
+                mode=np.array([MODES[c.mode1] for c in records]),
+                teams1=np.array([teamMask(c.teams1, n) for c in records]),
+                teams2=np.array([teamMask(c.teams2, n) for c in records]),
+                slots=np.array([slotMask(c.slots, S) for c in records]),
+                every=np.array([c.mode2 == 'EVERY' for c in records]),
+                min=np.array([c.min for c in records]), max=np.array([c.max for c in records]))
+
+        records = constraints['GA1']
+        if records:
+            meetings = np.zeros((len(records), n, n), dtype=np.float32)
+            for c,record in enumerate(records):
+                meetings[c, list(record.homes), list(record.aways)] = 1
+            self.families['GA1'] = dict(common(records, range(len(records))), meetings=meetings,
+                slots=np.array([slotMask(c.slots, S) for c in records]),
+                min=np.array([c.min for c in records]), max=np.array([c.max for c in records]))
+
+        records = constraints['BR1']
+        rows = [(r,t) for r,c in enumerate(records) for t in c.teams]
+        if rows:
+            self.families['BR1'] = dict(common(records, [r for r,t in rows]),
+                team=np.array([t for r,t in rows]), mode=np.array([MODES[records[r].mode2] for r,t in rows]),
+                slots=np.array([slotMask(records[r].slots, S) for r,t in rows]),
+                intp=np.array([records[r].intp for r,t in rows]),
+                leq=np.array([records[r].mode1 == 'LEQ' for r,t in rows]))
+
+        records = constraints['BR2']
+        if records:
+            self.families['BR2'] = dict(common(records, range(len(records))),
+                teams=np.array([teamMask(c.teams, n) for c in records]),
+                slots=np.array([slotMask(c.slots, S) for c in records]),
+                intp=np.array([c.intp for c in records]))
+
+        # FA2/SE1 apply to every pair i < j of teams.
+        for family in ('FA2', 'SE1'):
+            records = constraints[family]
+            if records:
+                pairs = np.zeros((len(records), n, n), dtype=np.float32)
+                for c,record in enumerate(records):
+                    mask = teamMask(record.teams, n)
+                    pairs[c] = np.triu(np.outer(mask, mask), 1)
+                data = dict(common(records, range(len(records))), pairs=pairs)
+                if family == 'FA2':
+                    data['slots'] = np.array([slotMask(c.slots, S) for c in records]).astype(bool)
+                    data['intp'] = np.array([c.intp for c in records])
+                else:
+                    data['min'] = np.array([c.min for c in records])
+                self.families[family] = data
+
+    def evaluate(self, G):
+        G = np.asarray(G)
+        if G.ndim == 3:
+            G = G[None]
+        # float32 keeps the counts exact and lets einsum use BLAS.
+        G = G.astype(np.float32)
+        batch = G.shape[0]
+        S = self.numSlots
+        Gt = G.transpose(0, 2, 1, 3)
+        # games[m][b,i,j,s]: i plays j in s at home (m = 0), away (1), either (2)
+        games = (G, Gt, G + Gt)
+        home = G.sum(2)
+        away = G.sum(1)
+        homeAway = np.stack([home, away, home + away], 1)          # (b,3,n,s)
+        breakHome = np.zeros_like(home)
+        breakAway = np.zeros_like(home)
+        breakHome[:, :, 1:] = home[:, :, 1:]*home[:, :, :-1]
+        breakAway[:, :, 1:] = away[:, :, 1:]*away[:, :, :-1]
+        breaks = np.stack([breakHome, breakAway, breakHome + breakAway], 1)
+
+        deviations = {}
+        for family, data in self.families.items():
+            if family == 'CA1':
+                count = (homeAway[:, data['mode'], data['team'], :]*data['slots']).sum(-1)
+                dev = outside(count, data['min'], data['max'])
+            elif family in ('CA2', 'CA3'):
+                perSlot = np.zeros((batch, len(data['team']), S), dtype=np.float32)
+                for m in range(3):
+                    rows = np.nonzero(data['mode'] == m)[0]
+                    if len(rows):
+                        sub = games[m][:, data['team'][rows]]                # (b,c,n,s)
+                        perSlot[:, rows] = np.einsum('bcjs,cj->bcs', sub, data['teams2'][rows])
+                if family == 'CA2':
+                    dev = outside((perSlot*data['slots']).sum(-1), data['min'], data['max'])
+                else:
+                    window = np.einsum('bcs,cls->bcl', perSlot, data['windows'])
+                    dev = (outside(window, data['min'][:, None], data['max'][:, None])*data['valid']).sum(-1)
+            elif family == 'CA4':
+                perSlot = np.zeros((batch, len(data['mode']), S), dtype=np.float32)
+                for m in range(3):
+                    rows = np.nonzero(data['mode'] == m)[0]
+                    if len(rows):
+                        perSlot[:, rows] = np.einsum('bijs,ci,cj->bcs', games[m], data['teams1'][rows],
+                                                     data['teams2'][rows], optimize=True)
+                perSlot = perSlot*data['slots']
+                globalDev = outside(perSlot.sum(-1), data['min'], data['max'])
+                everyDev = (outside(perSlot, data['min'][:, None], data['max'][:, None])*data['slots']).sum(-1)
+                dev = np.where(data['every'], everyDev, globalDev)
+            elif family == 'GA1':
+                count = np.einsum('bijs,cij,cs->bc', G, data['meetings'], data['slots'], optimize=True)
+                dev = outside(count, data['min'], data['max'])
+            elif family == 'BR1':
+                count = (breaks[:, data['mode'], data['team'], :]*data['slots']).sum(-1)
+                dev = np.where(data['leq'], np.maximum(count - data['intp'], 0), np.abs(count - data['intp']))
+            elif family == 'BR2':
+                count = np.einsum('bis,ci,cs->bc', breaks[:, 2], data['teams'], data['slots'], optimize=True)
+                dev = np.maximum(count - data['intp'], 0)
+            elif family == 'FA2':
+                played = home.cumsum(-1)
+                diff = np.abs(played[:, :, None, :] - played[:, None, :, :])   # (b,n,n,s)
+                dev = np.zeros((batch, len(data['intp'])), dtype=np.int64)
+                for c in range(len(data['intp'])):
+                    largest = diff[..., data['slots'][c]].max(-1)
+                    dev[:, c] = (np.maximum(largest - data['intp'][c], 0)*data['pairs'][c]).sum((1, 2))
+            elif family == 'SE1':
+                meet = games[2]
+                first = meet.argmax(-1)
+                last = S - 1 - meet[..., ::-1].argmax(-1)
+                gap = last - first - 1
+                shortfall = np.maximum(data['min'][None, :, None, None] - gap[:, None], 0)
+                dev = (shortfall*data['pairs'][None]).sum((2, 3))
+            deviations[family] = np.rint(dev).astype(np.int64)
+
+        # Double round robin structure: one game per team and slot, every
+        # ordered pair hosted exactly once, one meeting per half when phased.
+        n = self.numTeams
+        offDiagonal = 1 - np.eye(n, dtype=np.float32)
+        structure = np.abs(home + away - 1).sum((1, 2))
+        structure += (np.abs(G.sum(-1) - offDiagonal)).sum((1, 2))
+        if self.boolPhase:
+            firstHalf = games[2][..., :self.halfSlot].sum(-1)
+            structure += (np.abs(firstHalf - offDiagonal)).sum((1, 2))//2
+        structure = np.rint(structure).astype(np.int64)
+
+        penalties = {}
+        violations = {}
+        for family in FAMILIES:
+            if family in deviations:
+                weighted = deviations[family]*self.families[family]['penalty']
+                hard = self.families[family]['hard']
+                penalties[family] = (weighted*~hard).sum(-1)
+                violations[family] = (weighted*hard).sum(-1)
+            else:
+                penalties[family] = np.zeros(batch, dtype=np.int64)
+                violations[family] = np.zeros(batch, dtype=np.int64)
+        objective = sum(penalties.values())
+        infeasibility = sum(violations.values()) + structure
+        return Score(objective, infeasibility, structure, penalties, violations, deviations)
+
+
+def printScore(evaluator, score, b=0, verbose=False):
+    print("{0:<6}{1:>12}{2:>15}".format('', 'objective', 'infeasibility'))
+    for family in FAMILIES:
+        print("{0:<6}{1:>12}{2:>15}".format(family, score.penalties[family][b], score.violations[family][b]))
+    print("{0:<6}{1:>12}{2:>15}".format('total', score.objective[b], score.infeasibility[b]))
+    if score.structure[b]:
+        print("structure errors = ", score.structure[b])
+    if verbose:
+        for family, dev in score.deviations.items():
+            data = evaluator.families[family]
+            for c in np.nonzero(dev[b])[0]:
+                kind = 'HARD' if data['hard'][c] else 'SOFT'
+                print("{0}[{1}] {2} deviation = {3} penalty = {4}".format(family, data['owner'][c], kind, dev[b, c], data['penalty'][c]))
+
+
+def main(argv=None):
+    from instance import loadInstance
+    parser = argparse.ArgumentParser(description='Score ITC2021 solution files with the ITC2021 rules.')
+    parser.add_argument('instance', help='ITC2021 instance XML')
+    parser.add_argument('solutions', nargs='*', help='solution XML files (default: <instance>_solution.xml)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='list every violated constraint')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    instance = loadInstance(args.instance)
+    evaluator = Evaluator(instance)
+    solutions = args.solutions or [args.instance[:-4]+'_solution.xml']
+    batch = np.stack([loadSolution(fileName, instance.numTeams, instance.numSlots) for fileName in solutions])
+    score = evaluator.evaluate(batch)
+    for b, fileName in enumerate(solutions):
+        print(fileName)
+        printScore(evaluator, score, b, args.verbose)
+    # Non-zero exit when a schedule breaks a hard constraint, for CI checks.
+    return int(score.infeasibility.any())
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# coding: utf-8
+# Rolling-horizon fix-and-relax over slots.
+#
+# The game variables (X and H of the full core, x of the compact one) are
+# integer only inside a window of consecutive slots; later slots are relaxed
+# to continuous and earlier ones are fixed. Each step solves, fixes the first
+# window - overlap slots of the window at their values and moves on, so the
+# last step solves the final slots as integers with everything before them
+# fixed. On phased instances a window never crosses the middle of the season.
+# The other integer columns (breaks, y, ...) stay integer throughout. A step
+# without a solution backtracks: the block fixed last is freed and the step is
+# solved again with its window widened over that block. The run fails only
+# when nothing is left to free or the time runs out; the time limit is shared
+# between the steps still to come.
+from model import entries
+from solverSettings import solveMip
+from ortools.linear_solver import pywraplp
+import time
+
+
+def slotVariables(model):
+    # [[game variables of slot s]] for s in range(numSlots)
+    mappings = [model.x] if model.formulation == 'compact' else [model.X, model.H]
+    variables = [[] for s in range(model.numSlots)]
+    for mapping in mappings:
+        for key, var in entries(mapping):
+            if isinstance(var, pywraplp.Variable):
+                variables[key[2]].append(var)
+    return variables
+
+
+def windowEnd(start, numSlots, halfSlot, boolPhase, window, overlap):
+    # (end, fixed end): slots [start, end) are integer, slots [start, fixed
+    # end) are fixed after the step.
+    limit = halfSlot if boolPhase and start < halfSlot else numSlots
+    end = min(start + window, limit)
+    return end, end if end == limit else max(end - overlap, start + 1)
+
+
+def solveFixAndRelax(model, settings, window, overlap=0):
+    # Returns the status, the ignored settings and [(start, end, status,
+    # objective, seconds)] per step. A step without a solution frees the
+    # block fixed last and solves again with the window widened over it.
+    solver = model.solver
+    numSlots = model.numSlots
+    variables = slotVariables(model)
+    bounds = dict((var.index(), (var.lb(), var.ub())) for slot in variables for var in slot)
+    for slot in variables:
+        for var in slot:
+            var.SetInteger(False)
+    begin = time.perf_counter()
+    steps = []
+    fixedBlocks = []
+    status, ignored = solver.NOT_SOLVED, []
+    start = 0
+    end, fixedEnd = windowEnd(start, numSlots, model.halfSlot, model.boolPhase, window, overlap)
+    while True:
+        for s in range(start, end):
+            for var in variables[s]:
+                var.SetInteger(True)
+        stepSettings = settings
+        if settings.timeLimit:
+            remaining = settings.timeLimit - (time.perf_counter() - begin)
+            if remaining <= 0:
+                status = solver.NOT_SOLVED
+                break
+            stepsLeft = -(-(numSlots - start)//max(window - overlap, 1))
+            stepSettings = settings._replace(timeLimit=remaining/max(stepsLeft, 1))
+        stepBegin = time.perf_counter()
+        status, ignored = solveMip(solver, stepSettings)
+        seconds = time.perf_counter() - stepBegin
+        found = status in (solver.OPTIMAL, solver.FEASIBLE)
+        objective = solver.Objective().Value() if found else None
+        steps.append((start, end, status, objective, seconds))
+        print("fix-and-relax slots ",start,"-",end - 1," status = ",status," objective = ",objective,
+              " time = ",round(seconds,3))
+        if not found:
+            if not fixedBlocks:
+                break
+            # free the last fixed block and widen the window over it
+            start, ignoredEnd = fixedBlocks.pop()
+            for s in range(start, ignoredEnd):
+                for var in variables[s]:
+                    var.SetBounds(*bounds[var.index()])
+            fixedEnd = max(fixedEnd, ignoredEnd)
+            print("fix-and-relax: backtracking to slot ",start)
+            continue
+        if end == numSlots:
+            break
+        # read every value first: changing a bound discards the solution
+        values = [[round(var.solution_value()) for var in variables[s]] for s in range(start, fixedEnd)]
+        for s in range(start, fixedEnd):
+            for var, value in zip(variables[s], values[s - start]):
+                var.SetBounds(value, value)
+        fixedBlocks.append((start, fixedEnd))
+        start = fixedEnd
+        end, fixedEnd = windowEnd(start, numSlots, model.halfSlot, model.boolPhase, window, overlap)
+    if status == solver.OPTIMAL and fixedBlocks:
+        # optimal for the last window only
+        status = solver.FEASIBLE
+    return status, ignored, steps
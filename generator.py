@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Synthetic ITC2021 instances for scaling studies.
+#
+# Constraints are drawn in the shapes the ITC2021 test instances use (one team
+# per CA1/CA2/CA3/BR1, two-team CA4 groups, GA1 meeting sets, global BR2, FA2
+# and SE1 over all teams). The number of constraints of a type is its density
+# times the number of teams; the fractional part is drawn, so a density of 0.1
+# gives a global constraint on about one instance in ten at 6 teams and two at
+# 20 teams. Each constraint is HARD with probability hardRatio. With planted,
+# a circle-method schedule (warmStart.py) is drawn first and every HARD bound
+# it breaks is loosened one step at a time until it meets them all, so each
+# record is widened by its own largest violation and the instance is feasible;
+# the schedule is written next to the instance as <name>_planted.xml. Output
+# is the XML schema instance.py reads; the same seed gives the same file.
+from xml.etree.ElementTree import Element, SubElement
+from xml.etree import ElementTree
+from xml.dom import minidom
+from array import array
+from instance import Instance, CA1, CA2, CA3, CA4, GA1, BR1, BR2, SE1, FA2, CONSTRAINT_TYPES
+from evaluator import Evaluator, homeArray
+from warmStart import circleSchedule
+import argparse
+import random
+import sys
+
+GAME_MODES = ('P', 'NULL')
+# constraints per team; about the ratios of ITC2021_Test1-5
+DENSITIES = {'CA1': 4.0, 'CA2': 2.5, 'CA3': 2.0, 'CA4': 2.5, 'GA1': 1.5, 'BR1': 1.5, 'BR2': 0.1, 'FA2': 0.1, 'SE1': 0.1}
+SECTIONS = (('CapacityConstraints', ('CA1', 'CA2', 'CA3', 'CA4')), ('GameConstraints', ('GA1',)),
+            ('BreakConstraints', ('BR1', 'BR2')), ('FairnessConstraints', ('FA2',)),
+            ('SeparationConstraints', ('SE1',)))
+SOFT_PENALTIES = (1, 5, 10)
+
+
+def ints(values):
+    return array('i', sorted(values))
+
+
+def randomType(rand, hardRatio):
+    if rand.random() < hardRatio:
+        return 1, 'HARD'
+    return rand.choice(SOFT_PENALTIES), 'SOFT'
+
+
+def randomConstraint(family, rand, numTeams, hardRatio):
+    numSlots = 2*(numTeams - 1)
+    teams = range(numTeams)
+    slots = range(numSlots)
+    penalty, type_ = randomType(rand, hardRatio)
+    if family == 'CA1':
+        chosen = rand.sample(slots, rand.randint(1, min(6, numSlots)))
+        return CA1(ints([rand.randrange(numTeams)]), ints(chosen), 0, rand.randrange(len(chosen)),
+                   rand.choice('HA'), penalty, type_)
+    if family == 'CA2':
+        team = rand.randrange(numTeams)
+        others = rand.sample([t for t in teams if t != team], rand.randint(1, min(5, numTeams - 1)))
+        chosen = rand.sample(slots, rand.randint(1, min(6, numSlots)))
+        return CA2(ints([team]), ints(others), ints(chosen), 0, rand.randrange(min(len(chosen), len(others))),
+                   rand.choice(('H', 'A', 'HA')), 'GLOBAL', penalty, type_)
+    if family == 'CA3':
+        team = rand.randrange(numTeams)
+        others = rand.sample([t for t in teams if t != team], min(5, numTeams - 1))
+        intp = rand.randint(3, 4)
+        return CA3(ints([team]), ints(others), intp, 0, intp - rand.randint(1, 2), rand.choice(('H', 'A', 'HA')),
+                   'SLOTS', penalty, type_)
+    if family == 'CA4':
+        group = rand.sample(teams, 2)
+        every = rand.random() < 0.5
+        chosen = rand.sample(slots, rand.randint(1, numSlots if every else min(6, numSlots)))
+        return CA4(ints(group), ints(teams), ints(chosen), 0, 1 if every else rand.randint(1, len(chosen)),
+                   'H', 'EVERY' if every else 'GLOBAL', penalty, type_)
+    if family == 'GA1':
+        meetings = rand.sample([(i,j) for i in teams for j in teams if i != j], rand.randint(1, 4))
+        chosen = rand.sample(slots, rand.randint(1, 4))
+        if len(meetings) == 1 or rand.random() < 0.5:
+            min_, max_ = 0, 0
+        else:
+            min_ = rand.randint(1, len(meetings)//2)
+            max_ = len(meetings)
+        return GA1(array('i', [i for i,j in meetings]), array('i', [j for i,j in meetings]), ints(chosen),
+                   min_, max_, penalty, type_)
+    if family == 'BR1':
+        chosen = rand.sample(slots[1:], rand.randint(1, min(6, numSlots - 1)))
+        return BR1(ints([rand.randrange(numTeams)]), ints(chosen), rand.randrange(len(chosen)//2 + 1),
+                   'LEQ', 'HA', penalty, type_)
+    if family == 'BR2':
+        return BR2(ints(teams), ints(slots), rand.randint(numTeams, 3*numTeams), 'HA', 'LEQ', penalty, type_)
+    if family == 'FA2':
+        return FA2(ints(teams), ints(slots), rand.randint(1, 3), 'H', penalty, type_)
+    if family == 'SE1':
+        return SE1(ints(teams), rand.randint(1, numTeams - 1), 'SLOTS', penalty, type_)
+    raise ValueError('unknown constraint type ' + family)
+
+
+def loosen(record, family, games):
+    # Widens the bound a schedule breaks by one step; a GA1 range goes straight
+    # to the schedule's count. The deviations the evaluator reports are sums
+    # over windows, slots or pairs, so stepping keeps a record from being
+    # widened past its largest single violation.
+    if family == 'GA1':
+        meetings = set(zip(record.homes, record.aways))
+        count = sum((i,j) in meetings for s,i,j in games if s in record.slots)
+        return record._replace(min=min(record.min, count), max=max(record.max, count))
+    if family in ('CA1', 'CA2', 'CA3', 'CA4'):
+        return record._replace(max=record.max + 1)
+    if family == 'SE1':
+        return record._replace(min=max(record.min - 1, 0))
+    return record._replace(intp=record.intp + 1)
+
+
+def plantedSchedule(numTeams, gameMode, rand):
+    games = circleSchedule(numTeams, rand)
+    if gameMode == 'P':
+        return games
+    # shuffle the rounds so the mirrored halves no longer line up
+    order = list(range(2*(numTeams - 1)))
+    rand.shuffle(order)
+    return [(order[s],i,j) for s,i,j in games]
+
+
+def generateInstance(numTeams, gameMode='P', densities=DENSITIES, hardRatio=0.3, seed=0, planted=False,
+                     name=None):
+    # Returns (instance, planted games or None).
+    if numTeams < 4 or numTeams % 2:
+        raise ValueError('the number of teams must be even and at least 4')
+    if gameMode not in GAME_MODES:
+        raise ValueError('gameMode must be one of ' + ', '.join(GAME_MODES))
+    rand = random.Random(seed)
+    games = plantedSchedule(numTeams, gameMode, rand) if planted else None
+    constraints = {family: [] for family in CONSTRAINT_TYPES}
+    for family in CONSTRAINT_TYPES:
+        density = densities.get(family, 0.0)*numTeams
+        count = int(density) + (rand.random() < density - int(density))
+        constraints[family] = [randomConstraint(family, rand, numTeams, hardRatio) for k in range(count)]
+    instance = Instance(name or 'Generated {0} teams seed {1}'.format(numTeams, seed),
+                        tuple('Team {0}'.format(t) for t in range(numTeams)),
+                        tuple('Slot {0}'.format(s) for s in range(2*(numTeams - 1))), gameMode, constraints)
+    while games:
+        evaluator = Evaluator(instance)
+        score = evaluator.evaluate(homeArray(games, numTeams, instance.numSlots))
+        if not score.infeasibility[0]:
+            break
+        changed = False
+        for family, deviations in score.deviations.items():
+            data = evaluator.families[family]
+            broken = set(int(owner) for row, owner in enumerate(data['owner']) if data['hard'][row] and deviations[0, row])
+            for owner in sorted(broken):
+                record = loosen(constraints[family][owner], family, games)
+                changed = changed or record != constraints[family][owner]
+                constraints[family][owner] = record
+        if not changed:
+            raise ValueError('the planted schedule breaks HARD constraints that cannot be loosened')
+    return instance, games
+
+
+def joined(values):
+    return ';'.join(str(v) for v in values)
+
+
+def constraintAttributes(family, record):
+    attributes = {'penalty': str(record.penalty), 'type': record.type}
+    if family == 'GA1':
+        attributes['meetings'] = ''.join('{0},{1};'.format(i, j) for i,j in zip(record.homes, record.aways))
+    for field in record._fields:
+        if field in ('penalty', 'type', 'homes', 'aways'):
+            continue
+        value = getattr(record, field)
+        attributes[field] = joined(value) if isinstance(value, array) else str(value)
+    return dict(sorted(attributes.items()))
+
+
+def writeInstance(instance, fileName):
+    root = Element('Instance')
+    MetaData = SubElement(root, 'MetaData')
+    SubElement(MetaData, 'InstanceName').text = instance.name
+    SubElement(MetaData, 'DataType').text = 'G'
+    SubElement(MetaData, 'Contributor').text = 'generator.py'
+    Structure = SubElement(root, 'Structure')
+    Format = SubElement(Structure, 'Format', leagueIds='0')
+    SubElement(Format, 'numberRoundRobin').text = '2'
+    SubElement(Format, 'compactness').text = 'C'
+    SubElement(Format, 'gameMode').text = instance.gameMode
+    ObjectiveFunction = SubElement(root, 'ObjectiveFunction')
+    SubElement(ObjectiveFunction, 'Objective').text = 'SC'
+    Resources = SubElement(root, 'Resources')
+    Leagues = SubElement(Resources, 'Leagues')
+    SubElement(Leagues, 'league', id='0', name='League 0')
+    Teams = SubElement(Resources, 'Teams')
+    for t, teamName in enumerate(instance.teamNames):
+        SubElement(Teams, 'team', id=str(t), league='0', name=teamName)
+    Slots = SubElement(Resources, 'Slots')
+    for s, slotName in enumerate(instance.slotNames):
+        SubElement(Slots, 'slot', id=str(s), name=slotName)
+    Constraints = SubElement(root, 'Constraints')
+    SubElement(Constraints, 'BasicConstraints')
+    for section, families in SECTIONS:
+        Section = SubElement(Constraints, section)
+        for family in families:
+            for record in instance.constraints[family]:
+                SubElement(Section, family, constraintAttributes(family, record))
+    xmlstr = minidom.parseString(ElementTree.tostring(root)).toprettyxml(indent="  ")
+    with open(fileName, 'w') as f:
+        f.write(xmlstr)
+
+
+def writeSchedule(games, fileName):
+    solution = Element('Solution')
+    Games = SubElement(solution, 'Games')
+    for s,i,j in sorted(games):
+        SubElement(Games, 'ScheduledMatch', home=str(i), away=str(j), slot=str(s))
+    xmlstr = minidom.parseString(ElementTree.tostring(solution)).toprettyxml(indent="  ")
+    with open(fileName, 'w') as f:
+        f.write(xmlstr)
+
+
+def generateFile(fileName, numTeams, gameMode='P', densities=DENSITIES, hardRatio=0.3, seed=0, planted=False):
+    instance, games = generateInstance(numTeams, gameMode, densities, hardRatio, seed, planted)
+    writeInstance(instance, fileName)
+    if games:
+        writeSchedule(games, fileName[:-4] + '_planted.xml')
+    return instance
+
+
+def parseDensities(values):
+    densities = dict(DENSITIES)
+    for value in values or []:
+        family, _, density = value.partition('=')
+        if family not in DENSITIES or not density:
+            raise ValueError('density must look like CA1=4.0, got ' + value)
+        densities[family] = float(density)
+    return densities
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic ITC2021 instance.')
+    parser.add_argument('output', help='instance XML to write')
+    parser.add_argument('--teams', type=int, default=16, help='number of teams, even (default: 16)')
+    parser.add_argument('--game-mode', choices=GAME_MODES, default='P', help='phased (P) or not (NULL) (default: P)')
+    parser.add_argument('--density', nargs='+', default=None, metavar='TYPE=VALUE',
+                        help='constraints per team of a type, e.g. CA1=4 SE1=0.1 (defaults: {0})'.format(
+                            ' '.join('{0}={1}'.format(k, v) for k, v in DENSITIES.items())))
+    parser.add_argument('--hard-ratio', type=float, default=0.3, help='share of HARD constraints (default: 0.3)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default: 0)')
+    parser.add_argument('--planted', action='store_true',
+                        help='make the instance feasible for a drawn schedule, written to <output>_planted.xml')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        densities = parseDensities(args.density)
+        instance = generateFile(args.output, args.teams, args.game_mode, densities, args.hard_ratio, args.seed,
+                                args.planted)
+    except ValueError as error:
+        parser.error(str(error))
+    print("teams = ",instance.numTeams," slots = ",instance.numSlots," constraints = ",
+          ' '.join('{0}:{1}'.format(family, len(records)) for family, records in instance.constraints.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+# coding: utf-8
+# Parsed ITC2021 instance shared by the model builder and the evaluator.
+# The XML is read once with a streaming parser into compact records (integer
+# arrays for teams and slots) and cached on disk keyed by the file hash, so a
+# repeated run on the same instance never touches the XML again.
+from array import array
+from typing import NamedTuple
+import xml.etree.ElementTree as ElementTree
+import hashlib
+import pickle
+import os
+
+CACHE_VERSION = 1
+CACHE_DIR = os.environ.get('ITC2021_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'simpleTimetable'))
+
+
+class CA1(NamedTuple):
+    teams: array
+    slots: array
+    min: int
+    max: int
+    mode: str
+    penalty: int
+    type: str
+
+
+class CA2(NamedTuple):
+    teams1: array
+    teams2: array
+    slots: array
+    min: int
+    max: int
+    mode1: str
+    mode2: str
+    penalty: int
+    type: str
+
+
+class CA3(NamedTuple):
+    teams1: array
+    teams2: array
+    intp: int
+    min: int
+    max: int
+    mode1: str
+    mode2: str
+    penalty: int
+    type: str
+
+
+class CA4(NamedTuple):
+    teams1: array
+    teams2: array
+    slots: array
+    min: int
+    max: int
+    mode1: str
+    mode2: str
+    penalty: int
+    type: str
+
+
+class GA1(NamedTuple):
+    homes: array
+    aways: array
+    slots: array
+    min: int
+    max: int
+    penalty: int
+    type: str
+
+
+class BR1(NamedTuple):
+    teams: array
+    slots: array
+    intp: int
+    mode1: str
+    mode2: str
+    penalty: int
+    type: str
+
+
+class BR2(NamedTuple):
+    teams: array
+    slots: array
+    intp: int
+    homeMode: str
+    mode2: str
+    penalty: int
+    type: str
+
+
+class SE1(NamedTuple):
+    teams: array
+    min: int
+    mode1: str
+    penalty: int
+    type: str
+
+
+class FA2(NamedTuple):
+    teams: array
+    slots: array
+    intp: int
+    mode: str
+    penalty: int
+    type: str
+
+
+CONSTRAINT_TYPES = {cls.__name__: cls for cls in (CA1, CA2, CA3, CA4, GA1, BR1, BR2, SE1, FA2)}
+
+
+class Instance(NamedTuple):
+    name: str
+    teamNames: tuple
+    slotNames: tuple
+    gameMode: str
+    constraints: dict
+
+    @property
+    def numTeams(self):
+        return len(self.teamNames)
+
+    @property
+    def numSlots(self):
+        return 2*(self.numTeams - 1)
+
+    @property
+    def halfSlot(self):
+        return self.numSlots//2
+
+    @property
+    def boolPhase(self):
+        return self.gameMode == 'P'
+
+
+def intArray(value):
+    return array('i', [int(v) for v in value.split(';') if v != ''])
+
+
+def meetingArrays(value):
+    homes = array('i')
+    aways = array('i')
+    for meeting in value.split(';'):
+        if meeting != '':
+            home_, away_ = meeting.split(',')
+            homes.append(int(home_))
+            aways.append(int(away_))
+    return homes, aways
+
+
+def makeRecord(tag, attrib):
+    get = attrib.get
+    if tag == 'CA1':
+        return CA1(intArray(get('teams')), intArray(get('slots')), int(get('min', 0)), int(get('max')),
+                   get('mode'), int(get('penalty')), get('type'))
+    if tag in ('CA2', 'CA4'):
+        return CONSTRAINT_TYPES[tag](intArray(get('teams1')), intArray(get('teams2')), intArray(get('slots')),
+                                     int(get('min', 0)), int(get('max')), get('mode1'), get('mode2'),
+                                     int(get('penalty')), get('type'))
+    if tag == 'CA3':
+        return CA3(intArray(get('teams1')), intArray(get('teams2')), int(get('intp')), int(get('min', 0)),
+                   int(get('max')), get('mode1'), get('mode2'), int(get('penalty')), get('type'))
+    if tag == 'GA1':
+        homes, aways = meetingArrays(get('meetings'))
+        return GA1(homes, aways, intArray(get('slots')), int(get('min', 0)), int(get('max')),
+                   int(get('penalty')), get('type'))
+    if tag == 'BR1':
+        return BR1(intArray(get('teams')), intArray(get('slots')), int(get('intp')), get('mode1'),
+                   get('mode2'), int(get('penalty')), get('type'))
+    if tag == 'BR2':
+        return BR2(intArray(get('teams')), intArray(get('slots')), int(get('intp')), get('homeMode'),
+                   get('mode2'), int(get('penalty')), get('type'))
+    if tag == 'SE1':
+        return SE1(intArray(get('teams')), int(get('min')), get('mode1'), int(get('penalty')), get('type'))
+    if tag == 'FA2':
+        return FA2(intArray(get('teams')), intArray(get('slots')), int(get('intp')), get('mode'),
+                   int(get('penalty')), get('type'))
+    raise ValueError('unsupported constraint type ' + tag)
+
+
+def parseInstance(source):
+    name = ''
+    gameMode = ''
+    teamNames = []
+    slotNames = []
+    constraints = {tag: [] for tag in CONSTRAINT_TYPES}
+    for event, elem in ElementTree.iterparse(source, events=('end',)):
+        tag = elem.tag
+        if tag in CONSTRAINT_TYPES:
+            constraints[tag].append(makeRecord(tag, elem.attrib))
+        elif tag == 'team':
+            teamNames.append(elem.get('name', elem.get('id')))
+        elif tag == 'slot':
+            slotNames.append(elem.get('name', elem.get('id')))
+        elif tag == 'gameMode':
+            gameMode = (elem.text or '').strip()
+        elif tag == 'InstanceName':
+            name = (elem.text or '').strip()
+        else:
+            continue
+        elem.clear()
+    return Instance(name, tuple(teamNames), tuple(slotNames), gameMode, constraints)
+
+
+def fileHash(fileName):
+    digest = hashlib.sha256()
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def loadInstance(fileName, cacheDir=CACHE_DIR, useCache=True):
+    if not useCache:
+        return parseInstance(fileName)
+    cacheFile = os.path.join(cacheDir, '{0}.v{1}.pickle'.format(fileHash(fileName), CACHE_VERSION))
+    try:
+        with open(cacheFile, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    instance = parseInstance(fileName)
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        tmpFile = '{0}.{1}.tmp'.format(cacheFile, os.getpid())
+        with open(tmpFile, 'wb') as f:
+            pickle.dump(instance, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmpFile, cacheFile)
+    except OSError:
+        pass
+    return instance
@@ -0,0 +1,89 @@
+# coding: utf-8
+# Per-phase wall time, model size and memory instrumentation.
+#
+# A run is split into named phases (parse, the build steps of model.py or
+# cpsatModel.py, solve, extract, write, ...). Each phase records its wall time,
+# the columns and rows it added when given a size function, and the change in
+# resident memory. A phase named in profile runs under cProfile and one named
+# in traceMemory under tracemalloc; their reports are printed when the phase
+# ends.
+import contextlib
+import cProfile
+import tracemalloc
+import resource
+import pstats
+import json
+import os
+import time
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def currentRss():
+    # Resident memory in kilobytes; the peak where /proc is not available.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*PAGE_SIZE//1024
+    except (OSError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Instrumentation(object):
+    def __init__(self, profile=(), traceMemory=()):
+        self.profile = set(profile or ())
+        self.traceMemory = set(traceMemory or ())
+        self.phases = []
+
+    @contextlib.contextmanager
+    def phase(self, name, size=None):
+        # size, if given, returns (columns, rows) of the model being built.
+        record = {'phase': name}
+        before = size() if size else None
+        memory = currentRss()
+        profiler = cProfile.Profile() if name in self.profile else None
+        if name in self.traceMemory:
+            tracemalloc.start()
+        begin = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record['seconds'] = time.perf_counter() - begin
+            if before is not None:
+                after = size()
+                record['variables'] = after[0] - before[0]
+                record['rows'] = after[1] - before[1]
+            record['memory'] = currentRss() - memory
+            if name in self.traceMemory:
+                snapshot = tracemalloc.take_snapshot()
+                record['tracedPeak'] = tracemalloc.get_traced_memory()[1]//1024
+                tracemalloc.stop()
+                print("tracemalloc ",name," peak KB = ",record['tracedPeak'])
+                for stat in snapshot.statistics('lineno')[:10]:
+                    print("  ",stat)
+            if profiler:
+                print("cProfile ",name)
+                pstats.Stats(profiler).sort_stats('cumulative').print_stats(20)
+            self.phases.append(record)
+
+    def steps(self):
+        # {phase: record} for the phases that report a model size
+        return dict((record['phase'], record) for record in self.phases if 'rows' in record)
+
+    def total(self):
+        return sum(record['seconds'] for record in self.phases)
+
+    def summary(self):
+        print("{0:<14}{1:>10}{2:>8}{3:>10}{4:>10}{5:>12}".format('phase','seconds','%','variables','rows','memory KB'))
+        total = self.total() or 1.0
+        for record in self.phases:
+            print("{0:<14}{1:>10.3f}{2:>8.1f}{3:>10}{4:>10}{5:>12}".format(
+                record['phase'], record['seconds'], 100*record['seconds']/total, record.get('variables', ''),
+                record.get('rows', ''), record['memory']))
+
+    def write(self, fileName):
+        with open(fileName, 'w') as f:
+            json.dump({'total': self.total(), 'phases': self.phases}, f, indent=2)
@@ -0,0 +1,145 @@
+# coding: utf-8
+# Lazy CA3 and FA2 rows.
+#
+# CA3 puts two rows on every (constraint, window start, team) and FA2 two
+# difference rows per team pair and prefix slot, and most of them are slack at
+# the optimum. The lazy model keeps the deviation variables of both families
+# (with their objective coefficients) but none of their rows; every row is held
+# back as (family, expression, lower, upper). solveLazy solves, adds the held
+# back rows the incumbent violates and solves again, hinting the previous
+# schedule, until no row is violated. The rows added are rows of the full
+# model (FA2 as D >= |home_i - home_j| - intp without the diff_FA2 column), so
+# the final optimum is the optimum of the full model. pywraplp and CP-SAT have
+# no lazy constraint callbacks, hence the re-solve loop.
+from model import TimetableModel, buildSteps, modes
+from solverSettings import solveMip
+import time
+
+LAZY_FAMILIES = ('CA3', 'FA2')
+EPSILON = 1e-5
+
+
+def lazyCA3(model):
+    solver = model.solver
+    objective = model.objective
+    H = model.H
+    D_CA3 = model.D_CA3 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA3']):
+        intp = constraintsSet.intp
+        mod = modes(constraintsSet.mode1)
+        for l in range(model.numSlots - intp + 1):
+            for t in constraintsSet.teams1:
+                games = solver.Sum([H[t,j,s,m] for j in constraintsSet.teams2 for s in range(l,l+intp) for m in mod])
+                D_CA3[i,l,t] = solver.NumVar(0,solver.infinity(),model.name('D_CA3[{0}][{1}][{2}]',t,l,i))
+                if constraintsSet.type == "HARD":
+                    model.lazyRows.append(('CA3', games, constraintsSet.min, None))
+                    model.lazyRows.append(('CA3', games, None, constraintsSet.max))
+                else:
+                    model.lazyRows.append(('CA3', D_CA3[i,l,t] + games, constraintsSet.min, None))
+                    model.lazyRows.append(('CA3', D_CA3[i,l,t] - games, -constraintsSet.max, None))
+                    objective.SetCoefficient(D_CA3[i,l,t],constraintsSet.penalty)
+
+
+def lazyFA2(model):
+    solver = model.solver
+    objective = model.objective
+    home = model.home
+    D_FA2 = model.D_FA2 = {}
+    model.diff_FA2 = {}
+    for FA2_constraint in model.instance.constraints['FA2']:
+        intp = FA2_constraint.intp
+        penalty = FA2_constraint.penalty*model.pairWeight
+        for slot_FA2 in FA2_constraint.slots:
+            for i in FA2_constraint.teams:
+                for j in FA2_constraint.teams:
+                    if i == j or (model.formulation == 'compact' and i > j):
+                        continue
+                    difference = solver.Sum([home[i,s] - home[j,s] for s in range(slot_FA2+1)])
+                    if FA2_constraint.type == "HARD":
+                        D_FA2[slot_FA2,i,j] = solver.NumVar(0,0,model.name('D_FA2[{0}][{1}][{2}]',slot_FA2,j,i))
+                        model.lazyRows.append(('FA2', difference, -intp, None))
+                        model.lazyRows.append(('FA2', difference, None, intp))
+                    else:
+                        D_FA2[slot_FA2,i,j] = solver.NumVar(0,solver.infinity(),model.name('D_FA2[{0}][{1}][{2}]',slot_FA2,j,i))
+                        model.lazyRows.append(('FA2', D_FA2[slot_FA2,i,j] - difference, -intp, None))
+                        model.lazyRows.append(('FA2', D_FA2[slot_FA2,i,j] + difference, -intp, None))
+                        objective.SetCoefficient(D_FA2[slot_FA2,i,j],penalty)
+
+
+def buildLazyModel(instance, formulation='full', se1='pairs', solverName='CBC', phases=None, names=False):
+    model = TimetableModel(instance, formulation, se1, solverName, names)
+    model.lazyRows = []
+    lazySteps = {'CA3': lazyCA3, 'FA2': lazyFA2}
+    for name,step in buildSteps(formulation, se1):
+        step = lazySteps.get(name, step)
+        if phases is None:
+            step(model)
+            continue
+        with phases.phase(name, model.size):
+            step(model)
+    model.objective.SetMinimization()
+    return model
+
+
+def violatedRows(model):
+    # Removes the violated rows from model.lazyRows and returns them.
+    violated = []
+    pending = []
+    for row in model.lazyRows:
+        family, expression, lower, upper = row
+        value = expression.solution_value()
+        if (lower is not None and value < lower - EPSILON) or (upper is not None and value > upper + EPSILON):
+            violated.append(row)
+        else:
+            pending.append(row)
+    model.lazyRows = pending
+    return violated
+
+
+def addRows(model, rows):
+    solver = model.solver
+    for family, expression, lower, upper in rows:
+        if lower is not None:
+            solver.Add(expression >= lower)
+        if upper is not None:
+            solver.Add(expression <= upper)
+
+
+def solveLazy(model, settings):
+    # Returns the status, the ignored settings and the separation statistics:
+    # iterations, rows added per family and rows never added. The time limit
+    # covers all iterations together.
+    solver = model.solver
+    begin = time.perf_counter()
+    held = len(model.lazyRows)
+    added = dict((family, 0) for family in LAZY_FAMILIES)
+    iterations = 0
+    ignored, violated = [], []
+    while True:
+        iterations += 1
+        if settings.timeLimit:
+            remaining = settings.timeLimit - (time.perf_counter() - begin)
+            if remaining <= 0:
+                status = solver.NOT_SOLVED
+                break
+            status, ignored = solveMip(solver, settings._replace(timeLimit=remaining))
+        else:
+            status, ignored = solveMip(solver, settings)
+        if status not in (solver.OPTIMAL, solver.FEASIBLE):
+            break
+        violated = violatedRows(model)
+        print("lazy iteration ",iterations," objective = ",solver.Objective().Value()," violated rows = ",len(violated),
+              " time = ",round(time.perf_counter() - begin,3))
+        if not violated:
+            break
+        for row in violated:
+            added[row[0]] += 1
+        variables = solver.variables()
+        solver.SetHint(variables, [var.solution_value() for var in variables])
+        addRows(model, violated)
+    stats = {'iterations': iterations, 'added': added, 'held': held, 'pending': len(model.lazyRows)}
+    print("lazy rows: held back = ",held," added = ",sum(added.values())," ",added," iterations = ",iterations)
+    if status in (solver.OPTIMAL, solver.FEASIBLE) and violated:
+        # out of time with an incumbent that breaks a held back row
+        status = solver.NOT_SOLVED
+    return status, ignored, stats
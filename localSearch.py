@@ -0,0 +1,350 @@
+# coding: utf-8
+# Local search post-optimisation of a double round robin schedule.
+#
+# The schedule is kept as opp[t][s] (opponent of team t in slot s) and
+# home[t][s] (1 when t plays at home). Every constraint is split into terms
+# (one per team, window, slot or pair, as in evaluator.py) and each term
+# records the (team, slot) cells it reads. A move is a list of changed cells,
+# so its delta only re-scores the terms that read one of them. Neighbourhoods
+# are the classic round robin ones: swap homes, swap rounds, swap teams,
+# partial swap rounds and partial swap teams. Moves keep the double round
+# robin structure (and the phase when the instance is phased); the search
+# accepts non-worsening moves, hard deviations weighted by HARD_WEIGHT.
+from collections import defaultdict
+import random
+import time
+
+HARD_WEIGHT = 1000
+MOVES = ('swapHomes', 'swapRounds', 'swapTeams', 'partialSwapRounds', 'partialSwapTeams')
+
+
+def playing(opp, home, t, s, mode, teams):
+    # 1 when t plays a team of teams in s at home (H), away (A) or either (HA)
+    if opp[t][s] not in teams:
+        return 0
+    if mode == 'H':
+        return home[t][s]
+    if mode == 'A':
+        return 1 - home[t][s]
+    return 1
+
+
+def outside(count, min_, max_):
+    return max(count - max_, 0) + max(min_ - count, 0)
+
+
+def isBreak(home, t, s, mode):
+    if s == 0 or home[t][s] != home[t][s-1]:
+        return 0
+    if mode == 'H':
+        return home[t][s]
+    if mode == 'A':
+        return 1 - home[t][s]
+    return 1
+
+
+# ## Terms
+# Each returns the unweighted deviation of one term on (opp, home).
+
+def termCA1(opp, home, t, slots, mode, min_, max_):
+    if mode == 'H':
+        count = sum(home[t][s] for s in slots)
+    else:
+        count = sum(1 - home[t][s] for s in slots)
+    return outside(count, min_, max_)
+
+
+def termCA2(opp, home, t, teams2, slots, mode, min_, max_):
+    return outside(sum(playing(opp, home, t, s, mode, teams2) for s in slots), min_, max_)
+
+
+def termCA4(opp, home, teams1, teams2, slots, mode, min_, max_):
+    return outside(sum(playing(opp, home, i, s, mode, teams2) for i in teams1 for s in slots), min_, max_)
+
+
+def termGA1(opp, home, meetings, slots, min_, max_):
+    return outside(sum(home[h][s] for h,a in meetings for s in slots if opp[h][s] == a), min_, max_)
+
+
+def termBR1(opp, home, t, slots, mode, intp, leq):
+    count = sum(isBreak(home, t, s, mode) for s in slots)
+    return max(count - intp, 0) if leq else abs(count - intp)
+
+
+def termBR2(opp, home, teams, slots, intp):
+    return max(sum(isBreak(home, t, s, 'HA') for t in teams for s in slots) - intp, 0)
+
+
+def termFA2(opp, home, i, j, slots, last, intp):
+    difference = 0
+    largest = 0
+    for s in range(last+1):
+        difference += home[i][s] - home[j][s]
+        if s in slots and abs(difference) > largest:
+            largest = abs(difference)
+    return max(largest - intp, 0)
+
+
+def termSE1(opp, home, i, j, min_):
+    first, second = [s for s,k in enumerate(opp[i]) if k == j]
+    return max(min_ - (second - first - 1), 0)
+
+
+def buildTerms(instance):
+    # [(family, penalty, hard, function, arguments, cells)]
+    numSlots = instance.numSlots
+    allSlots = range(numSlots)
+    terms = []
+
+    def add(family, record, function, arguments, cells):
+        terms.append((family, record.penalty, record.type == 'HARD', function, arguments, set(cells)))
+
+    for c in instance.constraints['CA1']:
+        for t in c.teams:
+            add('CA1', c, termCA1, (t, tuple(c.slots), c.mode, c.min, c.max), ((t,s) for s in c.slots))
+    for c in instance.constraints['CA2']:
+        for t in c.teams1:
+            add('CA2', c, termCA2, (t, frozenset(c.teams2), tuple(c.slots), c.mode1, c.min, c.max),
+                ((t,s) for s in c.slots))
+    for c in instance.constraints['CA3']:
+        for t in c.teams1:
+            for l in range(numSlots - c.intp + 1):
+                window = tuple(range(l, l+c.intp))
+                add('CA3', c, termCA2, (t, frozenset(c.teams2), window, c.mode1, c.min, c.max),
+                    ((t,s) for s in window))
+    for c in instance.constraints['CA4']:
+        teams1 = tuple(c.teams1)
+        slotSets = [tuple(c.slots)] if c.mode2 == 'GLOBAL' else [(s,) for s in c.slots]
+        for slots in slotSets:
+            add('CA4', c, termCA4, (teams1, frozenset(c.teams2), slots, c.mode1, c.min, c.max),
+                ((i,s) for i in teams1 for s in slots))
+    for c in instance.constraints['GA1']:
+        meetings = tuple(zip(c.homes, c.aways))
+        add('GA1', c, termGA1, (meetings, tuple(c.slots), c.min, c.max), ((h,s) for h,a in meetings for s in c.slots))
+    for c in instance.constraints['BR1']:
+        for t in c.teams:
+            add('BR1', c, termBR1, (t, tuple(c.slots), c.mode2, c.intp, c.mode1 == 'LEQ'),
+                ((t,s-d) for s in c.slots for d in (0, 1) if s-d >= 0))
+    for c in instance.constraints['BR2']:
+        add('BR2', c, termBR2, (tuple(c.teams), tuple(c.slots), c.intp),
+            ((t,s-d) for t in c.teams for s in c.slots for d in (0, 1) if s-d >= 0))
+    for c in instance.constraints['FA2']:
+        teams = sorted(c.teams)
+        last = max(c.slots)
+        for a,i in enumerate(teams):
+            for j in teams[a+1:]:
+                add('FA2', c, termFA2, (i, j, frozenset(c.slots), last, c.intp),
+                    ((t,s) for t in (i,j) for s in range(last+1)))
+    for c in instance.constraints['SE1']:
+        teams = sorted(c.teams)
+        for a,i in enumerate(teams):
+            for j in teams[a+1:]:
+                add('SE1', c, termSE1, (i, j, c.min), ((i,s) for s in allSlots))
+    return terms
+
+
+class LocalSearch(object):
+
+    def __init__(self, instance, games, seed=0, hardOnly=False):
+        self.instance = instance
+        self.numTeams = instance.numTeams
+        self.numSlots = instance.numSlots
+        self.halfSlot = instance.halfSlot
+        self.boolPhase = instance.boolPhase
+        self.random = random.Random(seed)
+        self.opp = [[-1]*self.numSlots for t in range(self.numTeams)]
+        self.home = [[0]*self.numSlots for t in range(self.numTeams)]
+        for s,i,j in games:
+            self.opp[i][s] = j
+            self.opp[j][s] = i
+            self.home[i][s] = 1
+            self.home[j][s] = 0
+        # hardOnly drops the soft terms, to search for a feasible schedule
+        self.terms = [term for term in buildTerms(instance) if term[2] or not hardOnly]
+        self.cellTerms = defaultdict(list)
+        for k,term in enumerate(self.terms):
+            for cell in term[5]:
+                self.cellTerms[cell].append(k)
+        self.values = [self.termValue(k) for k in range(len(self.terms))]
+        self.cost = sum(self.weight(k)*value for k,value in enumerate(self.values))
+
+    def termValue(self, k):
+        family, penalty, hard, function, arguments, cells = self.terms[k]
+        return function(self.opp, self.home, *arguments)
+
+    def weight(self, k):
+        return self.terms[k][1]*(HARD_WEIGHT if self.terms[k][2] else 1)
+
+    def games(self):
+        return [(s,i,self.opp[i][s]) for s in range(self.numSlots) for i in range(self.numTeams) if self.home[i][s]]
+
+    def penalties(self):
+        # family -> (soft penalty, hard violation)
+        penalties = defaultdict(int)
+        violations = defaultdict(int)
+        for k,value in enumerate(self.values):
+            family, penalty, hard = self.terms[k][:3]
+            if hard:
+                violations[family] += penalty*value
+            else:
+                penalties[family] += penalty*value
+        return penalties, violations
+
+    # ## Moves
+    # Each returns [(team, slot, opponent, home)] or None when not applicable.
+
+    def swapHomes(self, i, j):
+        opp, home = self.opp, self.home
+        changes = []
+        for s in range(self.numSlots):
+            if opp[i][s] == j:
+                changes += [(i,s,j,1-home[i][s]), (j,s,i,1-home[j][s])]
+        return changes
+
+    def swapRounds(self, s1, s2):
+        if self.boolPhase and (s1 < self.halfSlot) != (s2 < self.halfSlot):
+            return None
+        opp, home = self.opp, self.home
+        changes = []
+        for t in range(self.numTeams):
+            changes += [(t,s1,opp[t][s2],home[t][s2]), (t,s2,opp[t][s1],home[t][s1])]
+        return changes
+
+    def swapTeams(self, i, j):
+        opp, home = self.opp, self.home
+        changes = []
+        for s in range(self.numSlots):
+            a, b = opp[i][s], opp[j][s]
+            if a == j:
+                continue
+            changes += [(i,s,b,home[j][s]), (j,s,a,home[i][s]), (a,s,j,home[a][s]), (b,s,i,home[b][s])]
+        return changes
+
+    def partialSwapRounds(self, t, s1, s2):
+        # swap s1 and s2 for the smallest set of teams containing t that is
+        # closed under the opponents in both slots
+        if self.boolPhase and (s1 < self.halfSlot) != (s2 < self.halfSlot):
+            return None
+        opp, home = self.opp, self.home
+        teams = {t}
+        stack = [t]
+        while stack:
+            u = stack.pop()
+            for v in (opp[u][s1], opp[u][s2]):
+                if v not in teams:
+                    teams.add(v)
+                    stack.append(v)
+        if len(teams) == self.numTeams:
+            return None
+        changes = []
+        for u in teams:
+            changes += [(u,s1,opp[u][s2],home[u][s2]), (u,s2,opp[u][s1],home[u][s1])]
+        return changes
+
+    def partialSwapTeams(self, i, j, s):
+        # swap the games of i and j in s and in every slot needed to keep
+        # both schedules valid: i must give away the same (opponent, home)
+        # games it receives from j
+        opp, home = self.opp, self.home
+        slots = {s}
+        stack = [s]
+        while stack:
+            r = stack.pop()
+            if opp[i][r] == j:
+                return None
+            for a,b in ((i,j), (j,i)):
+                # a receives b's game of slot r; find where a already plays it
+                k, h = opp[b][r], home[b][r]
+                for q in range(self.numSlots):
+                    if opp[a][q] == k and home[a][q] == h:
+                        if q not in slots:
+                            slots.add(q)
+                            stack.append(q)
+                        break
+        if len(slots) == self.numSlots:
+            return None
+        changes = []
+        for r in slots:
+            a, b = opp[i][r], opp[j][r]
+            changes += [(i,r,b,home[j][r]), (j,r,a,home[i][r]), (a,r,j,home[a][r]), (b,r,i,home[b][r])]
+        if self.boolPhase:
+            new = {(t,r): k for t,r,k,h in changes}
+            for t in (i,j):
+                if len({new.get((t,r), opp[t][r]) for r in range(self.halfSlot)}) != self.numTeams - 1:
+                    return None
+        return changes
+
+    def randomMove(self):
+        rand = self.random
+        n, S = self.numTeams, self.numSlots
+        name = rand.choice(MOVES)
+        i, j = rand.sample(range(n), 2)
+        s1, s2 = rand.sample(range(S), 2)
+        if name == 'swapHomes':
+            return name, self.swapHomes(i, j)
+        if name == 'swapRounds':
+            return name, self.swapRounds(s1, s2)
+        if name == 'swapTeams':
+            return name, self.swapTeams(i, j)
+        if name == 'partialSwapRounds':
+            return name, self.partialSwapRounds(i, s1, s2)
+        return name, self.partialSwapTeams(i, j, s1)
+
+    # ## Incremental evaluation
+
+    def apply(self, changes):
+        undo = [(t,s,self.opp[t][s],self.home[t][s]) for t,s,k,h in changes]
+        for t,s,k,h in changes:
+            self.opp[t][s] = k
+            self.home[t][s] = h
+        return undo
+
+    def delta(self, changes):
+        # applies the move and returns (delta, undo, {term: new value})
+        affected = set()
+        for t,s,k,h in changes:
+            affected.update(self.cellTerms[t,s])
+        undo = self.apply(changes)
+        newValues = {k: self.termValue(k) for k in affected}
+        delta = sum(self.weight(k)*(value - self.values[k]) for k,value in newValues.items())
+        return delta, undo, newValues
+
+    def run(self, timeLimit):
+        # hill climbing with sideways moves; returns the statistics of the run
+        start = time.perf_counter()
+        best = self.cost
+        bestGames = self.games()
+        iterations = accepted = 0
+        applied = defaultdict(int)
+        while time.perf_counter() - start < timeLimit:
+            iterations += 1
+            name, changes = self.randomMove()
+            if not changes:
+                continue
+            delta, undo, newValues = self.delta(changes)
+            if delta <= 0:
+                for k,value in newValues.items():
+                    self.values[k] = value
+                self.cost += delta
+                accepted += 1
+                if delta < 0:
+                    applied[name] += 1
+                if self.cost < best:
+                    best = self.cost
+                    bestGames = self.games()
+            else:
+                self.apply(undo)
+        return {'iterations': iterations, 'accepted': accepted, 'improving': dict(applied),
+                'best': best, 'bestGames': bestGames, 'seconds': time.perf_counter() - start}
+
+
+def improveSchedule(instance, games, timeLimit, seed=0):
+    # Returns the best schedule found within timeLimit seconds, its penalties
+    # per family and the statistics of the run.
+    search = LocalSearch(instance, games, seed)
+    initial = search.cost
+    stats = search.run(timeLimit)
+    stats['initial'] = initial
+    best = LocalSearch(instance, stats['bestGames'])
+    penalties, violations = best.penalties()
+    return stats['bestGames'], penalties, violations, stats
@@ -0,0 +1,781 @@
+# coding: utf-8
+# MIP model of the ITC2021 double round robin.
+#
+# Two core formulations share the constraint families below:
+#   full    - X[i,j,s] and H[i,j,s,h] for every ordered pair (including i == j)
+#             tied together with symmetry rows, home/away linked per opponent.
+#   compact - one home-game binary x[i,j,s] per ordered pair of distinct teams;
+#             X, H, home, away and breakAway are aggregations of x.
+# Both expose the same X/H/home/away/breakHome/breakAway mappings, so CA1..FA2
+# are written once.
+#
+# SE1 has two encodings:
+#   pairs  - y[i,j,s1,s2] for every slot pair with a McCormick product per element.
+#   window - v[l,i,j,w] = 1 if a pair meets twice within w slots, one row per
+#            (pair, w, slot); linear in slots for a pair.
+# Both charge only the pairs of teams listed in the SE1 record, as evaluator.py
+# does.
+from collections import defaultdict
+from solverSettings import createMipSolver
+import numpy as np
+
+FORMULATIONS = ('full', 'compact')
+SE1_ENCODINGS = ('pairs', 'window')
+
+
+class TimetableModel(object):
+
+    def __init__(self, instance, formulation, se1, solverName, names=False):
+        self.instance = instance
+        self.formulation = formulation
+        self.se1 = se1
+        self.numTeams = instance.numTeams
+        self.numSlots = instance.numSlots
+        self.halfSlot = instance.halfSlot
+        self.boolPhase = instance.boolPhase
+        self.solver = createMipSolver(solverName)
+        self.objective = self.solver.Objective()
+        self.names = names
+        self.y = None
+        self.homeGames = None
+        self.homeVariables = None
+        # SE1/FA2 terms are symmetric in (i,j); the compact model keeps only
+        # i < j and weights each term by 2 so the objective is unchanged.
+        self.pairWeight = 1
+
+    def size(self):
+        return self.solver.NumVariables(), self.solver.NumConstraints()
+
+    def name(self, template, *indices):
+        # Variables are anonymous unless the model was built with names.
+        return template.format(*indices) if self.names else ''
+
+
+def variableArray(*shape):
+    # Dense table of variables/expressions indexed like the dicts it replaces
+    # (X[i,j,s], H[i,j,s,h], ...); unused cells stay None.
+    return np.empty(shape, dtype=object)
+
+
+def entries(table):
+    # [(index, entry)] for the cells of a variable array that are set
+    return [(index, entry) for index, entry in np.ndenumerate(table) if entry is not None]
+
+
+def buildSteps(formulation, se1):
+    # [(name, add function)] in build order: the core steps, then one per
+    # constraint family, named after the family.
+    if formulation == 'compact':
+        steps = [('core', addCompactCore)]
+    else:
+        steps = [('core', addCore), ('homeAway', addHomeAway)]
+    if se1 != 'window':
+        steps.append(('pairSlots', addPairSlots))
+    return steps + [('CA1', addCA1), ('CA2', addCA2), ('CA3', addCA3), ('CA4', addCA4), ('GA1', addGA1),
+                    ('BR1', addBR1), ('BR2', addBR2), ('SE1', addSE1Window if se1 == 'window' else addSE1),
+                    ('FA2', addFA2)]
+
+
+def buildModel(instance, formulation='full', se1='pairs', solverName='CBC', phases=None, names=False):
+    # phases, an instrumentation.Instrumentation, records every build step;
+    # names gives every variable its formatted name (LP exports, debugging).
+    if formulation not in FORMULATIONS:
+        raise ValueError('unknown formulation ' + formulation)
+    if se1 not in SE1_ENCODINGS:
+        raise ValueError('unknown SE1 encoding ' + se1)
+    model = TimetableModel(instance, formulation, se1, solverName, names)
+    for name,step in buildSteps(formulation, se1):
+        if phases is None:
+            step(model)
+            continue
+        with phases.phase(name, model.size):
+            step(model)
+    model.objective.SetMinimization()
+    return model
+
+
+def addCore(model):
+    solver = model.solver
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    halfSlot = model.halfSlot
+    X = model.X = variableArray(numTeams,numTeams,numSlots)
+    H = model.H = variableArray(numTeams,numTeams,numSlots,2)
+    for i in range(numTeams):
+        for j in range(numTeams):
+            for s in range(numSlots):
+                X[i,j,s] = solver.IntVar(0,1,model.name('X[{0}][{1}][{2}]',s,j,i))
+
+    for i in range(numTeams):
+        for j in range(numTeams):
+            for s in range(numSlots):
+                for h in range(2):
+                    H[i,j,s,h] = solver.IntVar(0,1,model.name('H[{0}][{1}][{2}][{3}]',h,s,j,i))
+
+    # # **phase**
+    # ### A pair of team can not repeat their game in other slots in one phase
+    if (model.boolPhase):
+        for i in range(numTeams):
+            for j in range(numTeams):
+                if i != j:
+                    solver.Add(solver.Sum([X[i,j,s] for s in range(halfSlot)])==1)
+                    solver.Add(solver.Sum([X[i,j,s] for s in range(halfSlot,numSlots)])==1)
+
+    # ### A Team can not play with itself
+    for s in range(numSlots):
+        for i in range(numTeams):
+            solver.Add(X[i,i,s]==0)
+
+    # ### In 1 slot, Total matches should be numTeams
+    # ### in 1 slot, Each teams can play with other teams only once
+    for s in range(numSlots):
+        solver.Add(solver.Sum([X[i,j,s] for i in range(numTeams) for j in range(numTeams)])==numTeams)
+        for i in range(numTeams):
+            solver.Add(solver.Sum([X[i,j,s] for j in range(numTeams)]) == 1)
+        for j in range(numTeams):
+            solver.Add(solver.Sum([X[i,j,s] for i in range(numTeams)]) == 1)
+
+    # ## Symmetry in $X_{ijs}$
+    for i in range(numTeams):
+        for j in range(numTeams):
+            for s in range(numSlots):
+                solver.Add(X[i,j,s]==X[j,i,s])
+
+    # ## Introduction of Home Away Variable in $H_{ijsh}$
+    for i in range(numTeams):
+        for j in range(numTeams):
+            for s in range(numSlots):
+                solver.Add(X[i,j,s]==H[i,j,s,0]+H[i,j,s,1])
+                solver.Add(H[i,j,s,0]==H[j,i,s,1])
+                solver.Add(H[i,j,s,1]==H[j,i,s,0])
+
+    # ## Home-Away constraint. A team Should Play with j in both Home and Away state
+    for i in range(numTeams):
+        for j in range(numTeams):
+            solver.Add(solver.Sum([H[i,j,s1,1] for s1 in range(numSlots)])==solver.Sum([H[i,j,s2,0] for s2 in range(numSlots)]))
+            if i != j:
+                solver.Add(solver.Sum([H[i,j,s1,1] for s1 in range(numSlots)])==1)
+                solver.Add(solver.Sum([H[i,j,s1,0] for s1 in range(numSlots)])==1)
+
+
+def addHomeAway(model):
+    # ## introduction of $home_{is}$ and $away_{is}$ variable for $i^{th}$ Team playing Home/Away in Slot $s$
+    # ## introduction of $breakHome_{is}$ and $breakAway_{is}$variable for $i^{th}$ Team playing Home/Away break in Slot $s$
+    solver = model.solver
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    H = model.H
+    home = model.home = variableArray(numTeams,numSlots)
+    away = model.away = variableArray(numTeams,numSlots)
+    breakHome = model.breakHome = variableArray(numTeams,numSlots)
+    breakAway = model.breakAway = variableArray(numTeams,numSlots)
+    for i in range(numTeams):
+        for s in range(numSlots):
+            home[i,s] = solver.IntVar(0,1,model.name('home[{0}][{1}]',s,i))
+            breakHome[i,s] = solver.IntVar(0,1,model.name('breakHome[{0}][{1}]',s,i))
+            away[i,s] = solver.IntVar(0,1,model.name('away[{0}][{1}]',s,i))
+            breakAway[i,s] = solver.IntVar(0,1,model.name('breakAway[{0}][{1}]',s,i))
+
+    for i in range(numTeams):
+        for s in range(numSlots):
+            for j in range(numTeams):
+                solver.Add(home[i,s] >= H[i,j,s,0])
+                solver.Add(away[i,s] >= H[i,j,s,1])
+    for i in range(numTeams):
+        for s in range(numSlots):
+            solver.Add(home[i,s] <= solver.Sum([H[i,j,s,0] for j in range(numTeams)]))
+            solver.Add(away[i,s] <= solver.Sum([H[i,j,s,1] for j in range(numTeams)]))
+    for i in range(numTeams):
+        for s in range(1,numSlots):
+            solver.Add(breakHome[i,s] <= home[i,s])
+            solver.Add(breakHome[i,s] <= home[i,s-1])
+            solver.Add(breakHome[i,s] >= home[i,s] + home[i,s-1] - 1)
+            solver.Add(breakAway[i,s] <= away[i,s])
+            solver.Add(breakAway[i,s] <= away[i,s-1])
+            solver.Add(breakAway[i,s] >= away[i,s] + away[i,s-1] - 1)
+
+
+def addCompactCore(model):
+    solver = model.solver
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    halfSlot = model.halfSlot
+    x = model.x = variableArray(numTeams,numTeams,numSlots)
+    breakHome = model.breakHome = variableArray(numTeams,numSlots)
+    for i in range(numTeams):
+        for j in range(numTeams):
+            if i != j:
+                for s in range(numSlots):
+                    x[i,j,s] = solver.IntVar(0,1,model.name('x[{0}][{1}][{2}]',s,j,i))
+    for i in range(numTeams):
+        for s in range(1,numSlots):
+            breakHome[i,s] = solver.IntVar(0,1,model.name('breakHome[{0}][{1}]',s,i))
+    compactExpressions(model)
+    X = model.X
+    home = model.home
+
+    # ### Every team plays exactly one game in every slot
+    for s in range(numSlots):
+        for i in range(numTeams):
+            solver.Add(solver.Sum([X[i,j,s] for j in range(numTeams) if j != i]) == 1)
+
+    # ### Every team hosts every other team exactly once
+    for i in range(numTeams):
+        for j in range(numTeams):
+            if i != j:
+                solver.Add(solver.Sum([x[i,j,s] for s in range(numSlots)]) == 1)
+
+    # ### In phased mode every pair meets once in the first half (and so once in the second)
+    if (model.boolPhase):
+        for i in range(numTeams):
+            for j in range(i+1,numTeams):
+                solver.Add(solver.Sum([X[i,j,s] for s in range(halfSlot)]) == 1)
+
+    for i in range(numTeams):
+        for s in range(1,numSlots):
+            solver.Add(breakHome[i,s] <= home[i,s])
+            solver.Add(breakHome[i,s] <= home[i,s-1])
+            solver.Add(breakHome[i,s] >= home[i,s] + home[i,s-1] - 1)
+
+
+def compactExpressions(model):
+    # X, H, home, away and breakAway of the compact core as aggregations of
+    # its variables x and breakHome (shared with bulkModel.py).
+    solver = model.solver
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    model.pairWeight = 2
+    zero = model.zero = solver.Sum([])
+    x = model.x
+    X = model.X = variableArray(numTeams,numTeams,numSlots)
+    H = model.H = variableArray(numTeams,numTeams,numSlots,2)
+    for i in range(numTeams):
+        for j in range(numTeams):
+            for s in range(numSlots):
+                if i == j:
+                    X[i,j,s] = H[i,j,s,0] = H[i,j,s,1] = zero
+                else:
+                    X[i,j,s] = x[i,j,s] + x[j,i,s]
+                    H[i,j,s,0] = x[i,j,s]
+                    H[i,j,s,1] = x[j,i,s]
+
+    # ## home/away are aggregations of x, breakAway follows from breakHome:
+    # away[s]*away[s-1] = (1-home[s])*(1-home[s-1]) = breakHome[s] + 1 - home[s] - home[s-1]
+    home = model.home = variableArray(numTeams,numSlots)
+    away = model.away = variableArray(numTeams,numSlots)
+    breakHome = model.breakHome
+    breakAway = model.breakAway = variableArray(numTeams,numSlots)
+    for i in range(numTeams):
+        for s in range(numSlots):
+            home[i,s] = solver.Sum([x[i,j,s] for j in range(numTeams) if j != i])
+            away[i,s] = solver.Sum([x[j,i,s] for j in range(numTeams) if j != i])
+    for i in range(numTeams):
+        breakHome[i,0] = breakAway[i,0] = zero
+        for s in range(1,numSlots):
+            breakAway[i,s] = breakHome[i,s] + 1 - home[i,s] - home[i,s-1]
+
+
+def teamPairs(model):
+    # Ordered pairs carrying SE1 terms; the compact model drops i >= j.
+    numTeams = model.numTeams
+    if model.formulation == 'compact':
+        return [(i,j) for i in range(numTeams) for j in range(i+1,numTeams)]
+    return [(i,j) for i in range(numTeams) for j in range(numTeams)]
+
+
+def se1Pairs(model, record):
+    # The pairs of teamPairs that an SE1 record charges: both teams in the record.
+    teams_ = set(record.teams)
+    return [(i,j) for i,j in teamPairs(model) if i in teams_ and j in teams_]
+
+
+def slotPairs(model):
+    numSlots = model.numSlots
+    halfSlot = model.halfSlot
+    if (model.boolPhase):
+        return [(s1,s2) for s1 in range(halfSlot) for s2 in range(halfSlot,numSlots)]
+    return [(s1,s2) for s1 in range(numSlots) for s2 in range(s1+1,numSlots)]
+
+
+def addPairSlots(model):
+    # ## Introduction of $y_{ijs_{1}s_{2}}$ which says whether Team $i$ and Team $j$ played in slot $s_{1}$ the first time and in slot $s_{2}$ the second time
+    solver = model.solver
+    X = model.X
+    if not model.instance.constraints['SE1'] and model.formulation == 'compact':
+        return
+    y = model.y = variableArray(model.numTeams,model.numTeams,model.numSlots,model.numSlots)
+    for i,j in teamPairs(model):
+        for s1,s2 in slotPairs(model):
+            y[i,j,s1,s2] = solver.IntVar(0,1,model.name('y[{0}][{1}][{2}][{3}]',s2,s1,j,i))
+    for i,j in teamPairs(model):
+        for s1,s2 in slotPairs(model):
+            solver.Add(y[i,j,s1,s2] <= X[i,j,s1])
+            solver.Add(y[i,j,s1,s2] <= X[i,j,s2])
+            solver.Add(y[i,j,s1,s2] >= X[i,j,s1]+X[i,j,s2]-1)
+
+
+def modes(mode):
+    if mode == 'H':
+        return [0]
+    elif mode == 'A':
+        return [1]
+    return [0,1]
+
+
+# ## CA1
+
+def addCA1(model):
+    solver = model.solver
+    objective = model.objective
+    numTeams = model.numTeams
+    H = model.H
+    D_CA1 = model.D_CA1 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA1']):
+        max_ = constraintsSet.max
+        min_ = constraintsSet.min
+        penalty_ = constraintsSet.penalty
+        slots_ = constraintsSet.slots
+        type_ = constraintsSet.type
+
+        if (constraintsSet.mode == 'H'):
+            mod = 0
+        else:
+            mod = 1
+        for team_a in constraintsSet.teams:
+            D_CA1[i,team_a] = solver.NumVar(0,solver.infinity(),model.name('D_CA1[{0}][{1}]',team_a,i))
+            if (type_ == "HARD"):
+                solver.Add(min_ <= solver.Sum([H[team_a,j,slot,mod] for j in range(numTeams) for slot in slots_]))
+                solver.Add(solver.Sum([H[team_a,j,slot,mod] for j in range(numTeams) for slot in slots_]) <= max_)
+            else:
+                solver.Add(D_CA1[i,team_a] >= min_ - solver.Sum([H[team_a,j,slot,mod] for j in range(numTeams) for slot in slots_]))
+                solver.Add(D_CA1[i,team_a] >= solver.Sum([H[team_a,j,slot,mod] for j in range(numTeams) for slot in slots_]) - max_)
+                objective.SetCoefficient(D_CA1[i,team_a],penalty_)
+
+
+# ## CA2
+
+def addCA2(model):
+    solver = model.solver
+    objective = model.objective
+    H = model.H
+    D_CA2 = model.D_CA2 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA2']):
+        slots_ = constraintsSet.slots
+        max_ = constraintsSet.max
+        min_ = constraintsSet.min
+        penalty_ = constraintsSet.penalty
+        team_2 = constraintsSet.teams2
+        type_ = constraintsSet.type
+        mod = modes(constraintsSet.mode1)
+
+        for team_1 in constraintsSet.teams1:
+            D_CA2[i,team_1] = solver.NumVar(0,solver.infinity(),model.name('D_CA2[{0}][{1}]',team_1,i))
+            solver.Add(D_CA2[i,team_1] >= min_ - solver.Sum([H[team_1,j,slot,m] for j in team_2 for slot in slots_ for m in mod]))
+            solver.Add(D_CA2[i,team_1] >= solver.Sum([H[team_1,j,slot,m] for j in team_2 for slot in slots_ for m in mod]) - max_)
+            if (type_ == "HARD"):
+                solver.Add(D_CA2[i,team_1]==0)
+            else:
+                objective.SetCoefficient(D_CA2[i,team_1],penalty_)
+
+
+# ## CA3
+
+def addCA3(model):
+    solver = model.solver
+    objective = model.objective
+    numSlots = model.numSlots
+    H = model.H
+    D_CA3 = model.D_CA3 = {}
+    for i,constraintsSet in enumerate(model.instance.constraints['CA3']):
+        intp = constraintsSet.intp
+        team_1 = constraintsSet.teams1
+        k_max = constraintsSet.max
+        k_min = constraintsSet.min
+        penalty_ = constraintsSet.penalty
+        team_2 = constraintsSet.teams2
+        type_ = constraintsSet.type
+        mod = modes(constraintsSet.mode1)
+
+        for l in range(numSlots - intp + 1):
+            for t in team_1:
+                D_CA3[i,l,t] = solver.NumVar(0,solver.infinity(),model.name('D_CA3[{0}][{1}][{2}]',t,l,i))
+                if (type_ == "HARD"):
+                    solver.Add(k_min<=solver.Sum([H[t,j,s,m] for j in team_2 for s in range(l,l+intp) for m in mod]))
+                    solver.Add(solver.Sum([H[t,j,s,m] for j in team_2 for s in range(l,l+intp) for m in mod]) <= k_max)
+                else:
+                    solver.Add(D_CA3[i,l,t] >= k_min - solver.Sum([H[t,j,s,m] for j in team_2 for s in range(l,l+intp) for m in mod]))
+                    solver.Add(D_CA3[i,l,t] >= solver.Sum([H[t,j,s,m] for j in team_2 for s in range(l,l+intp) for m in mod]) - k_max)
+                    objective.SetCoefficient(D_CA3[i,l,t],penalty_)
+
+
+# ## CA4
+
+def addCA4(model):
+    solver = model.solver
+    objective = model.objective
+    H = model.H
+    D_CA4 = model.D_CA4 = {}
+    for l,constraintsSet in enumerate(model.instance.constraints['CA4']):
+        D_CA4[l] = solver.NumVar(0,solver.infinity(),model.name('D_CA4[{0}]',l))
+        max_ = constraintsSet.max
+        min_ = constraintsSet.min
+        mode2 = constraintsSet.mode2
+        penalty_ = constraintsSet.penalty
+        slots_ = constraintsSet.slots
+        team_1 = constraintsSet.teams1
+        team_2 = constraintsSet.teams2
+        type_ = constraintsSet.type
+        mod = modes(constraintsSet.mode1)
+        if (type_ == "HARD"):
+            if mode2 == "GLOBAL":
+                solver.Add(min_ <= solver.Sum([H[i,j,slot,m].solution_value() for i in team_1 for j in team_2 for m in mod for slot in slots_]))
+                solver.Add(solver.Sum([H[i,j,slot,m].solution_value() for i in team_1 for j in team_2 for m in mod for slot in slots_]) <=  max_)
+            else:
+                for slot in slots_:
+                    solver.Add(min_ <= solver.Sum([H[i,j,slot,m] for i in team_1 for j in team_2 for m in mod]))
+                    solver.Add(solver.Sum([H[i,j,slot,m] for i in team_1 for j in team_2 for m in mod]) <= max_)
+        else:
+            if mode2 == "GLOBAL":
+                solver.Add(D_CA4[l] >= min_ - solver.Sum([H[i,j,slot,m] for i in team_1 for j in team_2 for slot in slots_ for m in mod]))
+                solver.Add(D_CA4[l] >= solver.Sum([H[i,j,slot,m] for i in team_1 for j in team_2 for slot in slots_ for m in mod]) - max_)
+            else:
+                for slot in slots_:
+                    solver.Add(D_CA4[l] >= min_ - solver.Sum([H[i,j,slot,m] for i in team_1 for j in team_2 for m in mod]))
+                    solver.Add(D_CA4[l] >= solver.Sum([H[i,j,slot,m] for i in team_1 for j in team_2 for m in mod]) - max_)
+
+            objective.SetCoefficient(D_CA4[l],penalty_)
+
+
+# ## GA1
+
+def addGA1(model):
+    solver = model.solver
+    objective = model.objective
+    H = model.H
+    D_GA1 = model.D_GA1 = {}
+    for i,constraint_set in enumerate(model.instance.constraints['GA1']):
+        D_GA1[i] = solver.NumVar(0,solver.infinity(),model.name('D_GA1[{0}]',i))
+        meeting_list = list(zip(constraint_set.homes,constraint_set.aways))
+        k_max = constraint_set.max
+        k_min = constraint_set.min
+        penalty_ = constraint_set.penalty
+        type_ = constraint_set.type
+        slots_ = constraint_set.slots
+        solver.Add(D_GA1[i] >= k_min - solver.Sum([H[meeting[0],meeting[1],s,0] for meeting in meeting_list for s in slots_]))
+        solver.Add(D_GA1[i] >= solver.Sum([H[meeting[0],meeting[1],s,0] for meeting in meeting_list for s in slots_]) - k_max)
+        if (type_ == "HARD"):
+            solver.Add(D_GA1[i] == 0)
+        else:
+            objective.SetCoefficient(D_GA1[i],penalty_)
+
+
+# ## BR1
+
+def addBR1(model):
+    solver = model.solver
+    objective = model.objective
+    breakHome = model.breakHome
+    breakAway = model.breakAway
+    D_BR1 = model.D_BR1 = {}
+    for i,BR1_constraint in enumerate(model.instance.constraints['BR1']):
+        slots_BR1 = BR1_constraint.slots
+        D_BR1[i] = solver.NumVar(0,solver.infinity(),model.name('D_BR1[{0}]',i))
+        intp = BR1_constraint.intp
+        mode_is_EQ = BR1_constraint.mode1
+        isHorA = BR1_constraint.mode2
+        penalty_BR1 = BR1_constraint.penalty
+        team_BR1 = BR1_constraint.teams[0]
+        type_ = BR1_constraint.type
+        objective.SetCoefficient(D_BR1[i],penalty_BR1)
+        if isHorA == 'HA':
+            breaks = solver.Sum([(breakHome[team_BR1,s]+breakAway[team_BR1,s]) for s in slots_BR1])
+        elif isHorA == 'H':
+            breaks = solver.Sum([breakHome[team_BR1,s] for s in slots_BR1])
+        else:
+            breaks = solver.Sum([breakAway[team_BR1,s] for s in slots_BR1])
+        solver.Add(D_BR1[i] >= breaks - intp)
+        if mode_is_EQ != "LEQ":
+            solver.Add(D_BR1[i] >= intp - breaks)
+        if (type_ == "HARD"):
+            solver.Add(D_BR1[i] == 0)
+        else:
+            objective.SetCoefficient(D_BR1[i],penalty_BR1)
+
+
+# ## BR2
+
+def addBR2(model):
+    solver = model.solver
+    objective = model.objective
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    breakHome = model.breakHome
+    breakAway = model.breakAway
+    D_BR2 = model.D_BR2 = {}
+    for i,BR2_constraint in enumerate(model.instance.constraints['BR2']):
+        D_BR2[i] = solver.NumVar(0,solver.infinity(),model.name('D_BR2[{0}]',i))
+        intp = BR2_constraint.intp
+        type_ = BR2_constraint.type
+        penalty_BR2 = BR2_constraint.penalty
+
+        solver.Add(solver.Sum([(breakHome[t,s]+breakAway[t,s]) for t in range(numTeams) for s in range(numSlots)]) <= D_BR2[i] + intp)
+        if type_ == "HARD":
+            solver.Add(D_BR2[i] == 0)
+        else:
+            objective.SetCoefficient(D_BR2[i],penalty_BR2)
+
+
+# ## SE1
+# Seperated by K time slots.
+
+def addSE1(model):
+    solver = model.solver
+    objective = model.objective
+    y = model.y
+    D_SE1 = model.D_SE1 = {}
+    prod_SE1 = model.prod_SE1 = variableArray(len(model.instance.constraints['SE1']),model.numTeams,model.numTeams,model.numSlots,model.numSlots)
+    for l,SE1_constraint in enumerate(model.instance.constraints['SE1']):
+        k_min_se1 = SE1_constraint.min
+        penalty_se1 = SE1_constraint.penalty*model.pairWeight
+        type_ = SE1_constraint.type
+        for s1,s2 in slotPairs(model):
+            D_SE1[l,s1,s2] = solver.NumVar(0,k_min_se1,model.name('D_SE1[{0}][{1}][{2}]',s2,s1,l))
+            solver.Add(D_SE1[l,s1,s2] >= k_min_se1 - s2 + s1)
+
+        # Like the window encoding, only pairs of teams in the record are charged.
+        for i,j in se1Pairs(model, SE1_constraint):
+            for s1,s2 in slotPairs(model):
+                prod_SE1[l,i,j,s1,s2] = solver.NumVar(0,k_min_se1,model.name('prod_SE1[{0}][{1}][{2}][{3}][{4}]',s2,s1,j,i,l))
+                solver.Add(prod_SE1[l,i,j,s1,s2]<=k_min_se1*y[i,j,s1,s2])
+                solver.Add(prod_SE1[l,i,j,s1,s2]<=D_SE1[l,s1,s2])
+                solver.Add(prod_SE1[l,i,j,s1,s2] >=D_SE1[l,s1,s2]-k_min_se1*(1-y[i,j,s1,s2]))
+                if type_ == "HARD":
+                    solver.Add(prod_SE1[l,i,j,s1,s2]==0)
+                else:
+                    objective.SetCoefficient(prod_SE1[l,i,j,s1,s2],penalty_se1)
+
+
+def addSE1Window(model):
+    # The pairs encoding charges penalty*max(0, min - (s2 - s1)) per ordered
+    # pair. With d = s2 - s1 that equals the number of w in 1..min-1 with d <= w,
+    # so v[l,i,j,w] >= X[s] + sum(X[s+1..s+w]) - 1 over every s, weighted by
+    # penalty for both orderings, gives the same objective. A pair meets exactly
+    # twice, so the row is tight only when both meetings lie within w slots.
+    solver = model.solver
+    objective = model.objective
+    numSlots = model.numSlots
+    X = model.X
+    v_SE1 = model.v_SE1 = {}
+    for l,SE1_constraint in enumerate(model.instance.constraints['SE1']):
+        k_min_se1 = SE1_constraint.min
+        penalty_se1 = SE1_constraint.penalty*2
+        hard = SE1_constraint.type == "HARD"
+        teams_ = sorted(SE1_constraint.teams)
+        # A HARD element only needs the widest window, which is forced to zero.
+        windows = [k_min_se1-1] if hard else range(1,k_min_se1)
+        for a,i in enumerate(teams_):
+            for j in teams_[a+1:]:
+                for w in windows:
+                    if w < 1:
+                        continue
+                    v_SE1[l,i,j,w] = solver.NumVar(0,0 if hard else 1,model.name('v_SE1[{0}][{1}][{2}][{3}]',w,j,i,l))
+                    for s in range(numSlots-1):
+                        solver.Add(v_SE1[l,i,j,w] >= X[i,j,s] + solver.Sum([X[i,j,t] for t in range(s+1,min(s+w+1,numSlots))]) - 1)
+                    if not hard:
+                        objective.SetCoefficient(v_SE1[l,i,j,w],penalty_se1)
+
+
+# # Fairness Constraints
+
+# # FA2
+
+def addFA2(model):
+    solver = model.solver
+    objective = model.objective
+    home = model.home
+    D_FA2 = model.D_FA2 = {}
+    diff_FA2 = model.diff_FA2 = {}
+    for l,FA2_constraint in enumerate(model.instance.constraints['FA2']):
+        intp = FA2_constraint.intp
+        penalty = FA2_constraint.penalty*model.pairWeight
+        team_FA2 = FA2_constraint.teams
+        type_FA2 = FA2_constraint.type
+        for slot_FA2 in FA2_constraint.slots:
+            slots_FA2 = list(range(slot_FA2+1))
+            for i in team_FA2:
+                for j in team_FA2:
+                    if model.formulation == 'compact' and i >= j:
+                        continue
+                    D_FA2[slots_FA2[-1],i,j] = solver.NumVar(0,solver.infinity(),model.name('D_FA2[{0}][{1}][{2}]',slots_FA2[-1],j,i))
+                    diff_FA2[slots_FA2[-1],i,j] = solver.NumVar(0,solver.infinity(),model.name('diff_FA2[{0}][{1}][{2}]',slots_FA2[-1],j,i))
+                    home_i = solver.Sum([home[i,s] for s in slots_FA2])
+                    home_j = solver.Sum([home[j,s] for s in slots_FA2])
+                    solver.Add(diff_FA2[slots_FA2[-1],i,j] >= home_i-home_j)
+                    solver.Add(diff_FA2[slots_FA2[-1],i,j] >= home_j-home_i)
+                    solver.Add(D_FA2[slots_FA2[-1],i,j] >= diff_FA2[slots_FA2[-1],i,j] -intp)
+                    if type_FA2=="HARD":
+                        solver.Add(D_FA2[slots_FA2[-1],i,j] ==0)
+                    else:
+                        objective.SetCoefficient(D_FA2[slots_FA2[-1],i,j],penalty)
+
+
+def scheduleArray(model):
+    # (slot, home, away) rows for every game of the solved schedule. The home
+    # game variables and their rows are gathered once per model; each call then
+    # reads the values in one pass into a preallocated array.
+    if model.homeVariables is None:
+        s, i, j = np.indices((model.numSlots, model.numTeams, model.numTeams)).reshape(3, -1)
+        model.homeGames = np.stack([s, i, j], axis=1)[i != j].astype(np.int32)
+        H = model.H
+        model.homeVariables = [H[i,j,s,0] for s,i,j in model.homeGames.tolist()]
+    values = np.fromiter((var.solution_value() for var in model.homeVariables), dtype=np.float64,
+                         count=len(model.homeVariables))
+    return model.homeGames[values > 0.5]
+
+
+def scheduledGames(model):
+    # (slot, home, away) for every game of the solved schedule.
+    return [tuple(game) for game in scheduleArray(model).tolist()]
+
+
+def penaltyValues(model, verbose=False):
+    # Objective split per constraint family, read back from the deviation
+    # variables; verbose prints every non-zero deviation.
+    instance = model.instance
+    numTeams = model.numTeams
+    numSlots = model.numSlots
+    H = model.H
+    home = model.home
+    objectiveVal = defaultdict(int)
+
+    # ## CA1 D_Value
+    objectiveVal['CA1'] = 0
+    D_CA1 = model.D_CA1
+    for i,constraintsSet in enumerate(instance.constraints['CA1']):
+        slots_ = list(constraintsSet.slots)
+        penalty_ = constraintsSet.penalty
+        for team_a in constraintsSet.teams:
+            if D_CA1[i,team_a].solution_value() > 0:
+                if verbose:
+                    print("i : ",i," CA1 D VAlue : ",D_CA1[i,team_a].solution_value()," Slots :",slots_)
+                objectiveVal['CA1'] += (D_CA1[i,team_a].solution_value()*penalty_)
+
+    # ## CA2 D_Value
+    objectiveVal['CA2'] = 0
+    D_CA2 = model.D_CA2
+    for i,constraintsSet in enumerate(instance.constraints['CA2']):
+        slots_ = list(constraintsSet.slots)
+        penalty_ = constraintsSet.penalty
+        for team_1 in constraintsSet.teams1:
+            if D_CA2[i,team_1].solution_value()>0:
+                objectiveVal['CA2'] += (D_CA2[i,team_1].solution_value()*penalty_)
+                if verbose:
+                    print("i : ",i," CA2 D VAlue : ",D_CA2[i,team_1].solution_value()," Slots :",slots_)
+
+    # ## CA3 D Value
+    objectiveVal['CA3'] = 0
+    D_CA3 = model.D_CA3
+    for i,constraintsSet in enumerate(instance.constraints['CA3']):
+        intp = constraintsSet.intp
+        team_2 = list(constraintsSet.teams2)
+        penalty_ = constraintsSet.penalty
+        for t in constraintsSet.teams1:
+            for l in range(numSlots - intp + 1):
+                if D_CA3[i,l,t].solution_value()>0:
+                    objectiveVal['CA3'] += (D_CA3[i,l,t].solution_value()*penalty_)
+                    if verbose:
+                        print("i = {0} slot = {1} team = {2}".format(i,l,t)," CA3 D_VALUE ",D_CA3[i,l,t].solution_value(),"TEAMS 2 : ",team_2)
+
+    # ## CA4 D Value
+    objectiveVal['CA4'] = 0
+    D_CA4 = model.D_CA4
+    for l,constraintsSet in enumerate(instance.constraints['CA4']):
+        slots_ = constraintsSet.slots
+        penalty_ = constraintsSet.penalty
+        objectiveVal['CA4'] += (D_CA4[l].solution_value()*penalty_)
+        if verbose and constraintsSet.mode2 == "GLOBAL":
+            if constraintsSet.type == "HARD":
+                mod = modes(constraintsSet.mode1)
+                adg = sum([H[i,j,slot,m].solution_value() for i in constraintsSet.teams1 for j in constraintsSet.teams2 for m in mod for slot in slots_])
+                print("l = ",l,"CA4 D Val",D_CA4[l].solution_value(),"Check Value = ",adg," max = ",constraintsSet.max)
+
+    # ## GA1 D Value
+    objectiveVal['GA1'] = 0
+    D_GA1 = model.D_GA1
+    for i,constraint_set in enumerate(instance.constraints['GA1']):
+        Groups = ['{0},{1}'.format(h,a) for h,a in zip(constraint_set.homes,constraint_set.aways)]
+        penalty_ = constraint_set.penalty
+        objectiveVal['GA1'] += (D_GA1[i].solution_value()*penalty_)
+        if verbose:
+            print("i : ",i," GA1 D_VALUE ",D_GA1[i].solution_value(),"Groups  : ",Groups)
+
+    # ## BR1 D Value
+    objectiveVal['BR1'] = 0
+    D_BR1 = model.D_BR1
+    for i,BR1_constraint in enumerate(instance.constraints['BR1']):
+        slots_BR1 = list(BR1_constraint.slots)
+        penalty_ = BR1_constraint.penalty
+        objectiveVal['BR1'] += (D_BR1[i].solution_value()*penalty_)
+        if verbose:
+            print("Slots : ",slots_BR1,"D Value ",D_BR1[i].solution_value())
+
+    # ## BR2 D Value
+    objectiveVal['BR2'] = 0
+    D_BR2 = model.D_BR2
+    for i,BR2_constraint in enumerate(instance.constraints['BR2']):
+        penalty_ = BR2_constraint.penalty
+        objectiveVal['BR2'] += (D_BR2[i].solution_value()*penalty_)
+        if verbose:
+            print("BR2 D Value ", D_BR2[i].solution_value())
+
+    # ## FA2 D Value
+    objectiveVal['FA2'] = 0
+    D_FA2 = model.D_FA2
+    for l,FA2_constraint in enumerate(instance.constraints['FA2']):
+        team_FA2 = FA2_constraint.teams
+        penalty_ = FA2_constraint.penalty*model.pairWeight
+        for slot_FA2 in FA2_constraint.slots:
+            slots_FA2 = list(range(slot_FA2+1))
+            if verbose:
+                print(slots_FA2)
+            for i in team_FA2:
+                for j in team_FA2:
+                    if (slots_FA2[-1],i,j) not in D_FA2:
+                        continue
+                    objectiveVal['FA2'] += (D_FA2[slots_FA2[-1],i,j].solution_value()*penalty_)
+                    if not verbose:
+                        continue
+                    home_i = sum([home[i,s].solution_value() for s in slots_FA2])
+                    home_j = sum([home[j,s].solution_value() for s in slots_FA2])
+                    print("Slots = {0} Team_i = {1} home_i = {3} Team_j = {2} home_j = {4} val = ".format(slots_FA2[-1],i,j,home_i,home_j),D_FA2[slots_FA2[-1],i,j].solution_value())
+
+    # ## SE1 D Value
+    objectiveVal['SE1'] = 0
+    if model.se1 == 'window':
+        v_SE1 = model.v_SE1
+        for l,SE1_constraint in enumerate(instance.constraints['SE1']):
+            shortfall = defaultdict(int)
+            for (l_,i,j,w),v in v_SE1.items():
+                if l_ == l:
+                    shortfall[i,j] += round(v.solution_value())
+            for (i,j),value in sorted(shortfall.items()):
+                if value > 0:
+                    objectiveVal['SE1'] += (1+value)*SE1_constraint.penalty
+                    if verbose:
+                        print("Team i = {0}, Team j ={1} shortfall = ".format(i,j),value)
+        return objectiveVal
+
+    prod_SE1 = model.prod_SE1
+    for l,SE1_constraint in enumerate(instance.constraints['SE1']):
+        penalty_ = SE1_constraint.penalty*model.pairWeight
+        if verbose:
+            print(sum([prod_SE1[l,i,j,s1,s2].solution_value() for i,j in se1Pairs(model, SE1_constraint) for s1,s2 in slotPairs(model)]))
+        for i,j in se1Pairs(model, SE1_constraint):
+            for s1,s2 in slotPairs(model):
+                if prod_SE1[l,i,j,s1,s2].solution_value() > 0:
+                    objectiveVal['SE1'] += ((1+round(prod_SE1[l,i,j,s1,s2].solution_value()))*penalty_)
+                    if verbose:
+                        print("Team i = {0}, Team j ={1}, s1 = {2},s2 = {3} prod Val = ".format(i,j,s1,s2),prod_SE1[l,i,j,s1,s2].solution_value())
+    objectiveVal['SE1'] /= 2
+
+    return objectiveVal
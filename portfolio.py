@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Racing solver portfolio on one instance.
+#
+# Every configuration (backend, solver, seed, formulation, SE1 encoding, warm
+# start, ...) solves the same instance in its own spawned process with
+# simpleTimetable.run, writing its solution files and log to its own directory.
+# Each worker sends its result back on its own pipe, so stopping a worker can
+# never corrupt what the others send. CP-SAT workers publish their incumbent
+# objective and bound in a shared array; a CP-SAT worker stops as soon as its
+# incumbent meets the best bound any worker has proved. Neither CP-SAT nor
+# pywraplp accepts a new incumbent mid-search, so schedules themselves are not
+# passed between workers. The race ends when a worker proves optimality (or
+# finishes at or below a proved bound) or when the time limit plus a grace
+# period for building and writing has passed; the remaining workers are then
+# terminated. The winner's solution files are moved next to the instance and
+# the race is appended to a JSON-lines log for tuning defaults per league.
+from multiprocessing.connection import wait
+from service import JOB_OPTIONS
+from instance import loadInstance
+import multiprocessing
+import contextlib
+import argparse
+import tempfile
+import json
+import glob
+import math
+import os
+import sys
+import time
+
+DEFAULT_CONFIGS = [
+    {'name': 'cbc-full', 'backend': 'mip', 'formulation': 'full'},
+    {'name': 'cbc-compact-window', 'backend': 'mip', 'formulation': 'compact', 'se1': 'window'},
+    {'name': 'cpsat-seed0', 'backend': 'cpsat', 'seed': 0},
+    {'name': 'cpsat-seed1-warm', 'backend': 'cpsat', 'seed': 1, 'warmStart': 10},
+]
+EPSILON = 1e-6
+
+
+def configArgv(config, options):
+    # simpleTimetable options of a configuration: the JOB_OPTIONS keys, then
+    # its raw "options" list, then the options shared by every configuration.
+    argv = []
+    for name, value in config.items():
+        if name in ('name', 'options'):
+            continue
+        if name not in JOB_OPTIONS:
+            raise ValueError('unknown option {0} in configuration {1}'.format(name, config.get('name')))
+        option, type_ = JOB_OPTIONS[name]
+        argv += [option, str(type_(value))]
+    return argv + list(config.get('options', [])) + list(options)
+
+
+def loadConfigs(fileName):
+    if fileName is None:
+        configs = [dict(config) for config in DEFAULT_CONFIGS]
+    else:
+        with open(fileName) as f:
+            configs = json.load(f)
+    for k, config in enumerate(configs):
+        config.setdefault('name', 'config{0}'.format(k))
+    names = [config['name'] for config in configs]
+    if len(set(names)) != len(names):
+        raise ValueError('configuration names must be unique')
+    return configs
+
+
+def workerMain(k, fileName, argv, directory, conn, shared):
+    # shared holds (objective, bound) per worker, written without a lock: a
+    # worker terminated mid-write leaves at most its own entry stale.
+    import simpleTimetable
+
+    def onIncumbent(objective, seconds, bound):
+        shared[2*k] = min(shared[2*k], objective)
+        shared[2*k+1] = max(shared[2*k+1], bound)
+        return objective <= max(shared[1::2]) + EPSILON
+
+    try:
+        with open(os.path.join(directory, 'run.log'), 'w') as log, contextlib.redirect_stdout(log):
+            code, result = simpleTimetable.run([fileName] + argv + ['--solution-dir', directory], onIncumbent)
+        result.pop('phases', None)
+    except (Exception, SystemExit) as error:
+        result = {'status': 'ERROR', 'error': repr(error)}
+    conn.send(result)
+    conn.close()
+
+
+def proved(result, bound):
+    # the run's schedule is optimal: by its own proof or by a bound of another run
+    if result.get('status') == 'OPTIMAL':
+        return True
+    objective = result.get('solverObjective')
+    return objective is not None and objective <= bound + EPSILON
+
+
+def pickWinner(results, bound):
+    finished = [(name, result) for name, result in results.items() if result.get('solverObjective') is not None]
+    if not finished:
+        return None
+    optimal = [name for name, result in finished if proved(result, bound)]
+    if optimal:
+        return optimal[0]
+    return min(finished, key=lambda item: item[1]['solverObjective'])[0]
+
+
+def race(fileName, configs, timeLimit, threads, options, workDir, grace):
+    # Returns {name: result}, the finishing order, the best bound proved and
+    # the winner's name (None when nothing was found).
+    context = multiprocessing.get_context('spawn')
+    shared = context.Array('d', [math.inf, -math.inf]*len(configs), lock=False)
+    running = {}
+    for k, config in enumerate(configs):
+        directory = os.path.join(workDir, config['name'])
+        os.makedirs(directory, exist_ok=True)
+        argv = ['--time-limit', str(timeLimit), '--threads', str(threads)] + configArgv(config, options)
+        receiver, sender = context.Pipe(duplex=False)
+        process = context.Process(target=workerMain, args=(k, fileName, argv, directory, sender, shared), daemon=True)
+        process.start()
+        sender.close()
+        running[receiver] = (k, config['name'], process)
+        print("started ",config['name']," pid = ",process.pid," options = ",' '.join(argv))
+    deadline = time.perf_counter() + timeLimit + grace
+    results = {}
+    order = []
+    winner = None
+    while running and winner is None:
+        for receiver in wait(list(running), timeout=max(0.0, min(1.0, deadline - time.perf_counter()))):
+            k, name, process = running.pop(receiver)
+            try:
+                result = receiver.recv()
+            except EOFError:
+                result = {'status': 'ERROR', 'error': 'worker exited with code {0}'.format(process.exitcode)}
+            process.join()
+            results[name] = result
+            order.append(name)
+            bound = result.get('bound')
+            if bound is not None:
+                shared[2*k+1] = max(shared[2*k+1], bound)
+            print("finished ",name," status = ",result.get('status')," objective = ",result.get('solverObjective'),
+                  " bound = ",bound)
+            if proved(result, max(shared[1::2])):
+                winner = name
+        if time.perf_counter() > deadline:
+            break
+    for receiver, (k, name, process) in running.items():
+        process.terminate()
+        process.join()
+        receiver.close()
+        results[name] = {'status': 'STOPPED'}
+        print("stopped ",name)
+    bound = max(shared[1::2])
+    return results, order, bound, winner or pickWinner(results, bound)
+
+
+def claimSolution(fileName, directory):
+    # Moves the winner's solution files next to the instance.
+    stem = os.path.basename(fileName)[:-4]
+    for path in glob.glob(os.path.join(directory, stem + '_solution.*')):
+        os.replace(path, os.path.join(os.path.dirname(os.path.abspath(fileName)), os.path.basename(path)))
+
+
+def printResults(configs, results, winner):
+    print("{0:<24}{1:>12}{2:>12}{3:>12}{4:>10}".format('configuration','status','objective','bound','seconds'))
+    for config in configs:
+        result = results[config['name']]
+        bound = result.get('bound')
+        print("{0:<24}{1:>12}{2:>12}{3:>12}{4:>10}{5}".format(
+            config['name'], result.get('status', ''), str(result.get('solverObjective', '')),
+            '' if bound is None else round(bound, 2), round(result.get('totalTime', 0.0), 1),
+            '  <- winner' if config['name'] == winner else ''))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Race several solver configurations on one ITC2021 instance.',
+                                     epilog='Options after -- are passed to simpleTimetable.py for every configuration.')
+    parser.add_argument('fileName', help='ITC2021 instance XML')
+    parser.add_argument('--configs', default=None,
+                        help='JSON list of configurations, e.g. [{"name": "cpsat-1", "backend": "cpsat", "seed": 1}] '
+                             '(keys as the service job options, plus "options": [raw simpleTimetable options])')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='time limit of every configuration (default: 60)')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='threads per configuration (default: cores // configurations, at least 1)')
+    parser.add_argument('--grace', type=float, default=30.0,
+                        help='seconds past the time limit for building and writing before workers are stopped (default: 30)')
+    parser.add_argument('--work-dir', default=None, help='directory for per-configuration logs and solutions (default: temporary)')
+    parser.add_argument('--log', default='portfolio.jsonl', help='JSON-lines file the race is appended to (default: portfolio.jsonl)')
+    argv = sys.argv[1:] if argv is None else argv
+    options = []
+    if '--' in argv:
+        options = argv[argv.index('--')+1:]
+        argv = argv[:argv.index('--')]
+    args = parser.parse_args(argv)
+    try:
+        configs = loadConfigs(args.configs)
+        for config in configs:
+            configArgv(config, options)
+    except ValueError as error:
+        parser.error(str(error))
+    threads = args.threads or max(1, (os.cpu_count() or 1)//len(configs))
+    workDir = args.work_dir or tempfile.mkdtemp(prefix='itc2021-portfolio-')
+    instance = loadInstance(args.fileName)
+    print("configurations = ",len(configs)," threads each = ",threads," work directory = ",workDir)
+
+    begin = time.perf_counter()
+    results, order, bound, winner = race(args.fileName, configs, args.time_limit, threads, options, workDir, args.grace)
+    elapsed = time.perf_counter() - begin
+    printResults(configs, results, winner)
+    if winner:
+        claimSolution(args.fileName, os.path.join(workDir, winner))
+        print("winner = ",winner," objective = ",results[winner]['solverObjective']," bound = ",bound,
+              " time = ",round(elapsed,3))
+    else:
+        print("no configuration found a schedule, time = ",round(elapsed,3))
+    with open(args.log, 'a') as f:
+        f.write(json.dumps({'instance': os.path.basename(args.fileName), 'teams': instance.numTeams,
+                            'slots': instance.numSlots, 'phased': instance.boolPhase, 'timeLimit': args.time_limit,
+                            'threads': threads, 'winner': winner, 'bound': None if math.isinf(bound) else bound,
+                            'seconds': elapsed, 'order': order,
+                            'configs': dict((config['name'], dict(config, result=results[config['name']])) for config in configs)},
+                           default=str) + '\n')
+    return 0 if winner else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+# coding: utf-8
+# Instance presolve.
+#
+# Works on the domain of the home-game variables, allowed[i,j,s] (team i may
+# host j in slot s) and forced[i,j,s], before any model is built:
+#   - HARD CA1/CA2/GA1 with max 0 forbid the games they count and are dropped;
+#   - HARD GA1 with min equal to its number of meetings forbids those meetings
+#     outside its slots, and is dropped when max allows all of them;
+#   - records that no schedule can violate (min <= 0 and max at least the
+#     most games they can count) are dropped, HARD or SOFT;
+#   - propagation: a pair with one slot left, or a team with one game left in
+#     a slot, is forced; a forced game rules out every other game of both teams
+#     in its slot and the pair's other slots (and the return game in the same
+#     half on phased instances).
+# A pair or team-slot with no game left raises ValueError. The model is then
+# built from the reduced instance and the decided variables are fixed.
+from collections import Counter
+from typing import NamedTuple
+from model import modes
+import numpy as np
+
+
+class Presolved(NamedTuple):
+    instance: object
+    allowed: np.ndarray
+    forced: np.ndarray
+    removed: dict
+    stats: dict
+
+
+def recordSize(family, record, numSlots):
+    # (columns, rows) the model builds for a record
+    if family == 'CA1':
+        return len(record.teams), 2*len(record.teams)
+    if family == 'CA2':
+        return len(record.teams1), (3 if record.type == 'HARD' else 2)*len(record.teams1)
+    if family == 'GA1':
+        return 1, 3 if record.type == 'HARD' else 2
+    if family == 'CA3':
+        windows = (numSlots - record.intp + 1)*len(record.teams1)
+        return windows, 2*windows
+    return 0, 0
+
+
+def forbid(allowed, family, record):
+    if family == 'CA1':
+        for t in record.teams:
+            for s in record.slots:
+                if record.mode == 'H':
+                    allowed[t,:,s] = False
+                else:
+                    allowed[:,t,s] = False
+    elif family == 'CA2':
+        for t in record.teams1:
+            for j in record.teams2:
+                for s in record.slots:
+                    for m in modes(record.mode1):
+                        if m == 0:
+                            allowed[t,j,s] = False
+                        else:
+                            allowed[j,t,s] = False
+    elif family == 'GA1':
+        for h,a in zip(record.homes, record.aways):
+            for s in record.slots:
+                allowed[h,a,s] = False
+
+
+def mostCounted(family, record):
+    # the largest count a schedule can reach for the record, None if unknown
+    if family == 'CA1' or family == 'CA2':
+        return len(record.slots)
+    if family == 'GA1':
+        return len(set(zip(record.homes, record.aways)))
+    if family == 'CA3':
+        return record.intp
+    return None
+
+
+def presolve(instance):
+    numTeams = instance.numTeams
+    numSlots = instance.numSlots
+    allowed = np.ones((numTeams, numTeams, numSlots), dtype=bool)
+    allowed[np.arange(numTeams), np.arange(numTeams), :] = False
+    removed = Counter()
+    columns = rows = 0
+    constraints = {}
+    for family, records in instance.constraints.items():
+        kept = []
+        for record in records:
+            drop = False
+            most = mostCounted(family, record)
+            if most is not None and record.min > most and record.type == 'HARD':
+                raise ValueError('{0} needs at least {1} games where at most {2} can be counted'.format(family, record.min, most))
+            if most is not None and record.min <= 0 and record.max >= most:
+                drop = True
+            elif record.type == 'HARD' and family in ('CA1', 'CA2', 'GA1') and record.max == 0:
+                forbid(allowed, family, record)
+                drop = True
+            elif record.type == 'HARD' and family == 'GA1' and record.min == most:
+                outside = np.setdiff1d(np.arange(numSlots), np.asarray(record.slots))
+                for h,a in set(zip(record.homes, record.aways)):
+                    allowed[h,a,outside] = False
+                drop = record.max >= most
+            if drop:
+                removed[family] += 1
+                size = recordSize(family, record, numSlots)
+                columns += size[0]
+                rows += size[1]
+            else:
+                kept.append(record)
+        constraints[family] = kept
+    forced = propagate(instance, allowed)
+    decided = int(np.count_nonzero(~allowed | forced)) - numTeams*numSlots
+    stats = {'fixed': decided, 'forced': int(np.count_nonzero(forced)), 'records': sum(removed.values()),
+             'columns': columns, 'rows': rows}
+    return Presolved(instance._replace(constraints=constraints), allowed, forced, dict(removed), stats)
+
+
+def propagate(instance, allowed):
+    # Forces games until nothing changes; allowed is narrowed in place.
+    numTeams = instance.numTeams
+    numSlots = instance.numSlots
+    halfSlot = instance.halfSlot
+    forced = np.zeros_like(allowed)
+    changed = True
+    while changed:
+        changed = False
+        perPair = allowed.sum(axis=2)
+        perPair[np.arange(numTeams), np.arange(numTeams)] = 1
+        if (perPair == 0).any():
+            i, j = np.argwhere(perPair == 0)[0]
+            raise ValueError('team {0} can never host team {1}'.format(i, j))
+        perTeamSlot = allowed.sum(axis=1) + allowed.sum(axis=0)
+        if (perTeamSlot == 0).any():
+            t, s = np.argwhere(perTeamSlot == 0)[0]
+            raise ValueError('team {0} has no possible game in slot {1}'.format(t, s))
+        candidates = set()
+        for i, j in np.argwhere(perPair == 1):
+            if i != j:
+                candidates.add((i, j, int(np.flatnonzero(allowed[i,j])[0])))
+        for t, s in np.argwhere(perTeamSlot == 1):
+            opponents = np.flatnonzero(allowed[t,:,s])
+            if len(opponents):
+                candidates.add((t, opponents[0], s))
+            else:
+                candidates.add((np.flatnonzero(allowed[:,t,s])[0], t, s))
+        for i, j, s in sorted(candidates):
+            if forced[i,j,s]:
+                continue
+            if not allowed[i,j,s]:
+                raise ValueError('team {0} hosting team {1} in slot {2} is both forced and ruled out'.format(i, j, s))
+            forced[i,j,s] = True
+            changed = True
+            for t in (i, j):
+                allowed[t,:,s] = False
+                allowed[:,t,s] = False
+            allowed[i,j,:] = False
+            if instance.boolPhase:
+                half = slice(0, halfSlot) if s < halfSlot else slice(halfSlot, numSlots)
+                allowed[j,i,half] = False
+            allowed[i,j,s] = True
+    return forced
+
+
+def applyFixes(model, presolved, backend):
+    # Fixes the decided home-game variables of a built model; returns how many.
+    decided = np.argwhere(~presolved.allowed | presolved.forced)
+    count = 0
+    for i, j, s in decided.tolist():
+        if i == j:
+            continue
+        value = int(presolved.forced[i,j,s])
+        if backend == 'cpsat':
+            model.model.Add(model.x[i,j,s] == value)
+        else:
+            model.H[i,j,s,0].SetBounds(value, value)
+        count += 1
+    return count
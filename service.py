@@ -0,0 +1,345 @@
+#!/usr/bin/env python
+# coding: utf-8
+# Local HTTP/JSON scheduling service.
+#
+#   POST   /jobs?timeLimit=60&priority=5&backend=cpsat   body: instance XML -> {"id": ...}
+#   GET    /jobs                                         all jobs
+#   GET    /jobs/<id>                                    status, incumbent, objective, result
+#   GET    /jobs/<id>/solution                           the _solution.xml once solved
+#   DELETE /jobs/<id>                                    cancel a queued or running job
+#
+# Jobs wait in a priority queue (higher priority first, then submission order)
+# and run in a fixed pool of worker processes. A worker imports OR-tools and
+# simpleTimetable once and then solves job after job with simpleTimetable.run,
+# so a job pays for neither interpreter start-up nor imports. A running job is
+# cancelled by terminating its worker, which is replaced by a fresh one. Each
+# worker reports on its own pipe (as in portfolio.py), so terminating one
+# mid-message can only break that pipe, never the events of the other jobs.
+# CP-SAT incumbents are reported while the job runs. The server only listens
+# on localhost; job files live in a scratch directory.
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from multiprocessing.connection import wait
+import xml.etree.ElementTree as ElementTree
+import multiprocessing
+import contextlib
+import threading
+import argparse
+import tempfile
+import heapq
+import queue
+import signal
+import json
+import os
+import sys
+import time
+
+# query parameter -> (simpleTimetable option, type)
+JOB_OPTIONS = {
+    'backend': ('--backend', str),
+    'formulation': ('--formulation', str),
+    'se1': ('--se1', str),
+    'solver': ('--solver', str),
+    'threads': ('--threads', int),
+    'relGap': ('--rel-gap', float),
+    'absGap': ('--abs-gap', float),
+    'seed': ('--seed', int),
+    'warmStart': ('--warm-start', int),
+    'localSearch': ('--local-search', float),
+}
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+def workerMain(tasks, conn):
+    # Runs in every worker process: imports once, then solves tasks until None
+    # and sends the job's events on conn.
+    import simpleTimetable
+    parent = os.getppid()
+    while True:
+        try:
+            task = tasks.get(timeout=1.0)
+        except queue.Empty:
+            if os.getppid() != parent:
+                return
+            continue
+        if task is None:
+            return
+        jobId, fileName, argv = task
+        conn.send(('started', jobId, os.getpid()))
+
+        def onIncumbent(objective, seconds, bound):
+            conn.send(('incumbent', jobId, objective))
+
+        try:
+            with open(fileName[:-4] + '.log', 'w') as log, contextlib.redirect_stdout(log):
+                code, result = simpleTimetable.run([fileName] + argv, onIncumbent)
+            result.pop('phases', None)
+            conn.send(('done', jobId, code, result))
+        except (Exception, SystemExit) as error:
+            conn.send(('failed', jobId, repr(error)))
+
+
+class Worker(object):
+    def __init__(self, context):
+        self.tasks = context.Queue()
+        self.receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=workerMain, args=(self.tasks, sender), daemon=True)
+        self.process.start()
+        sender.close()
+        self.jobId = None
+
+
+class JobManager(object):
+    def __init__(self, workers=1, directory=None, timeLimit=60.0, maxTimeLimit=3600.0):
+        self.directory = directory or tempfile.mkdtemp(prefix='itc2021-jobs-')
+        self.timeLimit = timeLimit
+        self.maxTimeLimit = maxTimeLimit
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.queue = []
+        self.counter = 0
+        self.context = multiprocessing.get_context('spawn')
+        # receivers of replaced workers, closed by listen once drained
+        self.retired = []
+        self.closing = False
+        self.workers = [Worker(self.context) for k in range(workers)]
+        threading.Thread(target=self.listen, daemon=True).start()
+
+    def submit(self, xml, parameters):
+        # Returns the job id; raises ValueError on a bad instance or option.
+        try:
+            ElementTree.fromstring(xml)
+        except ElementTree.ParseError as error:
+            raise ValueError('instance is not XML: {0}'.format(error))
+        timeLimit = float(parameters.get('timeLimit', self.timeLimit))
+        if not 0 < timeLimit <= self.maxTimeLimit:
+            raise ValueError('timeLimit must be in (0, {0}]'.format(self.maxTimeLimit))
+        priority = int(parameters.get('priority', 0))
+        options = ['--verbosity', '0']
+        for name, value in parameters.items():
+            if name in ('timeLimit', 'priority'):
+                continue
+            if name not in JOB_OPTIONS:
+                raise ValueError('unknown option ' + name)
+            option, type_ = JOB_OPTIONS[name]
+            options += [option, str(type_(value))]
+        with self.lock:
+            self.counter += 1
+            jobId = str(self.counter)
+            fileName = os.path.join(self.directory, 'job{0}.xml'.format(jobId))
+            with open(fileName, 'wb') as f:
+                f.write(xml)
+            self.jobs[jobId] = {'id': jobId, 'status': 'queued', 'priority': priority, 'timeLimit': timeLimit,
+                                'options': options, 'submitted': time.time(), 'started': None, 'finished': None,
+                                'incumbent': None, 'objective': None, 'result': None, 'error': None,
+                                'fileName': fileName}
+            heapq.heappush(self.queue, (-priority, self.counter, jobId))
+            self.dispatch()
+        return jobId
+
+    def dispatch(self):
+        # with self.lock held
+        for worker in self.workers:
+            if worker.jobId is not None:
+                continue
+            while self.queue and self.jobs[self.queue[0][2]]['status'] != 'queued':
+                heapq.heappop(self.queue)
+            if not self.queue:
+                return
+            priority, counter, jobId = heapq.heappop(self.queue)
+            job = self.jobs[jobId]
+            worker.jobId = jobId
+            job['status'] = 'running'
+            worker.tasks.put((jobId, job['fileName'], ['--time-limit', str(job['timeLimit'])] + job['options']))
+
+    def cancel(self, jobId):
+        with self.lock:
+            job = self.jobs.get(jobId)
+            if job is None:
+                return None
+            if job['status'] in FINISHED:
+                return job['status']
+            if job['status'] == 'running':
+                for k, worker in enumerate(self.workers):
+                    if worker.jobId == jobId:
+                        worker.process.terminate()
+                        worker.process.join()
+                        self.retired.append(worker.receiver)
+                        self.workers[k] = Worker(self.context)
+            job['status'] = 'cancelled'
+            job['finished'] = time.time()
+            self.dispatch()
+            return job['status']
+
+    def listen(self):
+        while True:
+            with self.lock:
+                receivers = [worker.receiver for worker in self.workers] + self.retired
+            ready = wait(receivers, timeout=1.0)
+            if not ready:
+                self.reap()
+            for receiver in ready:
+                try:
+                    event = receiver.recv()
+                except (EOFError, OSError):
+                    # the worker exited or was terminated
+                    with self.lock:
+                        exited = [worker for worker in self.workers if worker.receiver is receiver]
+                        if receiver in self.retired:
+                            self.retired.remove(receiver)
+                            receiver.close()
+                    for worker in exited:
+                        worker.process.join(1.0)
+                    self.reap()
+                    continue
+                self.handle(event)
+
+    def handle(self, event):
+        kind, jobId = event[0], event[1]
+        with self.lock:
+            job = self.jobs.get(jobId)
+            if job is None or job['status'] in FINISHED:
+                return
+            if kind == 'started':
+                job['started'] = time.time()
+            elif kind == 'incumbent':
+                job['incumbent'] = event[2]
+            else:
+                if kind == 'done':
+                    code, result = event[2], event[3]
+                    job['status'] = 'done' if code == 0 else 'failed'
+                    job['result'] = result
+                    job['objective'] = result.get('objective')
+                else:
+                    job['status'] = 'failed'
+                    job['error'] = event[2]
+                job['finished'] = time.time()
+                for worker in self.workers:
+                    if worker.jobId == jobId:
+                        worker.jobId = None
+                self.dispatch()
+
+    def reap(self):
+        # a worker that died on its own fails its job and is replaced
+        with self.lock:
+            if self.closing:
+                return
+            for k, worker in enumerate(self.workers):
+                if worker.process.is_alive():
+                    continue
+                if worker.jobId is not None and self.jobs[worker.jobId]['status'] == 'running':
+                    job = self.jobs[worker.jobId]
+                    job.update(status='failed', error='worker exited with code {0}'.format(worker.process.exitcode),
+                               finished=time.time())
+                self.retired.append(worker.receiver)
+                self.workers[k] = Worker(self.context)
+            self.dispatch()
+
+    def status(self, jobId=None):
+        with self.lock:
+            if jobId is None:
+                return [self.public(job) for job in self.jobs.values()]
+            job = self.jobs.get(jobId)
+            return self.public(job) if job else None
+
+    def public(self, job):
+        return dict((key, value) for key, value in job.items() if key != 'fileName')
+
+    def solutionFile(self, jobId):
+        with self.lock:
+            job = self.jobs.get(jobId)
+            if job is None or job['status'] != 'done':
+                return None
+            return job['fileName'][:-4] + '_solution.xml'
+
+    def shutdown(self):
+        with self.lock:
+            self.closing = True
+        for worker in self.workers:
+            worker.process.terminate()
+        for worker in self.workers:
+            worker.process.join(5.0)
+
+
+class Handler(BaseHTTPRequestHandler):
+    manager = None
+
+    def reply(self, code, body, contentType='application/json'):
+        if contentType == 'application/json':
+            body = json.dumps(body, indent=2).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', contentType)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def route(self):
+        url = urlparse(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        parameters = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        return parts, parameters
+
+    def do_POST(self):
+        parts, parameters = self.route()
+        if parts != ['jobs']:
+            return self.reply(404, {'error': 'not found'})
+        xml = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            jobId = self.manager.submit(xml, parameters)
+        except ValueError as error:
+            return self.reply(400, {'error': str(error)})
+        self.reply(201, {'id': jobId})
+
+    def do_GET(self):
+        parts, parameters = self.route()
+        if parts == ['jobs']:
+            return self.reply(200, self.manager.status())
+        if len(parts) == 2 and parts[0] == 'jobs':
+            job = self.manager.status(parts[1])
+            return self.reply(200, job) if job else self.reply(404, {'error': 'unknown job'})
+        if len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'solution':
+            fileName = self.manager.solutionFile(parts[1])
+            if fileName is None or not os.path.exists(fileName):
+                return self.reply(404, {'error': 'no solution'})
+            with open(fileName, 'rb') as f:
+                return self.reply(200, f.read(), 'application/xml')
+        self.reply(404, {'error': 'not found'})
+
+    def do_DELETE(self):
+        parts, parameters = self.route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self.reply(404, {'error': 'not found'})
+        status = self.manager.cancel(parts[1])
+        if status is None:
+            return self.reply(404, {'error': 'unknown job'})
+        self.reply(200, {'id': parts[1], 'status': status})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve ITC2021 solves over HTTP on localhost.')
+    parser.add_argument('--port', type=int, default=8021, help='port on 127.0.0.1 (default: 8021)')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes (default: 1)')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='default time limit per job (default: 60)')
+    parser.add_argument('--max-time-limit', type=float, default=3600.0, help='largest accepted time limit (default: 3600)')
+    parser.add_argument('--jobs-dir', default=None, help='directory for job files (default: a new temporary directory)')
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+    manager = JobManager(args.workers, args.jobs_dir, args.time_limit, args.max_time_limit)
+    Handler.manager = manager
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), Handler)
+    print("serving on 127.0.0.1:",args.port," workers = ",args.workers," jobs = ",manager.directory)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        manager.shutdown()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
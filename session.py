@@ -0,0 +1,141 @@
+# coding: utf-8
+# Long-lived MIP model for what-if constraint edits.
+#
+# The core of model.py is built once; every constraint record is then added on
+# its own (the family's add function run on an instance holding only that
+# record), so the session knows the rows and columns each record owns. Edits
+# work on the live solver:
+#   remove - the record's rows get infinite bounds and its columns a zero
+#            objective coefficient;
+#   modify - a penalty change of a SOFT record rescales its objective
+#            coefficients, any other change removes the record and adds the
+#            new one;
+#   add    - the new record's rows and columns are appended.
+# solve() hints the previous incumbent to the engine (SCIP, SAT, ... use it,
+# CBC does not) and reports the objective delta and the changed matches.
+#
+#     session = Session(loadInstance('ITC2021_Test4.xml'), settings=SolverSettings(solver='SCIP'))
+#     session.solve()
+#     key = session.add('CA1', CA1(array('i', [3]), array('i', [7]), 0, 0, 'H', 1, 'HARD'))
+#     report = session.solve()        # report['delta'], report['added'], report['removed']
+#     session.remove(key)
+from model import TimetableModel, buildSteps, scheduledGames
+from solverSettings import SolverSettings, solveMip, mipStatusName
+from instance import CONSTRAINT_TYPES
+import time
+
+
+class Session(object):
+
+    def __init__(self, instance, formulation='compact', se1='window', settings=SolverSettings()):
+        begin = time.perf_counter()
+        self.instance = instance
+        self.settings = settings
+        model = self.model = TimetableModel(instance, formulation, se1, settings.solver)
+        self.familySteps = {}
+        for name,step in buildSteps(formulation, se1):
+            if name in CONSTRAINT_TYPES:
+                self.familySteps[name] = step
+            else:
+                step(model)
+        model.objective.SetMinimization()
+        # (family, number) -> record, and -> (rows, columns, objective coefficients)
+        self.records = {}
+        self.parts = {}
+        self.counter = 0
+        for family, records in instance.constraints.items():
+            for record in records:
+                self.add(family, record)
+        self.hint = None
+        self.games = None
+        self.objective = None
+        self.buildTime = time.perf_counter() - begin
+
+    def add(self, family, record):
+        # Returns the key that identifies the record in remove/modify.
+        if family not in self.familySteps:
+            raise ValueError('unknown constraint type ' + family)
+        if family == 'SE1' and self.model.se1 == 'pairs' and self.model.y is None:
+            raise ValueError('SE1 records can only be added with the window encoding or to an instance with SE1')
+        key = (family, self.counter)
+        self.counter += 1
+        self.records[key] = record
+        self.parts[key] = self.build(family, record)
+        return key
+
+    def build(self, family, record):
+        model = self.model
+        solver = model.solver
+        numVariables, numConstraints = model.size()
+        # buildModel leaves HARD GLOBAL CA4 rows constant (they read solution
+        # values before any solve), so they add nothing here either.
+        if not (family == 'CA4' and record.type == 'HARD' and record.mode2 == 'GLOBAL'):
+            constraints = dict((name, []) for name in CONSTRAINT_TYPES)
+            constraints[family] = [record]
+            model.instance = self.instance._replace(constraints=constraints)
+            try:
+                self.familySteps[family](model)
+            finally:
+                model.instance = self.instance
+        rows = [solver.constraint(k) for k in range(numConstraints, solver.NumConstraints())]
+        columns = [solver.variable(k) for k in range(numVariables, solver.NumVariables())]
+        return rows, columns, [model.objective.GetCoefficient(var) for var in columns]
+
+    def remove(self, key):
+        rows, columns, coefficients = self.parts.pop(key)
+        del self.records[key]
+        infinity = self.model.solver.infinity()
+        for row in rows:
+            row.SetBounds(-infinity, infinity)
+        for var in columns:
+            self.model.objective.SetCoefficient(var, 0)
+
+    def modify(self, key, **changes):
+        # modify(key, penalty=5, max=2, ...); returns the record's key, which
+        # is new unless only the penalty of a SOFT record changed.
+        family = key[0]
+        old = self.records[key]
+        new = old._replace(**changes)
+        if set(changes) <= {'penalty'} and old.type == 'SOFT' and old.penalty:
+            rows, columns, coefficients = self.parts[key]
+            coefficients = [coefficient*new.penalty/old.penalty for coefficient in coefficients]
+            for var, coefficient in zip(columns, coefficients):
+                self.model.objective.SetCoefficient(var, coefficient)
+            self.parts[key] = (rows, columns, coefficients)
+            self.records[key] = new
+            return key
+        self.remove(key)
+        return self.add(family, new)
+
+    def currentInstance(self):
+        constraints = dict((family, []) for family in CONSTRAINT_TYPES)
+        for (family, number), record in sorted(self.records.items(), key=lambda item: item[0][1]):
+            constraints[family].append(record)
+        return self.instance._replace(constraints=constraints)
+
+    def solve(self, settings=None):
+        # Re-solves from the previous incumbent; returns status, objective,
+        # delta to the previous objective, the matches (slot, home, away) that
+        # came in and went out, and the solve time.
+        solver = self.model.solver
+        if self.hint:
+            variables, values = self.hint
+            solver.SetHint(variables, values)
+        begin = time.perf_counter()
+        status, ignored = solveMip(solver, settings or self.settings)
+        report = {'status': mipStatusName(status), 'seconds': time.perf_counter() - begin,
+                  'objective': None, 'delta': None, 'added': [], 'removed': []}
+        if status not in (solver.OPTIMAL, solver.FEASIBLE):
+            return report
+        variables = solver.variables()
+        self.hint = (variables, [var.solution_value() for var in variables])
+        games = scheduledGames(self.model)
+        objective = solver.Objective().Value()
+        if self.games is not None:
+            report['delta'] = objective - self.objective
+            report['added'] = sorted(set(games) - set(self.games))
+            report['removed'] = sorted(set(self.games) - set(games))
+        report['objective'] = objective
+        self.games = games
+        self.objective = objective
+        return report
@@ -1,700 +1,440 @@
 #!/usr/bin/env python
 # coding: utf-8
-from ortools.linear_solver import pywraplp
-from collections import defaultdict
-import xml.dom.minidom
+from instance import loadInstance
+from model import buildModel, penaltyValues, scheduleArray, FORMULATIONS, SE1_ENCODINGS
+from solutionWriter import writeSolution, gameArray, objectiveText, OUTPUT_FORMATS
+from solverSettings import loadSettings, solveMip, settingsAttributes, availableMipSolvers, mipStatusName, PRESOLVE_LEVELS
+import cpsatModel
+import localSearch
+import warmStart
+import decomposition
+import lazyCuts
+import presolve
+import fixAndRelax
+import anytime
+import bounds
+from bulkModel import buildBulkModel
+from instrumentation import Instrumentation
+from solutionCache import SolutionCache, SOLUTION_CACHE_DIR, MAX_BYTES, MAX_CHANGES
+import argparse
 import time
 import sys
-start_time = time.perf_counter()
-fileName = sys.argv[1]
-doc = xml.dom.minidom.parse(fileName)
+import os
 
-teams = doc.getElementsByTagName("Teams")[0]
-numTeams = teams.getElementsByTagName("team").length
-numSlots = 2*(numTeams - 1)
-halfSlot = numSlots//2
-boolPhase = False
+BACKENDS = ('mip', 'cpsat')
 
-Structure = doc.getElementsByTagName("Structure")
-if (Structure[0].getElementsByTagName("gameMode")[0].firstChild.data == 'P'):
-    boolPhase = True
 
-X = {}
-H = {}
-
-solver = pywraplp.Solver('simple_mip_program', pywraplp.Solver.CBC_MIXED_INTEGER_PROGRAMMING)
-for i in range(numTeams):
-    for j in range(numTeams):
-        for s in range(numSlots):
-            X[i,j,s] = solver.IntVar(0,1,'X[{0}][{1}][{2}]'.format(s,j,i))
-
-for i in range(numTeams):
-    for j in range(numTeams):
-        for s in range(numSlots):
-            for h in range(2):
-                H[i,j,s,h] = solver.IntVar(0,1,'H[{0}][{1}][{2}][{3}]'.format(h,s,j,i))
-
-
-
-# # **phase**
-# ### A pair of team can not repeat their game in other slots in one phase
-if (boolPhase):
-    for i in range(numTeams):
-        for j in range(numTeams):
-            if i != j:
-                solver.Add(solver.Sum([X[i,j,s] for s in range(halfSlot)])==1)
-                solver.Add(solver.Sum([X[i,j,s] for s in range(halfSlot,numSlots)])==1)
-
-
-# ### A Team can not play with itself
-for s in range(numSlots):
-    for i in range(numTeams):
-        solver.Add(X[i,i,s]==0)
-
-
-# ### In 1 slot, Total matches should be numTeams
-# ### in 1 slot, Each teams can play with other teams only once
-
-for s in range(numSlots):
-    solver.Add(solver.Sum([X[i,j,s] for i in range(numTeams) for j in range(numTeams)])==numTeams)
-    for i in range(numTeams):
-        solver.Add(solver.Sum([X[i,j,s] for j in range(numTeams)]) == 1)
-    for j in range(numTeams):
-        solver.Add(solver.Sum([X[i,j,s] for i in range(numTeams)]) == 1)
-
-
-# Total 48 Constraints
-# ## Symmetry in $X_{ijs}$
-
-for i in range(numTeams):
-    for j in range(numTeams):
-        for s in range(numSlots):
-            solver.Add(X[i,j,s]==X[j,i,s])
-
-
-# ## Introduction of Home Away Variable in $H_{ijsh}$
-
-for i in range(numTeams):
-    for j in range(numTeams):
-        for s in range(numSlots):
-            solver.Add(X[i,j,s]==H[i,j,s,0]+H[i,j,s,1])
-            solver.Add(H[i,j,s,0]==H[j,i,s,1])
-            solver.Add(H[i,j,s,1]==H[j,i,s,0])
+def printSchedule(games, numSlots):
+    opponents = {}
+    for s,i,j in games:
+        opponents[s,i] = j
+        opponents[s,j] = i
+    for s in range(numSlots):
+        for i,j in sorted((i,j) for (s_,i),j in opponents.items() if s_ == s):
+            print("s = ",s," i = ",i,"j = ",j," val = ",1.0)
 
+    for s,i,j in games:
+        print("s = ",s," i = ",i,"j = ",j," h = ",0," val = ",1.0)
 
-# ## Home-Away constraint. A team Should Play with j in both Home and Away state 
 
-for i in range(numTeams):
-    for j in range(numTeams):
-        solver.Add(solver.Sum([H[i,j,s1,1] for s1 in range(numSlots)])==solver.Sum([H[i,j,s2,0] for s2 in range(numSlots)]))
-        if i != j:
-            solver.Add(solver.Sum([H[i,j,s1,1] for s1 in range(numSlots)])==1)
-            solver.Add(solver.Sum([H[i,j,s1,0] for s1 in range(numSlots)])==1)
+def printModelSize(instance):
+    # Variable and row counts of every formulation side by side.
+    print("{0:<10}{1:<8}{2:>12}{3:>12}".format('model','SE1','variables','rows'))
+    for formulation in FORMULATIONS:
+        for se1 in SE1_ENCODINGS:
+            numVariables, numConstraints = buildModel(instance, formulation, se1).size()
+            print("{0:<10}{1:<8}{2:>12}{3:>12}".format(formulation,se1,numVariables,numConstraints))
+    proto = cpsatModel.buildCpModel(instance).model.Proto()
+    print("{0:<10}{1:<8}{2:>12}{3:>12}".format('cpsat','window',len(proto.variables),len(proto.constraints)))
 
 
-# ## introduction of $home_{is}$ and $away_{is}$ variable for $i^{th}$ Team playing Home/Away in Slot $s$
-# ## introduction of $breakHome_{is}$ and $breakAway_{is}$variable for $i^{th}$ Team playing Home/Away break in Slot $s$
+def warmStartGames(instance, count, seed):
+    begin = time.perf_counter()
+    games, objective, infeasibility = warmStart.bestStart(instance, count, seed)
+    print("warm start: best of ",count," objective = ",objective," infeasibility = ",infeasibility,
+          " time = ",round(time.perf_counter() - begin,3))
+    return games
 
-home = {}
-away = {}
-breakHome = {}
-breakAway = {}
-for i in range(numTeams):
-    for s in range(numSlots):
-        home[i,s] = solver.IntVar(0,1,'home[{0}][{1}]'.format(s,i))
-        breakHome[i,s] = solver.IntVar(0,1,'breakHome[{0}][{1}]'.format(s,i))        
-        away[i,s] = solver.IntVar(0,1,'away[{0}][{1}]'.format(s,i))
-        breakAway[i,s] = solver.IntVar(0,1,'breakAway[{0}][{1}]'.format(s,i))
-        
-for i in range(numTeams):
-    for s in range(numSlots):
-        for j in range(numTeams):
-            solver.Add(home[i,s] >= H[i,j,s,0])
-            solver.Add(away[i,s] >= H[i,j,s,1]) 
-for i in range(numTeams):
-    for s in range(numSlots):
-        solver.Add(home[i,s] <= solver.Sum([H[i,j,s,0] for j in range(numTeams)]))
-        solver.Add(away[i,s] <= solver.Sum([H[i,j,s,1] for j in range(numTeams)]))
-for i in range(numTeams):
-    for s in range(1,numSlots):
-        solver.Add(breakHome[i,s] <= home[i,s])
-        solver.Add(breakHome[i,s] <= home[i,s-1])
-        solver.Add(breakHome[i,s] >= home[i,s] + home[i,s-1] - 1)
-        solver.Add(breakAway[i,s] <= away[i,s])
-        solver.Add(breakAway[i,s] <= away[i,s-1])
-        solver.Add(breakAway[i,s] >= away[i,s] + away[i,s-1] - 1)
-
-
-# ## Introduction of $y_{ijs_{1}s_{2}}$ which says whether Team $i$ and Team $j$ played in slot $s_{1}$ the first time and in slot $s_{2}$ the second time
-
-# In[17]:
-
-
-y = {}
-if (not boolPhase):
-    for i in range(numTeams):
-        for j in range(numTeams):
-            for s1 in range(numSlots):
-                for s2 in range(s1,numSlots):
-                    if s1 != s2:
-                        y[i,j,s1,s2] = solver.IntVar(0,1,'y[{0}][{1}][{2}][{3}]'.format(s2,s1,j,i))
-    for i in range(numTeams):
-        for j in range(numTeams):
-            for s1 in range(numSlots):
-                for s2 in range(s1,numSlots):
-                    if s1 != s2:
-                        solver.Add(y[i,j,s1,s2] <= X[i,j,s1])
-                        solver.Add(y[i,j,s1,s2] <= X[i,j,s2])            
-                        solver.Add(y[i,j,s1,s2] >= X[i,j,s1]+X[i,j,s2]-1)            
-else:
-    for i in range(numTeams):
-        for j in range(numTeams):
-            for s1 in range(halfSlot):
-                for s2 in range(halfSlot,numSlots):
-                    if s1 != s2:
-                        y[i,j,s1,s2] = solver.IntVar(0,1,'y[{0}][{1}][{2}][{3}]'.format(s2,s1,j,i))
-    for i in range(numTeams):
-        for j in range(numTeams):
-            for s1 in range(halfSlot):
-                for s2 in range(halfSlot,numSlots):
-                    if s1 != s2:
-                        solver.Add(y[i,j,s1,s2] <= X[i,j,s1])
-                        solver.Add(y[i,j,s1,s2] <= X[i,j,s2])            
-                        solver.Add(y[i,j,s1,s2] >= X[i,j,s1]+X[i,j,s2]-1)
-
-
-constraints = doc.getElementsByTagName("Constraints")[0]
-objective = solver.Objective()
-
-CapacityConstraints = constraints.getElementsByTagName("CapacityConstraints")[0]
-
-
-# ## CA1
-
-
-CA1_constraints =  CapacityConstraints.getElementsByTagName("CA1")
-
-D_CA1 = {}
-for i,constraintsSet in enumerate(CA1_constraints):
-    team_a = int(constraintsSet.getAttribute("teams"))
-    D_CA1[i,team_a] = solver.NumVar(0,solver.infinity(),'D_CA1[{0}][{1}]'.format(team_a,i)) 
-
-    max_ = int(constraintsSet.getAttribute("max"))
-    min_ = int(constraintsSet.getAttribute("min"))
-    mode_ = constraintsSet.getAttribute("mode")
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    slots_ = constraintsSet.getAttribute("slots").split(';')    
-    type_ = constraintsSet.getAttribute("type")
-    
-    if (mode_ == 'H'):
-        mod = 0
-    else:
-        mod = 1
-    if (type_ == "HARD"):
-        solver.Add(min_ <= solver.Sum([H[team_a,j,int(slot),mod] for j in range(numTeams) for slot in slots_]))
-        solver.Add(solver.Sum([H[team_a,j,int(slot),mod] for j in range(numTeams) for slot in slots_]) <= max_)
-    else:
-        solver.Add(D_CA1[i,team_a] >= min_ - solver.Sum([H[team_a,j,int(slot),mod] for j in range(numTeams) for slot in slots_]))
-        solver.Add(D_CA1[i,team_a] >= solver.Sum([H[team_a,j,int(slot),mod] for j in range(numTeams) for slot in slots_]) - max_)
-        objective.SetCoefficient(D_CA1[i,team_a],penalty_)
-
-
-# ## CA2
-
-CA2_constraints =  CapacityConstraints.getElementsByTagName("CA2")
-D_CA2 = {}
-for i,constraintsSet in enumerate(CA2_constraints):
-    team_1 = int(constraintsSet.getAttribute("teams1"))
-    slots_ = constraintsSet.getAttribute("slots").split(';')
-    D_CA2[i,team_1] = solver.NumVar(0,solver.infinity(),'D_CA2[{0}][{1}]'.format(team_1,i)) 
-
-    max_ = int(constraintsSet.getAttribute("max"))
-    min_ = int(constraintsSet.getAttribute("min"))
-    mode_ = constraintsSet.getAttribute("mode1")
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    
-    team_2 = constraintsSet.getAttribute("teams2").split(';')
-    type_ = constraintsSet.getAttribute("type")
-    if (mode_ == 'H'):
-        mod = [0]
-    elif(mode_ == 'A'):
-        mod = [1]
-    else:
-        mod = [0,1]
 
-    solver.Add(D_CA2[i,team_1] >= min_ - solver.Sum([H[team_1,int(j),int(slot),m] for j in team_2 for slot in slots_ for m in mod]))
-    solver.Add(D_CA2[i,team_1] >= solver.Sum([H[team_1,int(j),int(slot),m] for j in team_2 for slot in slots_ for m in mod]) - max_)
-    if (type_ == "HARD"):
-        solver.Add(D_CA2[i,team_1]==0)
-    else:
-        objective.SetCoefficient(D_CA2[i,team_1],penalty_)
-
-# ## CA3
-
-D_CA3 = {} 
-CA3_constraints = CapacityConstraints.getElementsByTagName("CA3")
-for i,constraintsSet in enumerate(CA3_constraints):
-    intp = int(constraintsSet.getAttribute("intp"))
-    team_1 = (constraintsSet.getAttribute("teams1")).split(';')
-    k_max = int(constraintsSet.getAttribute("max"))
-    k_min = int(constraintsSet.getAttribute("min"))
-    mode_1 = constraintsSet.getAttribute("mode1")
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-     
-    team_2 = (constraintsSet.getAttribute("teams2")).split(';')
-    type_ = constraintsSet.getAttribute("type")
-    if mode_1 == 'H':
-        mod = [0]
-    elif mode_1 == 'A':
-        mod = [1]
-    else:
-        mod = [0,1]
-       
-    for l in range(numSlots - intp + 1):
-        for t in team_1:
-            t = int(t) 
-            D_CA3[i,l,t] = solver.NumVar(0,solver.infinity(),'D_CA3[{0}][{1}][{2}]'.format(t,l,i))
-            if (type_ == "HARD"):
-                solver.Add(k_min<=solver.Sum([H[t,int(j),s,m] for j in team_2 for s in range(l,l+intp) for m in mod]))            
-                solver.Add(solver.Sum([H[t,int(j),s,m] for j in team_2 for s in range(l,l+intp) for m in mod]) <= k_max)
-            else:
-                solver.Add(D_CA3[i,l,t] >= k_min - solver.Sum([H[t,int(j),s,m] for j in team_2 for s in range(l,l+intp) for m in mod]))            
-                solver.Add(D_CA3[i,l,t] >= solver.Sum([H[t,int(j),s,m] for j in team_2 for s in range(l,l+intp) for m in mod]) - k_max)
-                objective.SetCoefficient(D_CA3[i,l,t],penalty_)
-
-# ## CA4
-
-CA4_constraints =  CapacityConstraints.getElementsByTagName("CA4")
-D_CA4 = {}
-for l,constraintsSet in enumerate(CA4_constraints):
-    D_CA4[l] = solver.NumVar(0,solver.infinity(),'D_CA4[{0}]'.format(l))
-    max_ = int(constraintsSet.getAttribute("max"))
-    min_ = int(constraintsSet.getAttribute("min"))
-    mode_ = constraintsSet.getAttribute("mode1")
-    mode2 = constraintsSet.getAttribute("mode2")
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    slots_ = constraintsSet.getAttribute("slots").split(';')
-    team_1 = constraintsSet.getAttribute("teams1").split(';')
-    team_2 = constraintsSet.getAttribute("teams2").split(';')
-    type_ = constraintsSet.getAttribute("type")
-    if (mode_ == 'H'):
-        mod = [0]
-    elif(mode_ == 'A'):
-        mod = [1]
-    else:
-        mod = [0,1]
-    if (type_ == "HARD"):
-        if mode2 == "GLOBAL":
-            solver.Add(min_ <= solver.Sum([H[int(i),int(j),int(slot),m].solution_value() for i in team_1 for j in team_2 for m in mod for slot in slots_]))
-            solver.Add(solver.Sum([H[int(i),int(j),int(slot),m].solution_value() for i in team_1 for j in team_2 for m in mod for slot in slots_]) <=  max_)
-        else:
-            for slot in slots_:
-                solver.Add(min_ <= solver.Sum([H[int(i),int(j),int(slot),m] for i in team_1 for j in team_2 for m in mod]))
-                solver.Add(solver.Sum([H[int(i),int(j),int(slot),m] for i in team_1 for j in team_2 for m in mod]) <= max_)
-    else:
-        if mode2 == "GLOBAL":
-            solver.Add(D_CA4[l] >= min_ - solver.Sum([H[int(i),int(j),int(slot),m] for i in team_1 for j in team_2 for slot in slots_ for m in mod]))
-            solver.Add(D_CA4[l] >= solver.Sum([H[int(i),int(j),int(slot),m] for i in team_1 for j in team_2 for slot in slots_ for m in mod]) - max_)
-        else:
-            for slot in slots_:
-                solver.Add(D_CA4[l] >= min_ - solver.Sum([H[int(i),int(j),int(slot),m] for i in team_1 for j in team_2 for m in mod]))
-                solver.Add(D_CA4[l] >= solver.Sum([H[int(i),int(j),int(slot),m] for i in team_1 for j in team_2 for m in mod]) - max_)
-
-        objective.SetCoefficient(D_CA4[l],penalty_)
-
-# ## GA1
-
-D_GA1 = {}
-GameConstraints = constraints.getElementsByTagName("GameConstraints")[0]
-GA1_constraints = GameConstraints.getElementsByTagName("GA1")
-
-for i,constraint_set in enumerate(GA1_constraints):    
-    Groups = constraint_set.getAttribute("meetings").split(';')
-    D_GA1[i] = solver.NumVar(0,solver.infinity(),'D_GA1[{0}]'.format(i))
-    Groups.pop()
-    meeting_list = [0]*len(Groups)
-    for g,group in enumerate(Groups):
-        groupSplit = group.split(',')
-        meeting_list[g] = [int(groupSplit[0]),int(groupSplit[1])]
-    
-    k_max = int(constraint_set.getAttribute("max"))
-    k_min = int(constraint_set.getAttribute("min"))
-    penalty_ = int(constraint_set.getAttribute("penalty"))
-    type_ = constraint_set.getAttribute("type")
-    slots_ = constraint_set.getAttribute("slots").split(';')
-    solver.Add(D_GA1[i] >= k_min - solver.Sum([H[meeting[0],meeting[1],int(s),0] for meeting in meeting_list for s in slots_]))
-    solver.Add(D_GA1[i] >= solver.Sum([H[meeting[0],meeting[1],int(s),0] for meeting in meeting_list for s in slots_]) - k_max)
-    if (type_ == "HARD"):
-        solver.Add(D_GA1[i] == 0)
+def hintModel(model, backend, games, settings):
+    begin = time.perf_counter()
+    if backend == 'cpsat':
+        hinted = warmStart.hintCp(model, games)
     else:
-        objective.SetCoefficient(D_GA1[i],penalty_)
-                
-
-# ## BR1
-
-BreakConstraints = constraints.getElementsByTagName("BreakConstraints")[0]
-D_BR1 = {}
-BR1_constraints = BreakConstraints.getElementsByTagName("BR1")
-for i,BR1_constraint in enumerate(BR1_constraints):
-    slots_BR1 = BR1_constraint.getAttribute("slots").split(';')
-    D_BR1[i] = solver.NumVar(0,solver.infinity(),'D_BR1[{0}]'.format(i))
-    intp = int(BR1_constraint.getAttribute("intp"))
-    mode_is_EQ = BR1_constraint.getAttribute("mode1")
-    isHorA = BR1_constraint.getAttribute("mode2")
-    penalty_BR1 = int(BR1_constraint.getAttribute("penalty"))    
-    team_BR1 = BR1_constraint.getAttribute("teams")
-    type_ = BR1_constraint.getAttribute("type")
-    objective.SetCoefficient(D_BR1[i],penalty_BR1)
-    if isHorA == 'HA':
-        if mode_is_EQ == "LEQ":
-            solver.Add(D_BR1[i] >= solver.Sum([(breakHome[int(team_BR1),int(s)]+breakAway[int(team_BR1),int(s)]) for s in slots_BR1]) - intp)
+        if settings.solver not in warmStart.MIP_HINT_SOLVERS:
+            print("warning: {0} does not use solution hints".format(settings.solver))
+        hinted = warmStart.hintMip(model, games, settings)
+    print("hinted variables = ",hinted," time = ",round(time.perf_counter() - begin,3))
+
+
+def timeToFirstIncumbent(instance, args, settings, games):
+    # Solves until the first incumbent, without and then with the hint.
+    firstSettings = settings._replace(firstSolution=True)
+    for hinted in (False, True):
+        if args.backend == 'cpsat':
+            model = cpsatModel.buildCpModel(instance)
+            if hinted:
+                hintModel(model, args.backend, games, settings)
+            begin = time.perf_counter()
+            status = cpsatModel.solveCpModel(model, firstSettings)
+            elapsed = time.perf_counter() - begin
+            found = status in (cpsatModel.cp_model.OPTIMAL, cpsatModel.cp_model.FEASIBLE)
+            objective = model.solver.ObjectiveValue() if found else None
         else:
-            solver.Add(D_BR1[i] >= solver.Sum([(breakHome[int(team_BR1),int(s)]+breakAway[int(team_BR1),int(s)]) for s in slots_BR1]) - intp)
-            solver.Add(D_BR1[i] >= intp - solver.Sum([(breakHome[int(team_BR1),int(s)]+breakAway[int(team_BR1),int(s)]) for s in slots_BR1]))
-    elif isHorA == 'H':
-        if mode_is_EQ == "LEQ":
-            solver.Add(D_BR1[i] >= solver.Sum([breakHome[int(team_BR1),int(s)] for s in slots_BR1]) - intp)
+            model = buildModel(instance, args.formulation, args.se1, settings.solver)
+            if hinted:
+                hintModel(model, args.backend, games, settings)
+            begin = time.perf_counter()
+            status, ignored = solveMip(model.solver, firstSettings)
+            elapsed = time.perf_counter() - begin
+            found = status in (model.solver.OPTIMAL, model.solver.FEASIBLE)
+            objective = model.solver.Objective().Value() if found else None
+        print("hint = ",hinted," time to first incumbent = ",round(elapsed,3)," objective = ",objective)
+
+
+def parseArgs(argv):
+    parser = argparse.ArgumentParser(description='Solve an ITC2021 double round robin instance.')
+    parser.add_argument('fileName', nargs='?', help='ITC2021 instance XML')
+    parser.add_argument('--backend', choices=BACKENDS, default='mip',
+                        help='mip (CBC via pywraplp) or cpsat (CP-SAT, compact core with windowed SE1) (default: mip)')
+    parser.add_argument('--formulation', choices=FORMULATIONS, default='full',
+                        help='core MIP formulation (default: full)')
+    parser.add_argument('--se1', choices=SE1_ENCODINGS, default='pairs',
+                        help='SE1 encoding: pairs (y/prod_SE1 per slot pair) or window (default: pairs)')
+    parser.add_argument('--config', default=None,
+                        help='JSON file with solver settings (solver, threads, timeLimit, relativeGap, absoluteGap, presolve, seed); options below override it')
+    parser.add_argument('--solver', default=None,
+                        help='MIP engine created through pywraplp (default: CBC; --list-solvers shows what is installed)')
+    parser.add_argument('--threads', '--workers', dest='threads', type=int, default=None,
+                        help='solver threads / CP-SAT search workers (default: engine default, all cores for CP-SAT)')
+    parser.add_argument('--time-limit', type=float, default=None,
+                        help='wall-clock limit in seconds')
+    parser.add_argument('--rel-gap', type=float, default=None,
+                        help='relative MIP gap at which to stop')
+    parser.add_argument('--abs-gap', type=float, default=None,
+                        help='absolute MIP gap at which to stop (SCIP, SAT, GUROBI, XPRESS and CP-SAT)')
+    parser.add_argument('--presolve', choices=PRESOLVE_LEVELS, default=None,
+                        help='presolve on or off (default: on)')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='random seed (default: 0)')
+    parser.add_argument('--local-search', type=float, default=None, metavar='SECONDS',
+                        help='improve the solver schedule with local search for SECONDS (objective then follows the ITC2021 rules)')
+    parser.add_argument('--warm-start', type=int, default=0, metavar='STARTS',
+                        help='hint the best of STARTS circle-method schedules to the solver')
+    parser.add_argument('--first-incumbent', action='store_true',
+                        help='report the time to the first incumbent without and with the warm start hint and exit')
+    parser.add_argument('--decompose', action='store_true',
+                        help='solve home/away patterns first, then opponents on the compact formulation (mip backend)')
+    parser.add_argument('--patterns', type=int, default=10,
+                        help='pattern sets phase one may propose before --decompose gives up (default: 10)')
+    parser.add_argument('--lazy', action='store_true',
+                        help='hold back the CA3 and FA2 rows and add only those the incumbent violates, re-solving until none is (mip backend)')
+    parser.add_argument('--bulk', action='store_true',
+                        help='build the same MIP model from NumPy index arrays and load it in one call (mip backend; '
+                             'not with --lazy, --decompose or --names)')
+    parser.add_argument('--fix-and-relax', type=int, default=None, metavar='SLOTS',
+                        help='rolling horizon: keep the games of SLOTS consecutive slots integer, relax later slots, fix earlier ones (mip backend)')
+    parser.add_argument('--overlap', type=int, default=0, metavar='SLOTS',
+                        help='slots of a --fix-and-relax window solved again in the next window (default: 0)')
+    parser.add_argument('--anytime', action='store_true',
+                        help='write every improving incumbent to the solution files while CP-SAT searches (cpsat backend)')
+    parser.add_argument('--stall', type=float, default=None, metavar='SECONDS',
+                        help='with --anytime, stop when no improving incumbent arrives within SECONDS')
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='with --anytime, write the objective-versus-time trace (timestamp, seconds, objective, bound) as CSV')
+    parser.add_argument('--bound', choices=bounds.RELAXATIONS, default=None,
+                        help='compute a lower bound and exit: lp (LP relaxation, mip backend) or hard (HARD constraints and '
+                             'the --bound-families soft constraints only)')
+    parser.add_argument('--bound-families', nargs='+', default=list(bounds.CHEAP_FAMILIES), metavar='FAMILY',
+                        help='soft families kept by --bound hard (default: {0})'.format(' '.join(bounds.CHEAP_FAMILIES)))
+    parser.add_argument('--names', action='store_true',
+                        help='give every MIP variable its formatted name, e.g. X[s][j][i] (debugging and LP exports; costs memory)')
+    parser.add_argument('--simplify', action='store_true',
+                        help='presolve the instance: turn trivial HARD constraints into fixed variables and drop constraints '
+                             'no schedule can violate before building the model')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse solutions of earlier runs: an identical instance and options return the cached schedule, '
+                             'a near one (penalties or a few constraints changed) starts from it')
+    parser.add_argument('--cache-dir', default=SOLUTION_CACHE_DIR,
+                        help='solution cache directory (default: {0})'.format(SOLUTION_CACHE_DIR))
+    parser.add_argument('--cache-size', type=float, default=MAX_BYTES/(1 << 20), metavar='MB',
+                        help='size above which least recently used entries are evicted (default: {0:g})'.format(MAX_BYTES/(1 << 20)))
+    parser.add_argument('--cache-changes', type=int, default=MAX_CHANGES,
+                        help='most differing constraints for a cached schedule to be used as a start (default: {0})'.format(MAX_CHANGES))
+    parser.add_argument('--output-format', nargs='+', choices=OUTPUT_FORMATS, default=['xml'],
+                        help='solution files to write next to the instance, <instance>_solution.<format> (default: xml)')
+    parser.add_argument('--solution-dir', default=None, metavar='DIR',
+                        help='write the solution files to DIR instead of next to the instance')
+    parser.add_argument('--verbosity', type=int, choices=(0, 1, 2), default=1,
+                        help='0: status lines only, 1: also the phase summary, 2: also the schedule and every deviation (default: 1)')
+    parser.add_argument('--timings-json', default=None, metavar='FILE',
+                        help='write the time, columns, rows and memory change of every phase to FILE')
+    parser.add_argument('--profile', nargs='+', default=(), metavar='PHASE',
+                        help='run these phases (parse, core, CA1, ..., solve, extract, write) under cProfile')
+    parser.add_argument('--trace-memory', nargs='+', default=(), metavar='PHASE',
+                        help='run these phases under tracemalloc and print their largest allocations')
+    parser.add_argument('--list-solvers', action='store_true',
+                        help='print the MIP engines available in this OR-tools build and exit')
+    parser.add_argument('--model-size', action='store_true',
+                        help='print variable and row counts of every formulation and exit')
+    args = parser.parse_args(argv)
+    if args.fileName is None and not args.list_solvers:
+        parser.error('the instance file is required')
+    if args.lazy and (args.backend == 'cpsat' or args.decompose):
+        parser.error('--lazy needs the mip backend without --decompose')
+    if args.bulk and (args.backend == 'cpsat' or args.decompose or args.lazy or args.names):
+        parser.error('--bulk needs the mip backend without --decompose, --lazy or --names')
+    if args.fix_and_relax is not None:
+        if args.backend == 'cpsat' or args.decompose or args.lazy:
+            parser.error('--fix-and-relax needs the mip backend without --decompose or --lazy')
+        if not 0 <= args.overlap < args.fix_and_relax:
+            parser.error('--overlap must be at least 0 and smaller than the --fix-and-relax window')
+    if args.anytime and args.backend != 'cpsat':
+        parser.error('--anytime needs the cpsat backend: pywraplp has no solution callbacks')
+    if (args.stall or args.trace) and not args.anytime:
+        parser.error('--stall and --trace need --anytime')
+    if args.bound == 'lp' and args.backend == 'cpsat':
+        parser.error('--bound lp needs the mip backend')
+    if args.simplify and args.decompose:
+        parser.error('--simplify cannot be combined with --decompose')
+    return args
+
+
+def solutionBase(args):
+    # the file name the solution files are derived from
+    if args.solution_dir:
+        return os.path.join(args.solution_dir, os.path.basename(args.fileName))
+    return args.fileName
+
+
+def mipBuilder(args):
+    if args.lazy:
+        return lazyCuts.buildLazyModel
+    return buildBulkModel if args.bulk else buildModel
+
+
+def cacheOptions(args, settings):
+    # run options that change the solution, part of the cache key
+    options = dict(settings._asdict())
+    options.update(backend=args.backend, formulation=args.formulation, se1=args.se1, decompose=args.decompose,
+                   patterns=args.patterns, lazy=args.lazy, simplify=args.simplify,
+                   fixAndRelax=args.fix_and_relax, overlap=args.overlap, localSearch=args.local_search, warmStart=args.warm_start)
+    return options
+
+
+def cachedResult(args, settings, instance, entry, phases, start_time):
+    games = gameArray(entry['games'])
+    print("solution cache: exact hit, status = ",entry['status']," objective = ",entry['objective'])
+    if args.verbosity >= 2:
+        printSchedule(games, instance.numSlots)
+    with phases.phase('write'):
+        writeSolution(games, solutionBase(args), str(entry['objective']), time.perf_counter() - start_time,
+                      settingsAttributes(settings, args.backend), args.output_format)
+    result = {'instance': args.fileName, 'backend': args.backend,
+              'solver': 'cpsat' if args.backend == 'cpsat' else settings.solver,
+              'threads': settings.threads, 'timeLimit': settings.timeLimit, 'status': entry['status'],
+              'objective': entry['objective'], 'cached': True, 'totalTime': time.perf_counter() - start_time}
+    return finish(phases, args, result)
+
+
+def boundResult(args, settings, instance, phases, start_time):
+    build = buildBulkModel if args.bulk else buildModel
+    with phases.phase('bound'):
+        if args.bound == 'lp':
+            status, bound, size = bounds.lpBound(instance, args.formulation, args.se1, settings, build)
         else:
-            solver.Add(D_BR1[i] >= solver.Sum([breakHome[int(team_BR1),int(s)] for s in slots_BR1]) - intp)
-            solver.Add(D_BR1[i] >= intp - solver.Sum([breakHome[int(team_BR1),int(s)] for s in slots_BR1]))
+            status, bound, size = bounds.relaxationBound(instance, args.backend, args.formulation, args.se1, settings,
+                                                         args.bound_families, build)
+    print("bound = ",bound," relaxation = ",args.bound," status = ",status)
+    result = {'instance': args.fileName, 'backend': args.backend,
+              'solver': 'cpsat' if args.backend == 'cpsat' else settings.solver, 'threads': settings.threads,
+              'timeLimit': settings.timeLimit, 'status': status, 'bound': bound, 'relaxation': args.bound,
+              'variables': size[0], 'rows': size[1], 'totalTime': time.perf_counter() - start_time}
+    return finish(phases, args, result)
+
+
+def finish(phases, args, result):
+    if 'solverObjective' in result:
+        print("status = ",result.get('status')," objective = ",result.get('solverObjective')," bound = ",
+              result.get('bound')," gap = ",result.get('gap'))
+    result['phases'] = phases.phases
+    if args.verbosity >= 1:
+        phases.summary()
+    if args.timings_json:
+        phases.write(args.timings_json)
+    return result
+
+
+def main(argv=None):
+    return run(sys.argv[1:] if argv is None else argv)[0]
+
+
+def run(argv, onIncumbent=None):
+    # Solves one instance; returns the exit code and a row of results
+    # (status, objective, bound, model size, timings) for batch runs.
+    # onIncumbent(objective, seconds, bound) is called for every CP-SAT
+    # solution and stops the search when it returns true.
+    start_time = time.perf_counter()
+    args = parseArgs(argv)
+    if args.list_solvers:
+        print(' '.join(availableMipSolvers()))
+        return None, None
+    settings = loadSettings(args.config, solver=args.solver, threads=args.threads, timeLimit=args.time_limit,
+                            relativeGap=args.rel_gap, absoluteGap=args.abs_gap, presolve=args.presolve, seed=args.seed)
+    phases = Instrumentation(args.profile, args.trace_memory)
+    with phases.phase('parse'):
+        instance = loadInstance(args.fileName)
+    if args.model_size:
+        printModelSize(instance)
+        return None, None
+    if args.bound:
+        result = boundResult(args, settings, instance, phases, start_time)
+        return int(result['bound'] is None), result
+    start = None
+    cache = None
+    if args.cache:
+        cache = SolutionCache(args.cache_dir, int(args.cache_size*(1 << 20)), args.cache_changes)
+        options = cacheOptions(args, settings)
+        with phases.phase('cache'):
+            entry, exact, changes = cache.get(instance, options)
+        if exact:
+            return 0, cachedResult(args, settings, instance, entry, phases, start_time)
+        if entry:
+            with phases.phase('cacheStart'):
+                start, objective, infeasibility = warmStart.repairStart(instance, entry['games'], settings.seed)
+            print("solution cache: near hit, ",changes," constraints differ, start objective = ",objective,
+                  " infeasibility = ",infeasibility)
+    if not start and (args.warm_start or args.first_incumbent):
+        with phases.phase('warmStart'):
+            start = warmStartGames(instance, max(args.warm_start, 1), settings.seed)
+    if args.first_incumbent:
+        timeToFirstIncumbent(instance, args, settings, start)
+        return None, None
+    result = {'instance': args.fileName, 'backend': args.backend,
+              'solver': 'cpsat' if args.backend == 'cpsat' else settings.solver,
+              'threads': settings.threads, 'timeLimit': settings.timeLimit}
+    presolved = None
+    modelInstance = instance
+    if args.simplify:
+        with phases.phase('presolve'):
+            try:
+                presolved = presolve.presolve(instance)
+            except ValueError as error:
+                presolved = error
+        if isinstance(presolved, ValueError):
+            print("presolve: infeasible, ",presolved)
+            result['status'] = 'INFEASIBLE'
+            return 1, finish(phases, args, result)
+        modelInstance = presolved.instance
+        stats = presolved.stats
+        print("presolve: fixed variables = ",stats['fixed']," forced games = ",stats['forced']," removed constraints = ",
+              stats['records']," ",presolved.removed," removed columns = ",stats['columns']," removed rows = ",stats['rows'])
+        result.update(presolveFixed=stats['fixed'], presolveColumns=stats['columns'], presolveRows=stats['rows'])
+
+    if args.backend == 'cpsat':
+        model = cpsatModel.buildCpModel(modelInstance, phases)
+        if presolved:
+            presolve.applyFixes(model, presolved, args.backend)
+        if start:
+            with phases.phase('hint'):
+                hintModel(model, args.backend, start, settings)
+        result['variables'], result['rows'] = model.size()
+        result['buildTime'] = time.perf_counter() - start_time
+        callback = cpsatModel.IncumbentCallback(onIncumbent) if onIncumbent else None
+        if args.anytime:
+            callback = anytime.AnytimeCallback(model, solutionBase(args), settingsAttributes(settings, args.backend),
+                                               args.output_format, args.trace, args.stall, onIncumbent,
+                                               args.verbosity >= 1)
+            callback.start()
+        with phases.phase('solve'):
+            status = cpsatModel.solveCpModel(model, settings, callback)
+        if args.anytime:
+            callback.stop()
+            result.update(incumbents=len(callback.trace), stalled=callback.stalled)
+        end_time = time.perf_counter()
+        solverAttributes = settingsAttributes(settings, args.backend)
+        print("CP-SAT status = ",model.solver.StatusName(status)," workers = ",model.solver.parameters.num_workers)
+        result.update(status=model.solver.StatusName(status), solveTime=end_time - start_time - result['buildTime'])
+        if status not in (cpsatModel.cp_model.OPTIMAL, cpsatModel.cp_model.FEASIBLE):
+            return 1, finish(phases, args, result)
+        result.update(solverObjective=model.solver.ObjectiveValue(), bound=model.solver.BestObjectiveBound())
+        with phases.phase('extract'):
+            games = cpsatModel.scheduleArray(model)
+            objectiveVal = cpsatModel.penaltyValues(model)
     else:
-        if mode_is_EQ == "LEQ":
-            solver.Add(D_BR1[i] >= solver.Sum([breakAway[int(team_BR1),int(s)] for s in slots_BR1]) - intp)
+        if args.decompose:
+            with phases.phase('decompose'):
+                model, status, ignored, timings = decomposition.solveDecomposed(instance, args.se1, settings, args.patterns)
         else:
-            solver.Add(D_BR1[i] >= solver.Sum([breakAway[int(team_BR1),int(s)] for s in slots_BR1]) - intp)
-            solver.Add(D_BR1[i] >= intp - solver.Sum([breakAway[int(team_BR1),int(s)] for s in slots_BR1]))
-    if (type_ == "HARD"):
-        solver.Add(D_BR1[i] == 0)
-    else:
-        objective.SetCoefficient(D_BR1[i],penalty_BR1)
-
-
-# ## BR2
-
-BreakConstraints = constraints.getElementsByTagName("BreakConstraints")[0]
-BR2_constraints = BreakConstraints.getElementsByTagName("BR2")
-D_BR2 = {}
-for i,BR2_constraint in enumerate(BR2_constraints):
-    D_BR2[i] = solver.NumVar(0,solver.infinity(),'D_BR2[{0}]'.format(i))
-    intp = int(BR2_constraint.getAttribute("intp"))
-    mode_is_EQ = BR2_constraint.getAttribute("mode2")
-    type_ = BR2_constraint.getAttribute("type")
-    penalty_BR2 = int(BR2_constraint.getAttribute("penalty"))
-    
-
-    solver.Add(solver.Sum([(breakHome[i,s]+breakAway[i,s]) for i in range(numTeams) for s in range(numSlots)]) <= D_BR2[i] + intp)
-    if type_ == "HARD":
-        solver.Add(D_BR2[i] == 0)
-    else:
-        objective.SetCoefficient(D_BR2[i],penalty_BR2)
-
-
-# ## SE1
-# Seperated by K time slots.
-
-D_SE1 = {}
-prod_SE1 = {}
-SeparationConstraints = constraints.getElementsByTagName("SeparationConstraints")[0]
-SE1_constraints = SeparationConstraints.getElementsByTagName("SE1")
-
-if (boolPhase):
-    for l,SE1_constraint in enumerate(SE1_constraints):
-        k_min_se1 = int(SE1_constraint.getAttribute("min"))
-        penalty_se1 = int(SE1_constraint.getAttribute("penalty"))
-        type_ = SE1_constraint.getAttribute("type")
-        for s1 in range(halfSlot):
-            for s2 in range(halfSlot,numSlots):
-                if s1 != s2:
-                    D_SE1[l,s1,s2] = solver.NumVar(0,k_min_se1,'D_SE1[{0}][{1}][{2}]'.format(s2,s1,l))
-                    solver.Add(D_SE1[l,s1,s2] >= k_min_se1 - s2 + s1)
-
-        for i in range(numTeams):
-            for j in range(numTeams):
-                for s1 in range(halfSlot):
-                    for s2 in range(halfSlot,numSlots):
-                        if s1 != s2:
-                            prod_SE1[l,i,j,s1,s2] = solver.NumVar(0,k_min_se1,'prod_SE1[{0}][{1}][{2}][{3}][{4}]'.format(s2,s1,j,i,l))
-                            solver.Add(prod_SE1[l,i,j,s1,s2]<=k_min_se1*y[i,j,s1,s2])
-                            solver.Add(prod_SE1[l,i,j,s1,s2]<=D_SE1[l,s1,s2])
-                            solver.Add(prod_SE1[l,i,j,s1,s2] >=D_SE1[l,s1,s2]-k_min_se1*(1-y[i,j,s1,s2]))
-                            if type_ == "HARD":
-                                solver.Add(prod_SE1[l,i,j,s1,s2]==0)
-                            else: 
-                                objective.SetCoefficient(prod_SE1[l,i,j,s1,s2],penalty_se1)
-else:
-    for l,SE1_constraint in enumerate(SE1_constraints):
-        k_min_se1 = int(SE1_constraint.getAttribute("min"))
-        penalty_se1 = int(SE1_constraint.getAttribute("penalty"))
-        type_ = SE1_constraint.getAttribute("type")
-        for s1 in range(numSlots):
-            for s2 in range(s1,numSlots):
-                if s1 != s2:
-                    D_SE1[l,s1,s2] = solver.NumVar(0,k_min_se1,'D_SE1[{0}][{1}][{2}]'.format(s2,s1,l))
-                    solver.Add(D_SE1[l,s1,s2] >= k_min_se1 - s2 + s1)
-
-        for i in range(numTeams):
-            for j in range(numTeams):
-                for s1 in range(numSlots):
-                    for s2 in range(s1,numSlots):
-                        if s1 != s2:
-                            prod_SE1[l,i,j,s1,s2] = solver.NumVar(0,k_min_se1,'prod_SE1[{0}][{1}][{2}][{3}][{4}]'.format(s2,s1,j,i,l))
-                            solver.Add(prod_SE1[l,i,j,s1,s2]<=k_min_se1*y[i,j,s1,s2])
-                            solver.Add(prod_SE1[l,i,j,s1,s2]<=D_SE1[l,s1,s2])
-                            solver.Add(prod_SE1[l,i,j,s1,s2] >=D_SE1[l,s1,s2]-k_min_se1*(1-y[i,j,s1,s2]))
-                            if type_ == "HARD":
-                                solver.Add(prod_SE1[l,i,j,s1,s2]==0)
-                            else: 
-                                objective.SetCoefficient(prod_SE1[l,i,j,s1,s2],penalty_se1)                    
-   
-
-
-# # Fairness Constraints
-
-# # FA2
-
-D_FA2 = {}
-diff_FA2 = {}
-SeparationConstraints = constraints.getElementsByTagName("FairnessConstraints")[0]
-FA2_constraints = SeparationConstraints.getElementsByTagName("FA2")
-for l,FA2_constraint in enumerate(FA2_constraints):
-    intp = int(FA2_constraint.getAttribute("intp"))
-    mode = FA2_constraint.getAttribute("mode")
-    penalty = int(FA2_constraint.getAttribute("penalty"))
-    slots_FA2_org = FA2_constraint.getAttribute("slots").split(';')
-    team_FA2 = FA2_constraint.getAttribute("teams").split(';')
-    type_FA2 = FA2_constraint.getAttribute("type")
-    for slots_FA2_str in slots_FA2_org:
-        slots_FA2 = list(range(int(slots_FA2_str)+1))
-        for i in team_FA2:
-            for j in team_FA2:
-                D_FA2[slots_FA2[-1],int(i),int(j)] = solver.NumVar(0,solver.infinity(),'D_FA2[{0}][{1}][{2}]'.format(slots_FA2[-1],int(j),int(i)))
-                diff_FA2[slots_FA2[-1],int(i),int(j)] = solver.NumVar(0,solver.infinity(),'diff_FA2[{0}][{1}][{2}]'.format(slots_FA2[-1],int(j),int(i)))
-                home_i = solver.Sum([home[int(i),int(s)] for s in slots_FA2])
-                home_j = solver.Sum([home[int(j),int(s)] for s in slots_FA2])
-                solver.Add(diff_FA2[slots_FA2[-1],int(i),int(j)] >= home_i-home_j)
-                solver.Add(diff_FA2[slots_FA2[-1],int(i),int(j)] >= home_j-home_i)            
-                solver.Add(D_FA2[slots_FA2[-1],int(i),int(j)] >= diff_FA2[slots_FA2[-1],int(i),int(j)] -intp)
-                if type_FA2=="HARD":
-                    solver.Add(D_FA2[slots_FA2[-1],int(i),int(j)] ==0)
+            model = mipBuilder(args)(modelInstance, args.formulation, args.se1, settings.solver, phases, args.names)
+            if presolved:
+                presolve.applyFixes(model, presolved, args.backend)
+            numVariables, numConstraints = model.size()
+            print("formulation = ",args.formulation," SE1 = ",args.se1," variables = ",numVariables," rows = ",numConstraints)
+            if start:
+                with phases.phase('hint'):
+                    hintModel(model, args.backend, start, settings)
+            result['buildTime'] = time.perf_counter() - start_time
+            with phases.phase('solve'):
+                if args.lazy:
+                    status, ignored, lazyStats = lazyCuts.solveLazy(model, settings)
+                    result.update(lazyIterations=lazyStats['iterations'], lazyRows=sum(lazyStats['added'].values()))
+                elif args.fix_and_relax:
+                    status, ignored, steps = fixAndRelax.solveFixAndRelax(model, settings, args.fix_and_relax, args.overlap)
+                    result['fixAndRelaxSteps'] = len(steps)
                 else:
-                    objective.SetCoefficient(D_FA2[slots_FA2[-1],int(i),int(j)],penalty)
-
-
-# solver.Minimize(0)
-objective.SetMinimization()
-
-
-status = solver.Solve()
-end_time = time.perf_counter()
-
-for s in range(numSlots):
-    for i in range(numTeams):
-        for j in range(numTeams):  
-            if X[i,j,s].solution_value() == 1.0:
-                print("s = ",s," i = ",i,"j = ",j," val = ",X[i,j,s].solution_value())
-
-
-for s in range(numSlots):
-    for i in range(numTeams):
-        for j in range(numTeams): 
-            for h in range(2):
-                if H[i,j,s,h].solution_value() == 1.0:
-                    if (h == 0):
-                        print("s = ",s," i = ",i,"j = ",j," h = ",h," val = ",H[i,j,s,h].solution_value())
-
-
-objectiveVal = defaultdict(int)
-
-
-# ## CA1 D_Value
-
-
-objectiveVal['CA1'] = 0
-for i,constraintsSet in enumerate(CA1_constraints):
-    team_a = int(constraintsSet.getAttribute("teams"))
-    slots_ = constraintsSet.getAttribute("slots").split(';')
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    if D_CA1[i,team_a].solution_value() > 0:
-        print("i : ",i," CA1 D VAlue : ",D_CA1[i,team_a].solution_value()," Slots :",slots_) 
-        objectiveVal['CA1'] += (D_CA1[i,team_a].solution_value()*penalty_)
-
-
-# ## CA2 D_Value
-
-objectiveVal['CA2'] = 0
-for i,constraintsSet in enumerate(CA2_constraints):
-    team_1 = int(constraintsSet.getAttribute("teams1"))
-    slots_ = constraintsSet.getAttribute("slots").split(';')
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    if D_CA2[i,team_1].solution_value()>0:
-        objectiveVal['CA2'] += (D_CA2[i,team_1].solution_value()*penalty_)
-        print("i : ",i," CA2 D VAlue : ",D_CA2[i,team_1].solution_value()," Slots :",slots_) 
-
-
-# ## CA3 D Value
-
-objectiveVal['CA3'] = 0
-for i,constraintsSet in enumerate(CA3_constraints):
-    intp = int(constraintsSet.getAttribute("intp"))
-    team_1 = (constraintsSet.getAttribute("teams1")).split(';')
-    team_2 = (constraintsSet.getAttribute("teams2")).split(';')
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    for t in team_1:
-        t = int(t)    
-        for l in range(numSlots - intp + 1):  
-            if D_CA3[i,l,t].solution_value()>0:
-                objectiveVal['CA3'] += (D_CA3[i,l,t].solution_value()*penalty_)
-                print("i = {0} slot = {1} team = {2}".format(i,l,t)," CA3 D_VALUE ",D_CA3[i,l,t].solution_value(),"TEAMS 2 : ",team_2)
-
-
-# ## CA4 D Value
-
-objectiveVal['CA4'] = 0
-for l,constraintsSet in enumerate(CA4_constraints):
-    slots_ = constraintsSet.getAttribute("slots").split(';')
-    team_1 = constraintsSet.getAttribute("teams1").split(';')
-    team_2 = constraintsSet.getAttribute("teams2").split(';')
-    max_ = int(constraintsSet.getAttribute("max"))
-    min_ = int(constraintsSet.getAttribute("min"))
-    mode2 = constraintsSet.getAttribute("mode2")
-    type_ = constraintsSet.getAttribute("type")
-    penalty_ = int(constraintsSet.getAttribute("penalty"))
-    objectiveVal['CA4'] += (D_CA4[l].solution_value()*penalty_)
-    if mode2 == "GLOBAL":
-        if type_ == "HARD":
-            adg = sum([H[int(i),int(j),int(slot),m].solution_value() for i in team_1 for j in team_2 for m in mod for slot in slots_])
-            print("l = ",l,"CA4 D Val",D_CA4[l].solution_value(),"Check Value = ",adg," max = ",max_)
-
-
-# ## GA1 D Value
-
-objectiveVal['GA1'] = 0
-for i,constraint_set in enumerate(GA1_constraints):    
-    Groups = constraint_set.getAttribute("meetings").split(';')  
-    penalty_ = int(constraint_set.getAttribute("penalty"))
-    objectiveVal['GA1'] += (D_GA1[i].solution_value()*penalty_)
-    print("i : ",i," GA1 D_VALUE ",D_GA1[i].solution_value(),"Groups  : ",Groups)
-
-
-# ## BR1 D Value
-
-objectiveVal['BR1'] = 0
-for i,BR1_constraint in enumerate(BR1_constraints):
-    slots_BR1 = BR1_constraint.getAttribute("slots").split(';')
-    penalty_ = int(BR1_constraint.getAttribute("penalty"))
-    objectiveVal['BR1'] += (D_BR1[i].solution_value()*penalty_)
-    print("Slots : ",slots_BR1,"D Value ",D_BR1[i].solution_value())
-
-
-# ## BR2 D Value
-
-objectiveVal['BR2'] = 0
-for i,BR2_constraint in enumerate(BR2_constraints):
-    penalty_ = int(BR2_constraint.getAttribute("penalty"))
-    objectiveVal['BR2'] += (D_BR2[i].solution_value()*penalty_)
-    print("BR2 D Value ", D_BR2[i].solution_value())
-
-
-# ## FA2 D Value
-
-objectiveVal['FA2'] = 0
-for l,FA2_constraint in enumerate(FA2_constraints):
-    intp = int(FA2_constraint.getAttribute("intp"))
-    mode = FA2_constraint.getAttribute("mode")
-    penalty = int(FA2_constraint.getAttribute("penalty"))
-    slots_FA2_org = FA2_constraint.getAttribute("slots").split(';')
-    team_FA2 = FA2_constraint.getAttribute("teams").split(';')
-    type_FA2 = FA2_constraint.getAttribute("type")
-    penalty_ = int(FA2_constraint.getAttribute("penalty"))
-    for slots_FA2_str in slots_FA2_org:
-        slots_FA2 = list(range(int(slots_FA2_str)+1))
-        print(slots_FA2)
-        for i in team_FA2:
-            for j in team_FA2: 
-                objectiveVal['FA2'] += (D_FA2[slots_FA2[-1],int(i),int(j)].solution_value()*penalty_)
-                home_i = sum([home[int(i),int(s)].solution_value() for s in slots_FA2])
-                home_j = sum([home[int(j),int(s)].solution_value() for s in slots_FA2])
-                print("Slots = {0} Team_i = {1} home_i = {3} Team_j = {2} home_j = {4} val = ".format(slots_FA2[-1],int(i),int(j),home_i,home_j),D_FA2[slots_FA2[-1],int(i),int(j)].solution_value())
-
-
-# ## SE1 D Value
-
-objectiveVal['SE1'] = 0
-if (boolPhase):
-    for l,SE1_constraint in enumerate(SE1_constraints):
-        k_min_se1 = int(SE1_constraint.getAttribute("min"))
-        penalty_se1 = int(SE1_constraint.getAttribute("penalty"))
-        type_ = SE1_constraint.getAttribute("type")
-        penalty_ = int(SE1_constraint.getAttribute("penalty"))
-        print(sum([prod_SE1[l,i,j,s1,s2].solution_value() if s1 != s2 else 0 for i in range(numTeams) for j in range(numTeams) for s1 in range(halfSlot) for s2 in range(halfSlot,numSlots) ]))
-        for i in range(numTeams):
-            for j in range(numTeams):
-                for s1 in range(halfSlot):
-                    for s2 in range(halfSlot,numSlots):
-                        if s1 != s2:
-                            if prod_SE1[l,i,j,s1,s2].solution_value() > 0:
-                                objectiveVal['SE1'] += ((1+round(prod_SE1[l,i,j,s1,s2].solution_value()))*penalty_)
-                                print("Team i = {0}, Team j ={1}, s1 = {2},s2 = {3} prod Val = ".format(i,j,s1,s2),prod_SE1[l,i,j,s1,s2].solution_value())
-    objectiveVal['SE1'] /= 2
-else:
-    for l,SE1_constraint in enumerate(SE1_constraints):
-        k_min_se1 = int(SE1_constraint.getAttribute("min"))
-        penalty_se1 = int(SE1_constraint.getAttribute("penalty"))
-        type_ = SE1_constraint.getAttribute("type")
-        penalty_ = int(SE1_constraint.getAttribute("penalty"))
-        print(sum([prod_SE1[l,i,j,s1,s2].solution_value() if s1 != s2 else 0 for i in range(numTeams) for j in range(numTeams) for s1 in range(numSlots) for s2 in range(s1,numSlots) ]))
-        for i in range(numTeams):
-            for j in range(numTeams):
-                for s1 in range(numSlots):
-                    for s2 in range(s1,numSlots):
-                        if s1 != s2:
-                            if prod_SE1[l,i,j,s1,s2].solution_value() > 0:
-                                objectiveVal['SE1'] += ((1+round(prod_SE1[l,i,j,s1,s2].solution_value()))*penalty_)
-                                print("Team i = {0}, Team j ={1}, s1 = {2},s2 = {3} prod Val = ".format(i,j,s1,s2),prod_SE1[l,i,j,s1,s2].solution_value())
-    objectiveVal['SE1'] /= 2
-
-
-# # Objective Value
-objVal = str(sum(objectiveVal.values()))
-
-
-from xml.etree.ElementTree import Element, SubElement, Comment
-from xml.etree import ElementTree
-from xml.dom import minidom
-
-from datetime import date
-
-solution = Element('Solution')
-MetaData = SubElement(solution,'MetaData')
-SolutionName = SubElement(MetaData,'SolutionName')
-SolutionName.text = 'IP_Test.xml'
-InstanceName = SubElement(MetaData,'InstanceName')
-InstanceName.text = 'Test Instance 4.xml'
-Contributor = SubElement(MetaData,'Contributor')
-Contributor.text = 'Team ZERO'
-Date = SubElement(MetaData,'Date',day=str(date.today().day),month=str(date.today().month),year=str(date.today().year))
-SolutionMethod = SubElement(MetaData,'SolutionMethod')
-SolutionMethod.text = 'IP'
-ObjectiveValue = SubElement(MetaData,'objectiveValue',objective=objVal)
-LowerBound = SubElement(MetaData,'LowerBound',objective=objVal,infeasibility="0")
-Remarks = SubElement(MetaData,'Remarks')
-Remarks.text = str(end_time - start_time)
-Games = SubElement(solution,'Games')
-for s in range(numSlots):
-    for i in range(numTeams):
-        for j in range(numTeams): 
-            for h in range(2):
-                if H[i,j,s,h].solution_value() == 1.0:
-                    if (h == 0):
-                        ScheduledMatch = SubElement(Games,'ScheduledMatch',home=str(i),away=str(j),slot=str(s))
-
-
-
-xmlstr = minidom.parseString(ElementTree.tostring(solution)).toprettyxml(indent="  ")
-with open(fileName[:-4]+'_solution.xml', "w") as f:
-    f.write(xmlstr)
-
-
-
-
-
+                    status, ignored = solveMip(model.solver, settings)
+        end_time = time.perf_counter()
+        solverAttributes = settingsAttributes(settings, args.backend, ignored)
+        print("MIP status = ",status," solver = ",settings.solver)
+        numVariables, numConstraints = model.size()
+        result.update(variables=numVariables, rows=numConstraints, status=mipStatusName(status))
+        if args.decompose:
+            result.update(buildTime=end_time - start_time - sum(sum(t) for t in timings),
+                          phaseOneTime=sum(t[0] for t in timings), phaseTwoTime=sum(t[1] for t in timings))
+        result['solveTime'] = end_time - start_time - result['buildTime']
+        if status not in (model.solver.OPTIMAL, model.solver.FEASIBLE):
+            return 1, finish(phases, args, result)
+        result.update(solverObjective=model.solver.Objective().Value(), bound=model.solver.Objective().BestBound())
+        if args.decompose or args.fix_and_relax:
+            # the last solve had patterns or slots fixed: its bound is not global
+            result['bound'] = None
+
+        with phases.phase('extract'):
+            games = scheduleArray(model)
+            objectiveVal = penaltyValues(model, args.verbosity >= 2)
+    if args.verbosity >= 2:
+        printSchedule(games, instance.numSlots)
+
+    if args.local_search:
+        with phases.phase('localSearch'):
+            games, objectiveVal, violations, stats = localSearch.improveSchedule(instance, games, args.local_search, settings.seed)
+            games = gameArray(games)
+        print("local search: cost ",stats['initial']," -> ",stats['best']," iterations = ",stats['iterations'],
+              " improving moves = ",stats['improving']," hard violations = ",sum(violations.values()))
+        result['localSearchTime'] = time.perf_counter() - end_time
+        end_time = time.perf_counter()
+        # the bound is on the model objective, not on the ITC2021 score of
+        # the improved schedule
+        result['bound'] = None
+
+    # # Objective Value
+    # The files carry the objective the bound and gap refer to: the solver's
+    # model objective, or the ITC2021 score after local search. The per-family
+    # penaltyValues sum can differ from the model objective (SE1).
+    if args.local_search:
+        objVal = str(sum(objectiveVal.values()))
+    else:
+        objVal = objectiveText(result['solverObjective'])
+    result['gap'] = bounds.mipGap(result['solverObjective'], result['bound'])
+    with phases.phase('write'):
+        writeSolution(games, solutionBase(args), objVal, end_time - start_time, solverAttributes, args.output_format,
+                      result['bound'], result['status'], result['gap'])
+    if cache:
+        cache.put(instance, options, games.tolist(), objectiveVal, result['status'], int(objVal))
+    result.update(objective=sum(objectiveVal.values()), totalTime=time.perf_counter() - start_time)
+    return 0, finish(phases, args, result)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
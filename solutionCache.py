@@ -0,0 +1,160 @@
+# coding: utf-8
+# Content-addressed cache of solved schedules.
+#
+# An entry is keyed by the SHA-256 of the normalised instance (constraints as
+# sorted records, team and slot lists sorted, names dropped) together with the
+# run options (backend, formulation, solver settings, ...), and holds the
+# schedule, its objective split per family and the solver status. Only an exact
+# key match returns the stored solution. Otherwise the entry for the same
+# number of teams and game mode whose constraints differ the least, penalties
+# and options not counted, is offered as a starting schedule when at most
+# maxChanges constraints differ, even when none does. Entries are JSON files; a hit refreshes the file's mtime
+# and the least recently used files are removed once the directory exceeds
+# maxBytes.
+from collections import Counter
+from array import array
+from instance import CACHE_DIR
+import hashlib
+import json
+import os
+
+SOLUTION_CACHE_DIR = os.environ.get('ITC2021_SOLUTION_CACHE_DIR', os.path.join(CACHE_DIR, 'solutions'))
+MAX_BYTES = 64 << 20
+MAX_CHANGES = 10
+
+
+def recordKey(family, record, penalty=True):
+    # record as a tuple independent of the team, slot and meeting order
+    values = [family]
+    for field, value in zip(record._fields, record):
+        if field == 'penalty' and not penalty:
+            continue
+        if field == 'aways':
+            continue
+        if field == 'homes':
+            value = tuple(sorted(zip(record.homes, record.aways)))
+        elif isinstance(value, array):
+            value = tuple(sorted(value))
+        values.append(value)
+    return tuple(values)
+
+
+def digest(value):
+    return hashlib.sha256(repr(value).encode()).hexdigest()
+
+
+def instanceKey(instance, options):
+    normalised = (instance.numTeams, instance.gameMode,
+                  tuple(sorted(recordKey(family, record) for family, records in instance.constraints.items()
+                               for record in records)))
+    return digest((normalised, sorted(options.items())))
+
+
+def structureKey(instance):
+    # schedules are interchangeable between instances with the same key
+    return digest((instance.numTeams, instance.gameMode))
+
+
+def signature(instance):
+    # one short hash per constraint, penalties left out
+    return sorted(digest(recordKey(family, record, False))[:16] for family, records in instance.constraints.items()
+                  for record in records)
+
+
+def changes(first, second):
+    difference = Counter(first)
+    difference.subtract(Counter(second))
+    return max(sum(count for count in difference.values() if count > 0),
+               sum(-count for count in difference.values() if count < 0))
+
+
+class SolutionCache(object):
+    def __init__(self, directory=SOLUTION_CACHE_DIR, maxBytes=MAX_BYTES, maxChanges=MAX_CHANGES):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.maxChanges = maxChanges
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def load(self, fileName):
+        try:
+            with open(fileName) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def touch(self, fileName):
+        try:
+            os.utime(fileName)
+        except OSError:
+            pass
+
+    def get(self, instance, options):
+        # Returns (entry, exact, changes): exact for a key match, otherwise
+        # the nearest entry and its number of differing constraints, which
+        # is 0 when only penalties or options differ; (None, False, None)
+        # when nothing usable is cached.
+        fileName = self.path(instanceKey(instance, options))
+        entry = self.load(fileName)
+        if entry:
+            self.touch(fileName)
+            return entry, True, 0
+        structure = structureKey(instance)
+        current = signature(instance)
+        best, bestChanges, bestFile = None, None, None
+        for fileName in self.files():
+            candidate = self.load(fileName)
+            if not candidate or candidate.get('structure') != structure:
+                continue
+            count = changes(current, candidate['signature'])
+            if count <= self.maxChanges and (bestChanges is None or count < bestChanges):
+                best, bestChanges, bestFile = candidate, count, fileName
+        if best:
+            self.touch(bestFile)
+        return best, False, bestChanges
+
+    def put(self, instance, options, games, penalties, status, objective=None):
+        # objective is the value written to the solution files, by default
+        # the sum of the penalties
+        key = instanceKey(instance, options)
+        entry = {'key': key, 'structure': structureKey(instance), 'signature': signature(instance),
+                 'options': options, 'games': [list(game) for game in games], 'penalties': dict(penalties),
+                 'objective': sum(penalties.values()) if objective is None else objective, 'status': status}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fileName = self.path(key)
+            tmpFile = '{0}.{1}.tmp'.format(fileName, os.getpid())
+            with open(tmpFile, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmpFile, fileName)
+        except OSError:
+            return None
+        self.evict()
+        return key
+
+    def files(self):
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        return [os.path.join(self.directory, name) for name in names if name.endswith('.json')]
+
+    def evict(self):
+        # least recently used first, until the directory fits in maxBytes
+        entries = []
+        for fileName in self.files():
+            try:
+                stat = os.stat(fileName)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, fileName))
+        total = sum(size for mtime, size, fileName in entries)
+        for mtime, size, fileName in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(fileName)
+                total -= size
+            except OSError:
+                pass
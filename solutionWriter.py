@@ -0,0 +1,120 @@
+# coding: utf-8
+# Solution writers.
+#
+# A schedule is an int array of (slot, home, away) rows, one per game, as
+# returned by scheduleArray in model.py and cpsatModel.py. Every writer streams
+# straight from it:
+#   xml  - ITC2021 solution (<instance>_solution.xml), the same text the
+#          ElementTree/minidom pretty-printer produced, written line by line;
+#   csv  - slot,home,away rows;
+#   json - {"objective": ..., "bound": ..., "gap": ..., "status": ...,
+#           "games": [[slot, home, away], ...]};
+#   npy  - the array itself for numpy.load.
+# The XML Remarks hold the elapsed time followed by the status, bound and gap
+# when they are known. Files are written to a temporary name and moved into place with os.replace,
+# so a reader (or a run killed mid-write) never sees a partial solution.
+from xml.sax.saxutils import escape
+from datetime import date
+import numpy as np
+import contextlib
+import json
+import math
+import os
+
+
+def objectiveText(objective):
+    # the objectiveValue written for a solver objective; penalties are integral
+    return str(int(round(objective)))
+
+
+def gameArray(games):
+    return np.asarray(games, dtype=np.int32).reshape(-1, 3)
+
+
+def solutionFile(fileName, outputFormat):
+    return fileName[:-4] + '_solution.' + outputFormat
+
+
+@contextlib.contextmanager
+def atomicOpen(path, mode='w'):
+    tmpFile = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmpFile, mode) as f:
+            yield f
+        os.replace(tmpFile, path)
+    finally:
+        if os.path.exists(tmpFile):
+            os.remove(tmpFile)
+
+
+def element(name, attributes=(), text=None, indent=''):
+    attributes = ''.join(' {0}="{1}"'.format(key, escape(str(value), {'"': '&quot;'}))
+                         for key, value in dict(attributes).items())
+    if text is None:
+        return '{0}<{1}{2}/>\n'.format(indent, name, attributes)
+    return '{0}<{1}{2}>{3}</{1}>\n'.format(indent, name, attributes, escape(text))
+
+
+def remarks(elapsed, bound=None, status=None, gap=None):
+    text = str(elapsed)
+    for name, value in (('status', status), ('bound', bound), ('gap', gap)):
+        if value is not None:
+            text += ' {0}={1}'.format(name, '{0:.6g}'.format(value) if isinstance(value, float) else value)
+    return text
+
+
+def writeXml(games, fileName, objVal, elapsed, solverAttributes, bound=None, status=None, gap=None):
+    # bound, when known, goes to LowerBound; otherwise the objective does.
+    # Penalties are integral, so a fractional bound is rounded up.
+    if bound is not None:
+        bound = int(math.ceil(bound - 1e-6))
+    today = date.today()
+    with atomicOpen(solutionFile(fileName, 'xml')) as f:
+        f.write('<?xml version="1.0" ?>\n<Solution>\n  <MetaData>\n')
+        f.write(element('SolutionName', text='IP_Test.xml', indent='    '))
+        f.write(element('InstanceName', text='Test Instance 4.xml', indent='    '))
+        f.write(element('Contributor', text='Team ZERO', indent='    '))
+        f.write(element('Date', (('day', today.day), ('month', today.month), ('year', today.year)), indent='    '))
+        f.write(element('SolutionMethod', text='IP', indent='    '))
+        f.write(element('objectiveValue', {'objective': objVal}, indent='    '))
+        f.write(element('LowerBound', (('objective', objVal if bound is None else bound), ('infeasibility', '0')), indent='    '))
+        f.write(element('Remarks', text=remarks(elapsed, bound, status, gap), indent='    '))
+        f.write(element('SolverSettings', solverAttributes, indent='    '))
+        f.write('  </MetaData>\n')
+        if not len(games):
+            f.write('  <Games/>\n</Solution>\n')
+            return
+        f.write('  <Games>\n')
+        f.writelines('    <ScheduledMatch home="{1}" away="{2}" slot="{0}"/>\n'.format(s, i, j)
+                     for s, i, j in games.tolist())
+        f.write('  </Games>\n</Solution>\n')
+
+
+def writeCsv(games, fileName, objVal, elapsed, solverAttributes, bound=None, status=None, gap=None):
+    with atomicOpen(solutionFile(fileName, 'csv')) as f:
+        f.write('slot,home,away\n')
+        f.writelines('{0},{1},{2}\n'.format(s, i, j) for s, i, j in games.tolist())
+
+
+def writeJson(games, fileName, objVal, elapsed, solverAttributes, bound=None, status=None, gap=None):
+    with atomicOpen(solutionFile(fileName, 'json')) as f:
+        f.write('{{"objective": {0}, "bound": {1}, "gap": {2}, "status": {3}, "games": ['.format(
+            objVal, json.dumps(bound), json.dumps(gap), json.dumps(status)))
+        f.write(', '.join('[{0}, {1}, {2}]'.format(s, i, j) for s, i, j in games.tolist()))
+        f.write(']}\n')
+
+
+def writeNpy(games, fileName, objVal, elapsed, solverAttributes, bound=None, status=None, gap=None):
+    with atomicOpen(solutionFile(fileName, 'npy'), 'wb') as f:
+        np.save(f, games)
+
+
+OUTPUT_FORMATS = ('xml', 'csv', 'json', 'npy')
+WRITERS = {'xml': writeXml, 'csv': writeCsv, 'json': writeJson, 'npy': writeNpy}
+
+
+def writeSolution(games, fileName, objVal, elapsed, solverAttributes, outputFormats=('xml',), bound=None, status=None,
+                  gap=None):
+    games = gameArray(games)
+    for outputFormat in outputFormats:
+        WRITERS[outputFormat](games, fileName, objVal, elapsed, solverAttributes, bound, status, gap)
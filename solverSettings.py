@@ -0,0 +1,151 @@
+# coding: utf-8
+# Solver selection and limits shared by the MIP and CP-SAT paths.
+#
+# Settings come from a JSON config file (keys as in SolverSettings) and are
+# overridden by command-line options. MIP engines are created through
+# pywraplp.Solver.CreateSolver, so any engine the installed OR-tools ships
+# with can be used; limits without a generic pywraplp knob are passed as
+# solver-specific parameter strings where the engine accepts them.
+from ortools.linear_solver import pywraplp
+from typing import NamedTuple
+import json
+
+MIP_SOLVERS = ('CBC', 'SCIP', 'SAT', 'GUROBI', 'CPLEX', 'XPRESS', 'HIGHS', 'GLPK')
+PRESOLVE_LEVELS = ('on', 'off')
+
+ABSOLUTE_GAP_PARAMETER = {
+    'SCIP': 'limits/absgap = {0}',
+    'SAT': 'absolute_gap_limit: {0}',
+    'GUROBI': 'MIPGapAbs {0}',
+    'XPRESS': 'MIPABSSTOP {0}',
+}
+SEED_PARAMETER = {
+    'SCIP': 'randomization/randomseedshift = {0}',
+    'SAT': 'random_seed: {0}',
+    'GUROBI': 'Seed {0}',
+}
+FIRST_SOLUTION_PARAMETER = {
+    'SCIP': 'limits/solutions = 1',
+    'SAT': 'stop_after_first_solution: true',
+    'GUROBI': 'SolutionLimit 1',
+}
+MIP_STATUS = {
+    pywraplp.Solver.OPTIMAL: 'OPTIMAL',
+    pywraplp.Solver.FEASIBLE: 'FEASIBLE',
+    pywraplp.Solver.INFEASIBLE: 'INFEASIBLE',
+    pywraplp.Solver.UNBOUNDED: 'UNBOUNDED',
+    pywraplp.Solver.ABNORMAL: 'ABNORMAL',
+    pywraplp.Solver.MODEL_INVALID: 'MODEL_INVALID',
+    pywraplp.Solver.NOT_SOLVED: 'NOT_SOLVED',
+}
+
+
+class SolverSettings(NamedTuple):
+    solver: str = 'CBC'
+    threads: int = None
+    timeLimit: float = None
+    relativeGap: float = None
+    absoluteGap: float = None
+    presolve: str = 'on'
+    seed: int = 0
+    firstSolution: bool = False
+
+
+def loadSettings(configFile=None, **overrides):
+    values = {}
+    if configFile:
+        with open(configFile) as f:
+            values.update(json.load(f))
+        unknown = set(values) - set(SolverSettings._fields)
+        if unknown:
+            raise ValueError('unknown solver settings in {0}: {1}'.format(configFile, ', '.join(sorted(unknown))))
+    values.update({key: value for key, value in overrides.items() if value is not None})
+    settings = SolverSettings(**values)
+    if settings.presolve not in PRESOLVE_LEVELS:
+        raise ValueError('presolve must be one of ' + ', '.join(PRESOLVE_LEVELS))
+    return settings._replace(solver=settings.solver.upper())
+
+
+def mipStatusName(status):
+    return MIP_STATUS.get(status, str(status))
+
+
+def availableMipSolvers():
+    available = []
+    for name in MIP_SOLVERS:
+        solver = pywraplp.Solver.CreateSolver(name)
+        if solver is not None and solver.IsMip():
+            available.append(name)
+    return available
+
+
+def createMipSolver(name='CBC'):
+    solver = pywraplp.Solver.CreateSolver(name)
+    if solver is None or not solver.IsMip():
+        raise ValueError('MIP solver {0} is not available in this OR-tools build (available: {1})'.format(
+            name, ', '.join(availableMipSolvers())))
+    return solver
+
+
+def solveMip(solver, settings):
+    # Applies settings to a pywraplp solver, solves and returns the status.
+    # Returns also the settings that the engine ignored.
+    ignored = []
+    if settings.threads:
+        if not solver.SetNumThreads(settings.threads):
+            ignored.append('threads')
+    # 0 clears a limit left on the solver by an earlier solve
+    solver.SetTimeLimit(int(settings.timeLimit*1000) if settings.timeLimit else 0)
+    specific = []
+    if settings.absoluteGap is not None:
+        if settings.solver in ABSOLUTE_GAP_PARAMETER:
+            specific.append(ABSOLUTE_GAP_PARAMETER[settings.solver].format(settings.absoluteGap))
+        else:
+            ignored.append('absoluteGap')
+    if settings.seed:
+        if settings.solver in SEED_PARAMETER:
+            specific.append(SEED_PARAMETER[settings.solver].format(settings.seed))
+        else:
+            ignored.append('seed')
+    if settings.firstSolution:
+        if settings.solver in FIRST_SOLUTION_PARAMETER:
+            specific.append(FIRST_SOLUTION_PARAMETER[settings.solver])
+        else:
+            ignored.append('firstSolution')
+    if specific and not solver.SetSolverSpecificParametersAsString('\n'.join(specific)):
+        ignored.append('solverSpecific')
+    parameters = pywraplp.MPSolverParameters()
+    if settings.relativeGap is not None:
+        parameters.SetDoubleParam(pywraplp.MPSolverParameters.RELATIVE_MIP_GAP, settings.relativeGap)
+    parameters.SetIntegerParam(pywraplp.MPSolverParameters.PRESOLVE,
+                               pywraplp.MPSolverParameters.PRESOLVE_ON if settings.presolve == 'on'
+                               else pywraplp.MPSolverParameters.PRESOLVE_OFF)
+    for name in ignored:
+        print("warning: {0} is not supported by {1} and was ignored".format(name, settings.solver))
+    return solver.Solve(parameters), ignored
+
+
+def applyCpSettings(solver, settings, defaultWorkers=1):
+    parameters = solver.parameters
+    parameters.num_workers = settings.threads or defaultWorkers
+    parameters.random_seed = settings.seed
+    if settings.timeLimit:
+        parameters.max_time_in_seconds = settings.timeLimit
+    if settings.relativeGap is not None:
+        parameters.relative_gap_limit = settings.relativeGap
+    if settings.absoluteGap is not None:
+        parameters.absolute_gap_limit = settings.absoluteGap
+    parameters.cp_model_presolve = settings.presolve == 'on'
+    parameters.stop_after_first_solution = settings.firstSolution
+
+
+def settingsAttributes(settings, backend, ignored=()):
+    # Flat string attributes for the solution MetaData.
+    attributes = {'backend': backend}
+    for key, value in settings._asdict().items():
+        if backend == 'cpsat' and key == 'solver':
+            continue
+        attributes[key] = 'default' if value is None else str(value)
+    if ignored:
+        attributes['ignored'] = ';'.join(ignored)
+    return attributes
@@ -0,0 +1,42 @@
+# coding: utf-8
+# Regression tests for the MIP model: run with python -m pytest.
+from instance import parseInstance
+from model import buildModel, penaltyValues
+from bulkModel import buildBulkModel
+from solverSettings import SolverSettings, solveMip
+from warmStart import bestStart
+import io
+import os
+import pytest
+
+# Test1 with its SE1 record cut down to three of the six teams
+PARTIAL_SE1 = open(os.path.join(os.path.dirname(__file__), 'ITC2021_Test1.xml'), 'rb').read().replace(b'teams="2;0;3;5;4;1" type="SOFT"/>',
+                                                            b'teams="2;0;3" type="SOFT"/>')
+
+
+def fixedSchedule(model, games):
+    scheduled = set((i,j,s) for s,i,j in games)
+    for i in range(model.numTeams):
+        for j in range(model.numTeams):
+            for s in range(model.numSlots):
+                if i != j:
+                    var = model.x[i,j,s] if model.formulation == 'compact' else model.H[i,j,s,0]
+                    var.SetBounds(int((i,j,s) in scheduled), int((i,j,s) in scheduled))
+
+
+@pytest.mark.parametrize('build', [buildModel, buildBulkModel])
+@pytest.mark.parametrize('formulation', ['full', 'compact'])
+def test_partial_se1_extraction(build, formulation):
+    # Extraction must skip the pairs an SE1 record leaves out, and every
+    # encoding must charge the same SE1 on the same schedule.
+    instance = parseInstance(io.BytesIO(PARTIAL_SE1))
+    assert len(instance.constraints['SE1'][0].teams) == 3
+    games, objective, infeasibility = bestStart(instance)
+    se1 = {}
+    for encoding in ('pairs', 'window'):
+        model = build(instance, formulation, encoding)
+        fixedSchedule(model, games)
+        status, ignored = solveMip(model.solver, SolverSettings())
+        assert status == model.solver.OPTIMAL
+        se1[encoding] = penaltyValues(model)['SE1']
+    assert se1['pairs'] == se1['window']
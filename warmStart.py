@@ -0,0 +1,147 @@
+# coding: utf-8
+# Constructive double round robin schedules used as solver hints.
+#
+# The first half is the circle method: team n-1 stays fixed while the others
+# rotate, with the canonical alternating home/away rule (n-2 breaks). Team
+# labels are shuffled and the rounds rotated per start, the second half mirrors
+# the first with homes swapped (so every start is phased), and homes are then
+# flipped pair by pair while that lowers the number of breaks, which brings
+# every start back to the 3n-6 breaks of the mirrored canonical schedule.
+# Starts are scored with evaluator.py and the best one (repaired by local
+# search if it breaks hard constraints) is hinted: every MIP variable through
+# SetHint (values taken from a solve with the schedule fixed), or x through
+# AddHint for CP-SAT.
+from evaluator import Evaluator, homeArray
+from localSearch import LocalSearch
+from solverSettings import SolverSettings, solveMip
+import numpy as np
+import random
+
+# pywraplp engines that read SetHint as a MIP start; CBC ignores it
+MIP_HINT_SOLVERS = ('SCIP', 'SAT', 'GUROBI', 'CPLEX', 'XPRESS')
+# share of the run's time limit given to the solve that completes a MIP hint,
+# and its limit in seconds when the run has none
+HINT_TIME_SHARE = 0.1
+HINT_TIME_CAP = 10.0
+
+
+def circleRounds(numTeams):
+    # [[(home, away), ...] per round] of a single round robin
+    fixed = numTeams - 1
+    rounds = []
+    for r in range(numTeams - 1):
+        games = [(r, fixed) if r % 2 == 0 else (fixed, r)]
+        for k in range(1, numTeams//2):
+            a = (r + k) % fixed
+            b = (r - k) % fixed
+            games.append((a, b) if k % 2 == 1 else (b, a))
+        rounds.append(games)
+    return rounds
+
+
+def countBreaks(home):
+    return sum(home[t][s] == home[t][s-1] for t in range(len(home)) for s in range(1, len(home[t])))
+
+
+def minimiseBreaks(games, numTeams, numSlots):
+    # flip the homes of both meetings of a pair while that removes breaks
+    home = [[0]*numSlots for t in range(numTeams)]
+    meetings = {}
+    for s,i,j in games:
+        home[i][s] = 1
+        meetings.setdefault((min(i,j), max(i,j)), []).append(s)
+    improved = True
+    while improved:
+        improved = False
+        for (i,j),slots in meetings.items():
+            before = 0
+            after = 0
+            for t in (i,j):
+                for s in slots:
+                    for r in (s-1, s+1):
+                        if 0 <= r < numSlots:
+                            before += home[t][s] == home[t][r]
+                            after += (1 - home[t][s]) == (home[t][r] if r not in slots else 1 - home[t][r])
+            if after < before:
+                for t in (i,j):
+                    for s in slots:
+                        home[t][s] = 1 - home[t][s]
+                improved = True
+    return [(s,i,j) if home[i][s] else (s,j,i) for s,i,j in games]
+
+
+def circleSchedule(numTeams, rand):
+    labels = list(range(numTeams))
+    rand.shuffle(labels)
+    rounds = circleRounds(numTeams)
+    shift = rand.randrange(numTeams - 1)
+    rounds = rounds[shift:] + rounds[:shift]
+    games = [(s,labels[i],labels[j]) for s,round_ in enumerate(rounds) for i,j in round_]
+    games += [(s + numTeams - 1,j,i) for s,i,j in games]
+    return minimiseBreaks(games, numTeams, 2*(numTeams - 1))
+
+
+def generateStarts(instance, count=1, seed=0):
+    # count constructive schedules, best first by (infeasibility, objective)
+    rand = random.Random(seed)
+    starts = [circleSchedule(instance.numTeams, rand) for k in range(count)]
+    batch = np.stack([homeArray(games, instance.numTeams, instance.numSlots) for games in starts])
+    score = Evaluator(instance).evaluate(batch)
+    order = np.lexsort((score.objective, score.infeasibility))
+    return [(starts[b], int(score.objective[b]), int(score.infeasibility[b])) for b in order]
+
+
+def repairStart(instance, games, seed=0, repairTime=1.0):
+    # A schedule that breaks hard constraints gets repairTime seconds of
+    # local search on the hard terms only. Returns (games, objective,
+    # infeasibility) as scored by evaluator.py.
+    evaluator = Evaluator(instance)
+    score = evaluator.evaluate(homeArray(games, instance.numTeams, instance.numSlots))
+    if score.infeasibility[0] and repairTime:
+        search = LocalSearch(instance, games, seed, hardOnly=True)
+        games = search.run(repairTime)['bestGames']
+        score = evaluator.evaluate(homeArray(games, instance.numTeams, instance.numSlots))
+    return games, int(score.objective[0]), int(score.infeasibility[0])
+
+
+def bestStart(instance, count=1, seed=0, repairTime=1.0):
+    # Best of count starts, repaired as in repairStart.
+    games, objective, infeasibility = generateStarts(instance, count, seed)[0]
+    if infeasibility and repairTime:
+        return repairStart(instance, games, seed, repairTime)
+    return games, objective, infeasibility
+
+
+def hintMip(model, games, settings):
+    # Fixes the home-game variables to the schedule and solves for the rest,
+    # so the hint covers every variable. The solve gets HINT_TIME_SHARE of the
+    # time limit in settings, or HINT_TIME_CAP without one, and is skipped for
+    # engines that ignore hints. If the schedule breaks a hard row or the solve
+    # finds nothing in time, the hint covers the home-game variables only.
+    # Returns the hinted count.
+    solver = model.solver
+    scheduled = set((i,j,s) for s,i,j in games)
+    core = [(model.H[i,j,s,0], int((i,j,s) in scheduled)) for i in range(model.numTeams)
+            for j in range(model.numTeams) for s in range(model.numSlots) if i != j]
+    variables = [var for var,value in core]
+    values = [value for var,value in core]
+    if settings.solver in MIP_HINT_SOLVERS:
+        for var,value in core:
+            var.SetBounds(value, value)
+        timeLimit = settings.timeLimit*HINT_TIME_SHARE if settings.timeLimit else HINT_TIME_CAP
+        status, ignored = solveMip(solver, SolverSettings(solver=settings.solver, threads=settings.threads,
+                                                          timeLimit=timeLimit, seed=settings.seed))
+        if status in (solver.OPTIMAL, solver.FEASIBLE):
+            variables = solver.variables()
+            values = [var.solution_value() for var in variables]
+        for var,value in core:
+            var.SetBounds(0, 1)
+    solver.SetHint(variables, values)
+    return len(variables)
+
+
+def hintCp(model, games):
+    scheduled = set((i,j,s) for s,i,j in games)
+    for (i,j,s),var in model.x.items():
+        model.model.AddHint(var, (i,j,s) in scheduled)
+    return len(model.x)